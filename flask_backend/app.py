@@ -1,25 +1,29 @@
 import os
 import firebase_admin
-from firebase_admin import credentials, db
-from flask import Flask, request, jsonify
+from firebase_admin import credentials
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import services.firebase_service as firebase_service
+from services import game_store
 import services.player_service as player_service
 import services.game_service as game_service
 import services.bot_service as bot_service
 from services.bot_manager import bot_manager
 import services.word_validation_service as word_validation_service
+import services.metrics_service as metrics_service
+import services.auth_service as auth_service
+import services.action_log_service as action_log_service
 import models.game as game
 import models.player as player
 import models.tile as tile
-from config import LOCAL_DEV_PORT
-import google.oauth2.id_token
+from config import LOCAL_DEV_PORT, GAME_STORE, METRICS_LOCAL_ONLY
 import google.auth.transport.requests
 from functools import wraps
 from firebase_admin import _auth_utils as auth
 import functools
 import uuid
 import datetime
+import time
 from flask import Flask
 from logging_config import logger
 # from scheduler import start as start_scheduler
@@ -28,39 +32,92 @@ import services.hashmap_service as hashmap_service
 
 app = Flask(__name__)
 
-cred = credentials.Certificate(
-    "./secrets/carnivore-5397b-firebase-adminsdk-9vx7r-f59e9c9d52.json")
-
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-firebase_admin.initialize_app(
-    cred, {"databaseURL": "https://carnivore-5397b-default-rtdb.firebaseio.com"})
-ref = db.reference()
+if GAME_STORE == 'firebase':
+    cred = credentials.Certificate(
+        "./secrets/carnivore-5397b-firebase-adminsdk-9vx7r-f59e9c9d52.json")
+    firebase_admin.initialize_app(
+        cred, {"databaseURL": "https://carnivore-5397b-default-rtdb.firebaseio.com"})
+firebase_service.configure_store(game_store.create_store(GAME_STORE))
 
 request_adapter = google.auth.transport.requests.Request()
+token_verifier = auth_service.TokenVerifier(request_adapter)
+try:
+    # Fetch the signing certificates now rather than on the first request
+    token_verifier.start()
+except Exception as e:
+    logger.warning("Could not fetch Firebase certificates at startup: %s", e)
 
 ANAGRAM_MAP_PATH = os.path.join(
     os.path.dirname(os.path.abspath(__file__)),
     'services', 'anagram_map.pkl'
 )
+ANAGRAM_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'services', 'anagram_index.bin'
+)
 DICT_PATH = os.path.join(
     os.path.dirname(os.path.abspath(__file__)),
     'word_validation', 'dictionary.txt'
 )
 
-if not os.path.exists(ANAGRAM_MAP_PATH):
-    print("Building anagram map...")
-    hashmap_service.build_anagram_map(DICT_PATH, ANAGRAM_MAP_PATH)
-else:
-    print("Anagram map already exists.")
+hashmap_service.ensure_anagram_index(ANAGRAM_INDEX_PATH, DICT_PATH, ANAGRAM_MAP_PATH)
+
+# Load the dictionary once so the first word submission doesn't pay for it
+word_validation_service.get_dictionary()
 
-# Configure the BotManager with the anagram map path
-bot_manager.configure(ANAGRAM_MAP_PATH)
+# Configure the BotManager with the anagram index path
+bot_manager.configure(ANAGRAM_INDEX_PATH)
 
 class GameNotFoundError(Exception):
     pass
 
 
+@app.before_request
+def begin_game_snapshot_scope():
+    # Every lookup of a game during this request shares one read
+    g.game_snapshot_scope = firebase_service.begin_request_scope()
+
+
+@app.teardown_request
+def end_game_snapshot_scope(exc):
+    token = g.pop('game_snapshot_scope', None)
+    if token is not None:
+        firebase_service.end_request_scope(token)
+
+
+@app.before_request
+def begin_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_metrics = metrics_service.begin_request()
+
+
+@app.after_request
+def record_request_metrics(response):
+    token = g.pop('request_metrics', None)
+    if token is None:
+        return response
+    spans = metrics_service.end_request(token)
+    metrics_service.observe(
+        'carnivore_http_request_seconds', time.perf_counter() - g.request_started,
+        endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+        method=request.method, status=str(response.status_code))
+    if spans:
+        # Per-step timings of this request, shown in the browser's network panel
+        response.headers['Server-Timing'] = metrics_service.server_timing_header(spans)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Serves request, database, transaction and bot metrics in the Prometheus text format."""
+    if METRICS_LOCAL_ONLY and request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Not found'}), 404
+    return app.response_class(metrics_service.render_prometheus(),
+                              content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def verify_firebase_token(f):
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
@@ -69,6 +126,8 @@ def verify_firebase_token(f):
 
         This function extracts the 'Authorization' token from the request headers,
         verifies it using Firebase, and attaches the user ID to the request object.
+        Verified tokens and Google's signing certificates are cached (see
+        services/auth_service.py), so repeat requests skip the signature check.
 
         Args:
             *args: Variable length argument list.
@@ -80,9 +139,8 @@ def verify_firebase_token(f):
             Otherwise, it calls the wrapped function with the provided arguments.
 
         Raises:
-            ValueError: If there is an error during token verification.
-            google.auth.exceptions.InvalidValue: If the token is invalid.
-            google.auth.exceptions.ExpiredToken: If the token has expired.
+            auth_service.ExpiredTokenError: If the token has expired.
+            ValueError: If the token is invalid.
             Exception: For any other unexpected errors.
         """
         token = request.headers.get('Authorization')
@@ -95,28 +153,23 @@ def verify_firebase_token(f):
             if token.startswith('Bearer '):
                 token = token[7:]
 
-            idinfo = google.oauth2.id_token.verify_firebase_token(
-                token, request_adapter
-            )
+            with metrics_service.span('auth'):
+                idinfo = token_verifier.verify(token)
 
             user_id = idinfo['sub']
             request.user_id = user_id
 
+        except auth_service.ExpiredTokenError as e:
+            logger.info(
+                "verify_firebase_token() --> Token has expired: %s", e)
+            return jsonify({'error': 'Token has expired'}), 401
         except ValueError as e:
             logger.error(
-                f"verify_firebase_token() --> ValueError during token verification: {e}")
+                "verify_firebase_token() --> ValueError during token verification: %s", e)
             return jsonify({'error': 'Invalid token'}), 401
-        except google.auth.exceptions.InvalidValue as e:
-            logger.error(
-                f"verify_firebase_token() --> InvalidValue error during token verification: {e}")
-            return jsonify({'error': 'Invalid token'}), 401
-        except google.auth.exceptions.ExpiredToken as e:
-            logger.error(
-                f"verify_firebase_token() --> ExpiredToken error during token verification: {e}")
-            return jsonify({'error': 'Token has expired'}), 401
         except Exception as e:
             logger.exception(
-                "verify_firebase_token() --> An unexpected error occurred: {e}")
+                "verify_firebase_token() --> An unexpected error occurred: %s", e)
             return jsonify({'error': 'Authentication failed'}), 500
 
         return f(*args, **kwargs)
@@ -151,13 +204,14 @@ def validate_user_and_game_id_in_request_data(f):
         if not game_id:
             return jsonify({"error": "Missing game_id"}), 400
 
-        # Check if game exists
-        game_data = firebase_service.get_game(game_id)
+        with metrics_service.span('validate_request'):
+            # Check if game exists
+            game_data = firebase_service.get_game_snapshot(game_id)
+            # Check if user is in the game (if needed):
+            in_game = bool(game_data) and player_service.is_player_in_game(user_id, game_id, game_data)
         if not game_data:
             return jsonify({'error': f"Game with ID {game_id} does not exist."}), 404
-
-        # Check if user is in the game (if needed):
-        if not player_service.is_player_in_game(user_id, game_id):
+        if not in_game:
             return jsonify({'error': f"User with ID {user_id} is not part of game {game_id}."}), 400
 
         return f(*args, **kwargs)
@@ -184,16 +238,17 @@ def join_game():
         Exception: If there is an error processing the request.
     """
     logger.debug(
-        f"join_game() --> request.data= {request.data.decode('utf-8')}")
+        "join_game() --> request.data= %s", request.data.decode('utf-8'))
     user_id = request.user_id
     data = request.get_json()
     username = data.get('username')
-    logger.debug(f"username= {username}")
+    logger.debug("username= %s", username)
     logger.debug(
-        f"join_game() --> user_id (expecting a persistent user id here for google logged in users)= {user_id}")
+        "join_game() --> user_id (expecting a persistent user id here for google logged in users)= %s",
+        user_id)
     try:
         data = request.get_json(force=True, silent=False)
-        logger.debug(f"join_game() --> Parsed JSON data: {data}")
+        logger.debug("join_game() --> Parsed JSON data: %s", data)
 
         if not data or 'game_id' not in data:
             return jsonify({"error": "Missing game_id"}), 400
@@ -209,7 +264,7 @@ def join_game():
             return jsonify({"error": "Failed to add player to game"}), 500
 
     except Exception as e:
-        logger.error(f"join_game() --> Error processing request: {e}")
+        logger.error("join_game() --> Error processing request: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -228,24 +283,25 @@ def create_game():
     Raises:
         Exception: If there is an error processing the request.
     """
-    print("woot woot ✅✅✅create_game() called")
+    logger.debug("create_game() called")
     user_id = request.user_id
     data = request.get_json()
     username = data.get('username')
     game_type= data.get('game_type', 'regular')  # Default to multiplayer if not specified
-    logger.debug(f"username= {username}")
+    logger.debug("username= %s", username)
     logger.debug(
-        f"create_game() --> user_id (expecting a persistent user id here for google logged in users)= {user_id}")
+        "create_game() --> user_id (expecting a persistent user id here for google logged in users)= %s",
+        user_id)
     try:
         game_id = game_service.create_game(user_id, username, game_type)
         if game_id:
-            logger.debug(f"create_game() --> username = {username}")
+            logger.debug("create_game() --> username = %s", username)
             return jsonify({"success": True, "game_id": game_id}), 200
         else:
             return jsonify({"error": "Failed to create game"}), 500
 
     except Exception as e:
-        logger.error(f"create_game() --> Error processing request: {e}")
+        logger.error("create_game() --> Error processing request: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -264,24 +320,25 @@ def create_bot_game():
     Raises:
         Exception: If there is an error processing the request.
     """
-    print("woot woot ✅✅✅create-bot-game() called")
+    logger.debug("create-bot-game() called")
     user_id = request.user_id
     data = request.get_json()
     username = data.get('username')
-    logger.debug(f"username= {username}")
+    logger.debug("username= %s", username)
     logger.debug(
-        f"create-bot-game() --> user_id (expecting a persistent user id here for google logged in users)= {user_id}")
+        "create-bot-game() --> user_id (expecting a persistent user id here for google logged in users)= %s",
+        user_id)
     try:
         game_id = game_service.create_game(user_id, username, "computer")
         if game_id:
             bot_manager.get_service(game_id)
-            logger.debug(f"create_game() --> username = {username}")
+            logger.debug("create_game() --> username = %s", username)
             return jsonify({"success": True, "game_id": game_id}), 200
         else:
             return jsonify({"error": "Failed to create game"}), 500
 
     except Exception as e:
-        logger.error(f"create_game() --> Error processing request: {e}")
+        logger.error("create_game() --> Error processing request: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -306,69 +363,45 @@ def flip_tile():
             - On server error: {"error": str(e)}, HTTP status 500.
     """
     user_id = request.user_id
-    logger.debug(f"flip_tile() called")
-    logger.debug(f"flip_tile() --> user_id= {user_id}")
+    logger.debug("flip_tile() called")
+    logger.debug("flip_tile() --> user_id= %s", user_id)
     try:
         data = request.get_json(force=True, silent=False)
-        logger.debug(f"flip_tile() --> data = {data}")
+        logger.debug("flip_tile() --> data = %s", data)
         if not data or 'game_id' not in data or user_id is None:
             logger.debug(
-                f"flip_tile() --> Missing game_id in request data or user_id is None")
+                "flip_tile() --> Missing game_id in request data or user_id is None")
             return jsonify({"error": "Missing game_id in request data"}), 400
 
         game_id = data['game_id']
-        logger.debug(f"flip_tile() --> game_id= {game_id}")
-        game_data = firebase_service.get_game(game_id)
+        logger.debug("flip_tile() --> game_id= %s", game_id)
+        game_data = firebase_service.get_game_snapshot(game_id)
 
         if not game_data:
             logger.debug(
-                f"flip_tile() --> Game with ID {game_id} does not exist.")
+                "flip_tile() --> Game with ID %s does not exist.", game_id)
             return jsonify({"error": f"Game with ID {game_id} does not exist."}), 404
-        if not player_service.is_player_turn(user_id, game_id):
-            logger.debug(f"flip_tile() --> Not the player's turn")
+        if not player_service.is_player_turn(user_id, game_id, game_data):
+            logger.debug("flip_tile() --> Not the player's turn")
             return jsonify({"error": "Not the player's turn", "user_id": user_id}), 400
         else:
-            success = game_service.flip_tile(game_id, user_id)
-            logger.debug(f"flip_tile() --> success= {success}")
+            success = game_service.flip_tile(game_id, user_id, game_data)
+            logger.debug("flip_tile() --> success= %s", success)
             if success:
                 if game_data['gameType'] == "computer":
-                    # Have bot check for words to submit after the human user flips a tile
-                    bot_service = bot_manager.get_service(game_id)
-                    if not bot_service:
-                        logger.error(f"flip_tile() --> No bot service found for game {game_id}")
-                        return jsonify({"error": "No bot service found for this game"}), 500
-
-                    # If it's a computer game, we need to let the bot check for new moves after a tile flip
-                    def bot_generate_and_submit_bot_move():
-                        import time
-                        import random
-                        time.sleep(random.randint(1, 8))
-                        bot_service.generate_and_submit_bot_move()
-                    
-                    import threading
-                    thread = threading.Thread(target=bot_generate_and_submit_bot_move)
-                    thread.start()
-
-                    # At the same time, the bot also needs to be flipping a tile after the user does
-
-                    def bot_flip_tile():
-                        import time
-                        import random
-                        time.sleep(random.randint(1, 8))
-                        bot_service.flip_tile()
-                    logger.debug(f"flip_tile() --> Bot flipping tile for game {game_id}")
-                    import threading
-                    thread = threading.Thread(target=bot_flip_tile)
-                    thread.start()
+                    # Let the bot look for new words and flip its tile after the human user flips;
+                    # the scheduler runs at most one pending bot turn per game
+                    logger.debug("flip_tile() --> Scheduling bot turn for game %s", game_id)
+                    bot_manager.schedule_turn(game_id)
 
                 return jsonify({"success": True}), 200
             else:
                 logger.debug(
-                    f"flip_tile() --> No flippable tile available or all letters used")
+                    "flip_tile() --> No flippable tile available or all letters used")
                 return jsonify({"error": "No flippable tile available or all letters used"}), 400
 
     except Exception as e:
-        logger.error(f"flip_tile() --> Error processing request: {str(e)}")
+        logger.error("flip_tile() --> Error processing request: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
 
@@ -385,11 +418,11 @@ def submit_word_route():
     try:
         data = request.get_json()
         user_id = request.user_id
-        logger.debug(f"submit_word_route() --> user_id= {user_id}")
+        logger.debug("submit_word_route() --> user_id= %s", user_id)
         game_id = data.get('game_id')
-        logger.debug(f"submit_word_route() --> game_id= {game_id}")
+        logger.debug("submit_word_route() --> game_id= %s", game_id)
         tile_ids = data.get('tile_ids')
-        logger.debug(f"submit_word_route() --> tile_ids= {tile_ids}")
+        logger.debug("submit_word_route() --> tile_ids= %s", tile_ids)
         # if tile_ids have any duplicates, return an error
         if len(tile_ids) != len(set(tile_ids)):
             logger.debug(
@@ -408,22 +441,40 @@ def submit_word_route():
             logger.debug("submit_word_route() --> tileIds must be integers")
             return jsonify({"error": "tileIds must be integers"}), 400
 
-        result = game_service.submit_word(game_id, user_id, tile_ids)
-        logger.debug(f"🙄submit_word_route() --> result= {result}")
-        print("🙄🙄🙄🙄🙄submit_word_route() --> result= {result}")
+        result = game_service.submit_word(
+            game_id, user_id, tile_ids, firebase_service.get_game_snapshot(game_id))
+        logger.debug("submit_word_route() --> result= %s", result)
         if result['success']:
-            print(f" a user {user_id} submitted a word successfully")
             logger.debug(
-                f"submit_word_route() --> Word submitted successfully: {result}")
+                "submit_word_route() --> Word submitted successfully: %s", result)
             return jsonify(result), 200
         else:
-            logger.debug(f"submit_word_route() --> Error: {result['message']}")
+            logger.debug("submit_word_route() --> Error: %s", result['message'])
             # More specific error handling based on result['message']
             return jsonify({'error': result['message']}), 400
 
     except Exception as e:
         logger.error(
-            f"submit_word_route() --> An unexpected error occurred: {e}")
+            "submit_word_route() --> An unexpected error occurred: %s", e)
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/game-history', methods=['POST'])
+@verify_firebase_token
+@validate_user_and_game_id_in_request_data
+def game_history():
+    """Returns a game's complete action log, oldest first.
+
+    games/{gameId}/actions only keeps the latest actions (see
+    action_log_service); this includes the ones moved into snapshots.
+    """
+    try:
+        game_id = request.get_json().get('game_id')
+        history = action_log_service.get_action_history(game_id)
+        return jsonify({'actions': [{'actionId': action_id, **action}
+                                    for action_id, action in history]}), 200
+    except Exception as e:
+        logger.error("game_history() --> An unexpected error occurred: %s", e)
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 
@@ -438,7 +489,7 @@ def end_game():
         bot_manager.remove_service(game_id)
         return jsonify({"success": True, "message": f"Cleaned up resources for game {game_id}"}), 200
     except Exception as e:
-        logger.error(f"end_game() --> An unexpected error occurred: {e}")
+        logger.error("end_game() --> An unexpected error occurred: %s", e)
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 if __name__ == '__main__':
@@ -0,0 +1,173 @@
+"""Compares the pickled anagram map with the memory-mapped anagram index.
+
+Also compares extension search (word_search_service.find_keys, a walk of the
+index's key trie) with a precomputed index of every key's superset keys
+filtered against the middle letters.
+
+Run from the flask_backend directory:
+
+    python -m benchmarks.anagram_index_benchmark --games 100
+"""
+import argparse
+import collections
+import os
+import pickle
+import random
+import tempfile
+import time
+import tracemalloc
+
+from services import hashmap_service, word_search_service
+
+SERVICES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services')
+ANAGRAM_MAP_PATH = os.path.join(SERVICES_DIR, 'anagram_map.pkl')
+# Roughly the game's letter frequencies, to draw middle tiles from
+TILE_BAG = 'aaaaaaaaabbcccddddeeeeeeeeeeeeeffggghhiiiiiiiiijkllllmmnnnnnnooooooooppqrrrrrrssssttttttuuuuvvwwxyyz'
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def measure(label, load, games):
+    """Loads one map per simulated game and reports time and Python heap growth."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    maps = [load() for _ in range(games)]
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} load x{games}: {elapsed * 1000:9.1f} ms total, "
+          f"{elapsed * 1000 / games:7.2f} ms/game, heap {current / 2**20:8.1f} MiB")
+    return maps[0]
+
+
+def lookups(label, anagram_map, keys, rounds):
+    start = time.perf_counter()
+    hits = 0
+    for _ in range(rounds):
+        for key in keys:
+            if key in anagram_map:
+                hits += len(anagram_map[key])
+    elapsed = time.perf_counter() - start
+    total = rounds * len(keys)
+    print(f"{label:<8} lookups:  {total / elapsed:12,.0f} lookups/s ({hits} words returned)")
+
+
+def _letter_mask(counts):
+    mask = 0
+    for letter in counts:
+        mask |= 1 << (ord(letter) - ord('a'))
+    return mask
+
+
+def build_supersets(keys, required_keys):
+    """Lists, for each required key, the keys that contain it plus at least one letter.
+
+    Each entry holds what a precomputed superset index would store: the key's
+    position, a mask of its extra letters and their counts. Only the required
+    keys being searched are built; the query cost doesn't depend on the rest.
+    """
+    key_counts = [collections.Counter(key) for key in keys]
+    key_masks = [_letter_mask(counts) for counts in key_counts]
+    supersets = {}
+    for required in required_keys:
+        required_counts = collections.Counter(required)
+        required_mask = _letter_mask(required_counts)
+        entries = []
+        for key_index, counts in enumerate(key_counts):
+            if key_masks[key_index] & required_mask != required_mask:
+                continue
+            if len(keys[key_index]) <= len(required):
+                continue
+            extra = counts - required_counts
+            if sum(extra.values()) == len(keys[key_index]) - len(required):
+                entries.append((key_index, _letter_mask(extra), tuple(extra.items())))
+        supersets[required] = entries
+    return supersets
+
+
+def superset_search(entries, middle_counts, middle_mask):
+    """Filters a required key's superset entries down to those the middle can complete."""
+    found = []
+    for key_index, mask, extra in entries:
+        if mask & ~middle_mask:
+            continue
+        if all(middle_counts[letter] >= count for letter, count in extra):
+            found.append(key_index)
+    return found
+
+
+def compare_extension_search(anagram_index, rng, words, middle_sizes, rounds):
+    keys = list(anagram_index.keys())
+    required_keys = [key for key in keys if len(key) <= 5]
+    required_keys = [rng.choice(required_keys) for _ in range(words)]
+
+    start = time.perf_counter()
+    supersets = build_supersets(keys, set(required_keys))
+    elapsed = time.perf_counter() - start
+    pairs = sum(len(entries) for entries in supersets.values())
+    print(f"superset index for {len(supersets)} words: {pairs:,} pairs, "
+          f"built in {elapsed:.1f} s")
+
+    for middle_size in middle_sizes:
+        middles = [''.join(rng.choices(TILE_BAG, k=middle_size)) for _ in required_keys]
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            trie_results = [word_search_service.find_keys(anagram_index, required, middle)
+                            for required, middle in zip(required_keys, middles)]
+        trie_time = (time.perf_counter() - start) / (rounds * len(required_keys))
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            index_results = []
+            for required, middle in zip(required_keys, middles):
+                middle_counts = collections.Counter(middle)
+                index_results.append(superset_search(
+                    supersets[required], middle_counts, _letter_mask(middle_counts)))
+        index_time = (time.perf_counter() - start) / (rounds * len(required_keys))
+
+        if [sorted(found) for found in trie_results] != [sorted(found) for found in index_results]:
+            raise AssertionError(f"trie and superset index disagree for middle size {middle_size}")
+        print(f"middle {middle_size:>2}: trie {trie_time * 1000:7.3f} ms/search, "
+              f"superset index {index_time * 1000:7.3f} ms/search")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--games', type=int, default=50,
+                        help='number of concurrent bot games to simulate')
+    parser.add_argument('--lookups', type=int, default=20000,
+                        help='number of random keys to look up')
+    parser.add_argument('--extension-words', type=int, default=300,
+                        help='number of existing words to search extensions for')
+    args = parser.parse_args()
+
+    anagram_map = load_pickle(ANAGRAM_MAP_PATH)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = os.path.join(tmp_dir, 'anagram_index.bin')
+        hashmap_service.write_anagram_index(anagram_map, index_path)
+        print(f"pickle file {os.path.getsize(ANAGRAM_MAP_PATH) / 2**20:.1f} MiB, "
+              f"index file {os.path.getsize(index_path) / 2**20:.1f} MiB")
+
+        rng = random.Random(0)
+        all_keys = list(anagram_map)
+        keys = [rng.choice(all_keys) for _ in range(args.lookups // 2)]
+        keys += [''.join(sorted(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 9))))
+                 for _ in range(args.lookups // 2)]
+        del anagram_map
+
+        pickled = measure('pickle', lambda: load_pickle(ANAGRAM_MAP_PATH), args.games)
+        mapped = measure('mmap', lambda: hashmap_service.load_anagram_index(index_path), args.games)
+
+        lookups('pickle', pickled, keys, 5)
+        lookups('mmap', mapped, keys, 5)
+
+        compare_extension_search(mapped, rng, args.extension_words, (4, 8, 14, 20), 3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Plays simulated games against an in-memory store and times the engine's hot paths.
+
+Every game is created from the same seed, so two runs on different commits
+play the same games and their numbers can be compared. Run from the
+flask_backend directory:
+
+    python -m benchmarks.engine_benchmark --games 20 --players 3 --bots 2 --save before.json
+    git checkout my-branch
+    python -m benchmarks.engine_benchmark --games 20 --players 3 --bots 2 --compare before.json
+
+Bot words are checked against word_validation/dictionary.txt like in
+production; without it every submission is rejected, the middle never
+empties and the games stop being realistic.
+
+--compare exits with status 1 when an operation's median latency got more
+than --max-regression slower, so it can gate a deploy.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')  # per-move debug logging would dominate the timings
+
+from services import firebase_service, game_service, game_store, hashmap_service
+from services.bot_service import BotService
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES_DIR = os.path.join(BACKEND_DIR, 'services')
+ANAGRAM_INDEX_PATH = os.path.join(SERVICES_DIR, 'anagram_index.bin')
+ANAGRAM_MAP_PATH = os.path.join(SERVICES_DIR, 'anagram_map.pkl')
+DICT_PATH = os.path.join(BACKEND_DIR, 'word_validation', 'dictionary.txt')
+
+OPERATIONS = ('flip_tile', 'submit_word', 'identifyWordSubmissionType', 'bot_move_generation')
+
+
+def ensure_anagram_index():
+    """Builds the bots' anagram index if this checkout doesn't have it yet, as app.py does."""
+    hashmap_service.ensure_anagram_index(ANAGRAM_INDEX_PATH, DICT_PATH, ANAGRAM_MAP_PATH)
+
+
+def _json_size(value) -> int:
+    return 0 if value is None else len(json.dumps(value, separators=(',', ':')))
+
+
+class CountingGameStore(game_store.InMemoryGameStore):
+    """An InMemoryGameStore that counts the JSON bytes read from and written to it.
+
+    The counts stand in for what the Realtime Database would send over the
+    wire for the same calls.
+    """
+
+    name = 'counting-memory'
+
+    def __init__(self, data: dict = None):
+        super().__init__(data)
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def reference(self, path: str = None):
+        return CountingReference(self, game_store._split_path(path))
+
+
+class CountingReference(game_store.MemoryReference):
+    def child(self, path: str):
+        return CountingReference(self._store, self._parts + game_store._split_path(path))
+
+    def get(self, etag=False, shallow=False):
+        result = super().get(etag=etag, shallow=shallow)
+        self._store.bytes_read += _json_size(result[0] if etag else result)
+        return result
+
+    def set(self, value):
+        self._store.bytes_written += _json_size(value)
+        super().set(value)
+
+    def update(self, value):
+        self._store.bytes_written += _json_size(value)
+        super().update(value)
+
+    def transaction(self, transaction_update):
+        def counted_update(current_data):
+            self._store.bytes_read += _json_size(current_data)
+            new_data = transaction_update(current_data)
+            self._store.bytes_written += _json_size(new_data)
+            return new_data
+        return super().transaction(counted_update)
+
+
+class Recorder:
+    """Collects latency, allocation and store traffic samples per operation."""
+
+    def __init__(self, store: CountingGameStore, trace_allocations: bool):
+        self.store = store
+        self.trace_allocations = trace_allocations
+        self.samples = {name: [] for name in OPERATIONS}
+
+    def measure(self, name, operation, *args):
+        """Runs operation(*args), records one sample for name, and returns its result."""
+        bytes_before = self.store.bytes_read + self.store.bytes_written
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            allocated_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = operation(*args)
+        elapsed = time.perf_counter() - start
+        sample = {
+            'seconds': elapsed,
+            'bytes': self.store.bytes_read + self.store.bytes_written - bytes_before,
+        }
+        if self.trace_allocations:
+            sample['allocated'] = tracemalloc.get_traced_memory()[1] - allocated_before
+        self.samples[name].append(sample)
+        return result
+
+
+def play_game(recorder: Recorder, game_number, players, bots, seed, max_flips):
+    """Plays one game: players take turns flipping and bots submit words after every flip."""
+    player_ids = [f'player{index}' for index in range(players)]
+    game_id = game_service.create_game(player_ids[0], player_ids[0], 'benchmark',
+                                       seed=f'{seed}-{game_number}')
+    for player_id in player_ids[1:]:
+        game_service.add_player_to_game(game_id, player_id, player_id)
+    bot_services = [BotService(game_id, BOT_ID=player_id, anagram_map=ANAGRAM_INDEX_PATH)
+                    for player_id in player_ids[:bots]]
+
+    for _ in range(max_flips):
+        game = game_service.get_game(game_id)
+        if not game.get('remainingLetters') or game.get('status') == 'winnerFound':
+            break
+        recorder.measure('flip_tile', game_service.flip_tile,
+                         game_id, game['currentPlayerTurn'], game)
+
+        for bot in bot_services:
+            game = game_service.get_game(game_id)
+            word = recorder.measure('bot_move_generation', bot.choose_move, game)
+            if word is None:
+                continue
+            recorder.measure('identifyWordSubmissionType', game_service.identifyWordSubmissionType,
+                             game, bot.BOT_ID, word['tileIds'])
+            recorder.measure('submit_word', game_service.submit_word,
+                             game_id, bot.BOT_ID, word['tileIds'], game)
+
+    game_service.delete_game(game_id)
+
+
+def run(games, players, bots, seed, max_flips, trace_allocations):
+    store = CountingGameStore()
+    firebase_service.configure_store(store)
+    recorder = Recorder(store, trace_allocations)
+    random.seed(seed)  # bots pick among equal moves with the module RNG
+    if trace_allocations:
+        tracemalloc.start()
+    try:
+        for game_number in range(games):
+            play_game(recorder, game_number, players, bots, seed, max_flips)
+    finally:
+        if trace_allocations:
+            tracemalloc.stop()
+    return recorder.samples
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(timing_samples, allocation_samples):
+    """Reduces the samples of each operation to the numbers the report shows."""
+    summary = {}
+    for name in OPERATIONS:
+        seconds = sorted(sample['seconds'] for sample in timing_samples[name])
+        if not seconds:
+            continue
+        allocated = [sample['allocated'] for sample in allocation_samples.get(name, [])]
+        summary[name] = {
+            'count': len(seconds),
+            'ops_per_sec': len(seconds) / sum(seconds) if sum(seconds) else 0.0,
+            'p50_ms': percentile(seconds, 0.50) * 1000,
+            'p99_ms': percentile(seconds, 0.99) * 1000,
+            'bytes_per_op': sum(s['bytes'] for s in timing_samples[name]) / len(seconds),
+            'allocated_kib_per_op': sum(allocated) / len(allocated) / 1024 if allocated else None,
+        }
+    return summary
+
+
+def print_report(summary, baseline=None):
+    print(f"{'operation':<28}{'count':>7}{'ops/s':>11}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'bytes/op':>11}{'KiB alloc':>11}" + (f"{'p50 vs base':>13}" if baseline else ''))
+    for name, stats in summary.items():
+        allocated = stats['allocated_kib_per_op']
+        line = (f"{name:<28}{stats['count']:>7}{stats['ops_per_sec']:>11,.0f}"
+                f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['bytes_per_op']:>11,.0f}"
+                + (f"{allocated:>11,.1f}" if allocated is not None else f"{'-':>11}"))
+        if baseline and name in baseline:
+            line += f"{stats['p50_ms'] / baseline[name]['p50_ms'] - 1:>+13.0%}"
+        print(line)
+
+
+def find_regressions(summary, baseline, max_regression):
+    """Returns the operations whose median latency grew by more than max_regression."""
+    return [name for name, stats in summary.items()
+            if name in baseline and baseline[name]['p50_ms'] > 0
+            and stats['p50_ms'] / baseline[name]['p50_ms'] - 1 > max_regression]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=10, help='number of games to play')
+    parser.add_argument('--players', type=int, default=3, help='players per game')
+    parser.add_argument('--bots', type=int, default=2,
+                        help='how many of the players are bots that submit words')
+    parser.add_argument('--seed', default='benchmark', help='seed for tile order and bot choices')
+    parser.add_argument('--max-flips', type=int, default=200,
+                        help='stop a game after this many flips even if tiles remain')
+    parser.add_argument('--save', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='compare with results saved earlier')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='median slowdown, as a fraction, that fails --compare')
+    args = parser.parse_args()
+    ensure_anagram_index()
+    if not 0 <= args.bots <= args.players:
+        parser.error('--bots must be between 0 and --players')
+
+    timing_samples = run(args.games, args.players, args.bots, args.seed, args.max_flips,
+                         trace_allocations=False)
+    # Tracing allocations slows every call down, so it gets its own, shorter pass
+    allocation_samples = run(1, args.players, args.bots, args.seed, args.max_flips,
+                             trace_allocations=True)
+    summary = summarize(timing_samples, allocation_samples)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        print(f"baseline: commit {saved.get('commit')}, {saved.get('settings')}")
+        baseline = saved['operations']
+    print_report(summary, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'commit': _git_commit(), 'settings': vars(args) | {'save': None, 'compare': None},
+                       'operations': summary}, f, indent=2)
+
+    if baseline:
+        regressions = find_regressions(summary, baseline, args.max_regression)
+        if regressions:
+            print(f"regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
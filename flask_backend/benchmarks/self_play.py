@@ -0,0 +1,174 @@
+"""Plays many bot-vs-bot games in parallel and reports engine throughput.
+
+Every player is a BotService. Games are driven through game_service's
+create_game, flip_tile and submit_word, like the server does, against an
+in-memory store in each worker process. Run from the flask_backend
+directory:
+
+    python -m benchmarks.self_play --games 200 --workers 8 --players 3 --difficulties easy,hard
+
+Games are seeded, so the same arguments replay the same games. Like
+engine_benchmark, this needs word_validation/dictionary.txt for realistic
+games. --min-moves-per-sec turns the run into a pass/fail speed check.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')  # per-move debug logging would dominate the timings
+
+from services import firebase_service, game_service, game_store
+from services.bot_service import BotService
+from benchmarks.engine_benchmark import ANAGRAM_INDEX_PATH, ensure_anagram_index, percentile
+
+
+def _start_worker():
+    # Each worker process plays its games against its own store
+    firebase_service.configure_store(game_store.InMemoryGameStore())
+
+
+def play_game(game_number, seed, difficulties, max_flips):
+    """Plays one game to the end and returns its statistics.
+
+    Players take turns flipping; after every flip each bot submits the move
+    it picks, if it finds one.
+
+    Args:
+        game_number (int): Makes the game's seed differ from the other games'.
+        seed (str): The run's seed.
+        difficulties (list[str]): One difficulty level per player.
+        max_flips (int): Stop the game after this many flips.
+
+    Returns:
+        dict: Move counts, move generation latencies, and the outcome.
+    """
+    game_seed = f'{seed}-{game_number}'
+    random.seed(game_seed)  # bots pick among equal moves with the module RNG
+    player_ids = [f'bot{index}' for index in range(len(difficulties))]
+    started = time.perf_counter()
+    game_id = game_service.create_game(player_ids[0], player_ids[0], 'self-play', seed=game_seed)
+    for player_id in player_ids[1:]:
+        game_service.add_player_to_game(game_id, player_id, player_id)
+    bots = [BotService(game_id, difficulty_level=difficulty, BOT_ID=player_id,
+                       anagram_map=ANAGRAM_INDEX_PATH)
+            for player_id, difficulty in zip(player_ids, difficulties)]
+
+    flips = words = rejected = 0
+    move_generation_seconds = []
+    for _ in range(max_flips):
+        game = game_service.get_game(game_id)
+        if not game.get('remainingLetters') or game.get('status') == 'winnerFound':
+            break
+        if not game_service.flip_tile(game_id, game['currentPlayerTurn'], game):
+            break
+        flips += 1
+
+        for bot in bots:
+            game = game_service.get_game(game_id)
+            move_started = time.perf_counter()
+            word = bot.choose_move(game)
+            move_generation_seconds.append(time.perf_counter() - move_started)
+            if word is None:
+                continue
+            result = game_service.submit_word(game_id, bot.BOT_ID, word['tileIds'], game)
+            # Rejected words are recorded as an action too, so they count as moves
+            if (result.get('submission_type') or 'INVALID').startswith('INVALID'):
+                rejected += 1
+            else:
+                words += 1
+
+    game = game_service.get_game(game_id)
+    game_service.delete_game(game_id)
+    winner = (game.get('winner') or {}).get('userId')
+    return {
+        'seconds': time.perf_counter() - started,
+        'flips': flips,
+        'words': words,
+        'rejected': rejected,
+        'move_generation_seconds': move_generation_seconds,
+        'winner_difficulty': difficulties[player_ids.index(winner)] if winner in player_ids else None,
+    }
+
+
+def run(games, workers, seed, difficulties, max_flips):
+    """Plays the games across a process pool and returns the per-game results and wall time."""
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker) as pool:
+        results = list(pool.map(play_game, range(games), [seed] * games,
+                                [difficulties] * games, [max_flips] * games))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, wall_seconds):
+    """Aggregates per-game results into throughput, latency and outcome numbers."""
+    latencies = sorted(s for result in results for s in result['move_generation_seconds'])
+    moves = sum(result['flips'] + result['words'] + result['rejected'] for result in results)
+    return {
+        'games': len(results),
+        'wall_seconds': wall_seconds,
+        'games_per_hour': len(results) / wall_seconds * 3600 if wall_seconds else 0.0,
+        'moves_per_sec': moves / wall_seconds if wall_seconds else 0.0,
+        'flips': sum(result['flips'] for result in results),
+        'words': sum(result['words'] for result in results),
+        'rejected': sum(result['rejected'] for result in results),
+        'move_generation_ms': {
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p90': percentile(latencies, 0.90) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'max': latencies[-1] * 1000 if latencies else 0.0,
+        },
+        'wins_by_difficulty': dict(Counter(result['winner_difficulty'] or 'no winner'
+                                           for result in results)),
+    }
+
+
+def print_report(summary):
+    latency = summary['move_generation_ms']
+    print(f"{summary['games']} games in {summary['wall_seconds']:.1f} s: "
+          f"{summary['games_per_hour']:,.0f} games/hour, {summary['moves_per_sec']:,.1f} moves/s "
+          f"({summary['flips']} flips, {summary['words']} words, {summary['rejected']} rejected)")
+    print(f"move generation: p50 {latency['p50']:.2f} ms, p90 {latency['p90']:.2f} ms, "
+          f"p99 {latency['p99']:.2f} ms, max {latency['max']:.2f} ms")
+    print("wins: " + ', '.join(f"{difficulty} {count}" for difficulty, count
+                               in sorted(summary['wins_by_difficulty'].items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--players', type=int, default=3, help='bots per game')
+    parser.add_argument('--difficulties', default='easy',
+                        help='comma-separated difficulty levels, assigned to the players in turn')
+    parser.add_argument('--seed', default='self-play', help='seed for tile order and bot choices')
+    parser.add_argument('--max-flips', type=int, default=200,
+                        help='stop a game after this many flips even if tiles remain')
+    parser.add_argument('--save', metavar='PATH', help='write the summary as JSON')
+    parser.add_argument('--min-moves-per-sec', type=float,
+                        help='exit with status 1 if throughput falls below this')
+    args = parser.parse_args()
+    ensure_anagram_index()  # before the workers start, so they don't race to build it
+
+    levels = args.difficulties.split(',')
+    difficulties = [levels[index % len(levels)] for index in range(args.players)]
+    results, wall_seconds = run(args.games, args.workers, args.seed, difficulties, args.max_flips)
+    summary = summarize(results, wall_seconds)
+    print_report(summary)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'settings': vars(args), **summary}, f, indent=2)
+    if args.min_moves_per_sec is not None and summary['moves_per_sec'] < args.min_moves_per_sec:
+        print(f"below {args.min_moves_per_sec:,.1f} moves/s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
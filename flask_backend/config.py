@@ -1 +1,68 @@
-LOCAL_DEV_PORT = '4000'
\ No newline at end of file
+import os
+
+LOCAL_DEV_PORT = '4000'
+
+# Where game state lives: 'firebase' (the Realtime Database) or 'memory'
+# (in-process, for local load tests and single-node deployments)
+GAME_STORE = os.environ.get('GAME_STORE', 'firebase')
+
+# Seconds a game snapshot may be reused across requests (0 disables the
+# process-wide cache; snapshots are always shared within one request). Only
+# writes made through run_game_transaction bump the version the cache checks,
+# so leave this off if other writers touch games directly.
+GAME_SNAPSHOT_CACHE_TTL = float(os.environ.get('GAME_SNAPSHOT_CACHE_TTL', '0'))
+
+# How new games store their tiles: 'objects' (a list of tile dicts, which
+# the Flutter client reads) or 'packed' (a few short strings, several times
+# smaller; see models/tile.py). Existing games are converted with
+# `python -m services.tile_service packed`.
+TILE_ENCODING = os.environ.get('TILE_ENCODING', 'objects')
+
+# Seed for the order tiles are flipped in. Unset, every game is shuffled
+# differently; set (for benchmarks and reproducing bugs), every new game flips
+# the same letters in the same order.
+GAME_RANDOM_SEED = os.environ.get('GAME_RANDOM_SEED') or None
+
+# Threads that play bot turns; the waiting between turns happens on one asyncio
+# event loop (see services/bot_scheduler.py)
+BOT_SCHEDULER_WORKERS = int(os.environ.get('BOT_SCHEDULER_WORKERS', '4'))
+# Seconds the bot waits after a human flip before taking its turn
+BOT_MIN_TURN_DELAY = float(os.environ.get('BOT_MIN_TURN_DELAY', '1'))
+BOT_MAX_TURN_DELAY = float(os.environ.get('BOT_MAX_TURN_DELAY', '8'))
+# Seconds the bot pauses between submitting a word and flipping a tile
+BOT_MIN_FLIP_DELAY = float(os.environ.get('BOT_MIN_FLIP_DELAY', '1'))
+BOT_MAX_FLIP_DELAY = float(os.environ.get('BOT_MAX_FLIP_DELAY', '4'))
+
+# How strong computer players are: 'easy', 'medium' or 'hard' (see
+# BOT_DIFFICULTIES in services/bot_service.py)
+BOT_DIFFICULTY = os.environ.get('BOT_DIFFICULTY', 'easy')
+
+# BotManager drops a game's bot after this many idle seconds, and keeps at
+# most this many bots (least recently used go first); dropped bots are
+# rebuilt from the game state on the game's next move
+BOT_SERVICE_IDLE_TTL = float(os.environ.get('BOT_SERVICE_IDLE_TTL', '1800'))
+BOT_SERVICE_MAX_COUNT = int(os.environ.get('BOT_SERVICE_MAX_COUNT', '1000'))
+
+# Fraction of score lookups (player_service.calculate_score) that also
+# recompute the game's scores from its words on a background thread and log
+# any drift from the stored scores; 0 turns the audit off
+SCORE_AUDIT_RATE = float(os.environ.get('SCORE_AUDIT_RATE', '0'))
+
+# Verified Firebase ID tokens remembered until they expire, so a player's
+# repeat requests skip the signature check (see services/auth_service.py)
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '10000'))
+
+# Request and game store metrics, served in the Prometheus text format at
+# /metrics (see services/metrics_service.py). METRICS_PAYLOAD_SAMPLE_RATE is
+# the fraction of store reads and writes whose JSON size is measured; each
+# measurement costs a json.dumps of the payload, so it is off (0) by default.
+# /metrics only answers requests from localhost unless METRICS_LOCAL_ONLY is
+# off.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_PAYLOAD_SAMPLE_RATE = float(os.environ.get('METRICS_PAYLOAD_SAMPLE_RATE', '0'))
+METRICS_LOCAL_ONLY = os.environ.get('METRICS_LOCAL_ONLY', '1') == '1'
+
+# Logging: LOG_LEVEL is a standard level name; LOG_FORMAT is 'color' (local
+# development), 'plain' or 'json' (one object per line, for production)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'color')
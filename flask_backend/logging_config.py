@@ -1,22 +1,62 @@
+import json
 import logging
-import colorlog
-
-# Set up colorful logging
-handler = colorlog.StreamHandler()
-formatter = colorlog.ColoredFormatter(
-    "%(log_color)s%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    log_colors={
-        "DEBUG": "cyan",
-        "INFO": "green",
-        "WARNING": "yellow",
-        "ERROR": "red",
-        "CRITICAL": "bold_red",
-    },
-)
-handler.setFormatter(formatter)
-
-# Set up logger
-logger = colorlog.getLogger("wordivore")
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+from config import LOG_LEVEL, LOG_FORMAT
+
+try:
+    import colorlog
+except ImportError:  # colorlog is a dev nicety, not a requirement
+    colorlog = None
+
+PLAIN_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, for log collectors."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, DATE_FORMAT),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def create_handler(log_format: str) -> logging.Handler:
+    """Creates the stream handler for a LOG_FORMAT of 'color', 'plain' or 'json'.
+
+    'color' falls back to 'plain' when colorlog isn't installed.
+    """
+    handler = logging.StreamHandler()
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    elif log_format == 'color' and colorlog is not None:
+        handler = colorlog.StreamHandler()
+        handler.setFormatter(colorlog.ColoredFormatter(
+            "%(log_color)s" + PLAIN_FORMAT,
+            datefmt=DATE_FORMAT,
+            log_colors={
+                "DEBUG": "cyan",
+                "INFO": "green",
+                "WARNING": "yellow",
+                "ERROR": "red",
+                "CRITICAL": "bold_red",
+            },
+        ))
+    else:
+        handler.setFormatter(logging.Formatter(PLAIN_FORMAT, datefmt=DATE_FORMAT))
+    return handler
+
+
+# Set up logger. Messages on hot paths use %-style arguments, so nothing is
+# formatted unless the level is enabled.
+logger = logging.getLogger("wordivore")
+if not logger.handlers:
+    logger.addHandler(create_handler(LOG_FORMAT))
+logger.setLevel(LOG_LEVEL.upper())
@@ -0,0 +1,85 @@
+from models.tile import PACKED_TILES_PATH, pack_tiles, unpack_tiles
+
+
+class GameState:
+    """Game data with tileId and wordId lookup indexes.
+
+    Wraps a game dict (or the part of it a transaction read) without copying
+    it, so changes made through the wrapper or directly to the returned tiles
+    and words land in the underlying data. The indexes are built once when
+    the wrapper is created; adding words through add_word keeps them current.
+
+    Games whose tiles are packed (see models/tile.py) are decoded into tile
+    dicts once, here; call store_tiles() after changing them to write them
+    back into the game data.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        packed = data.get(PACKED_TILES_PATH)
+        self.packed = packed is not None
+        self._tiles = unpack_tiles(packed) if self.packed else None
+        self._tile_indexes = {tile['tileId']: index
+                              for index, tile in enumerate(self.tiles) if tile}
+        self._word_indexes = {word['wordId']: index
+                              for index, word in enumerate(self.words) if word}
+
+    @classmethod
+    def of(cls, game_data):
+        """Returns game_data itself if it is already a GameState, otherwise wraps it."""
+        if isinstance(game_data, cls):
+            return game_data
+        return cls(game_data)
+
+    def __bool__(self):
+        return bool(self.data)
+
+    @property
+    def tiles(self) -> list:
+        if self.packed:
+            return self._tiles
+        return self.data.get('tiles') or []
+
+    @property
+    def words(self) -> list:
+        return self.data.get('words') or []
+
+    @property
+    def players(self) -> dict:
+        return self.data.get('players') or {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def tile_index(self, tile_id) -> int | None:
+        """Returns the position of a tile in the tiles list, or None if it doesn't exist."""
+        return self._tile_indexes.get(tile_id)
+
+    def tile(self, tile_id) -> dict | None:
+        """Returns the tile with the given ID, or None if it doesn't exist."""
+        index = self._tile_indexes.get(tile_id)
+        return None if index is None else self.tiles[index]
+
+    def word_index(self, word_id) -> int | None:
+        """Returns the position of a word in the words list, or None if it doesn't exist."""
+        return self._word_indexes.get(word_id)
+
+    def word(self, word_id) -> dict | None:
+        """Returns the word with the given ID, or None if it doesn't exist."""
+        index = self._word_indexes.get(word_id)
+        return None if index is None else self.data['words'][index]
+
+    def add_word(self, word: dict):
+        """Appends a word to the game and indexes it."""
+        words = self.data.setdefault('words', [])
+        words.append(word)
+        self._word_indexes[word['wordId']] = len(words) - 1
+
+    def store_tiles(self):
+        """Packs the tiles back into the game data if the game stores them packed.
+
+        Tile dicts of unpacked games are the game data itself, so there is
+        nothing to do for them.
+        """
+        if self.packed:
+            self.data[PACKED_TILES_PATH] = pack_tiles(self._tiles)
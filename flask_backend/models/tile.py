@@ -0,0 +1,143 @@
+"""Tile encodings for game documents.
+
+Games store their tiles in one of two encodings:
+
+'objects' (the original): ``tiles`` is a list of dicts, one per tile, with
+``tileId`` equal to the tile's position in the list::
+
+    {"letter": "A", "location": "middle", "tileId": 7, "flippedTimestamp": 1718000000000}
+
+'packed': ``packedTiles`` holds the same information in a few short strings,
+one entry per tile in tileId order::
+
+    {
+        "letters": "..A.QE",            # '.' for a tile that hasn't been flipped
+        "locations": "p,p,m,p,0,0",     # p: unflippedTilesPool, m: middle,
+                                        # n: index into wordIds
+        "flipped": ",,0,,1x3,2a",       # base-36 ms after flipBase, empty if never flipped
+        "flipBase": 1718000000000,
+        "wordIds": ["4f1c..."],
+    }
+
+A packed game document is several times smaller, which is what every
+transaction downloads and uploads. Clients that read ``tiles`` directly need
+the objects encoding, so it stays the default (see TILE_ENCODING in config).
+Code that handles game data goes through models.game.GameState, which
+decodes either encoding into tile dicts and packs them back.
+"""
+
+TILE_ENCODING_OBJECTS = 'objects'
+TILE_ENCODING_PACKED = 'packed'
+TILE_ENCODINGS = (TILE_ENCODING_OBJECTS, TILE_ENCODING_PACKED)
+
+PACKED_TILES_PATH = 'packedTiles'
+# Top-level game children that hold tiles, whichever the encoding
+TILE_PATHS = ['tiles', PACKED_TILES_PATH]
+# The order tiles are flipped in is fixed when the game is created (see
+# tile_service.new_draw_pile) and kept at gameDrawPiles/{gameId}, outside the
+# game node clients subscribe to, so players can't see the upcoming letters;
+# database.rules.json denies clients that node. The game itself only holds
+# the number of tiles drawn so far.
+DRAW_PILES_PATH = 'gameDrawPiles'
+DRAW_PILE_CURSOR_PATH = 'drawPileNext'
+
+UNFLIPPED_LOCATION = 'unflippedTilesPool'
+MIDDLE_LOCATION = 'middle'
+
+_NO_LETTER = '.'
+_LOCATION_CODES = {UNFLIPPED_LOCATION: 'p', MIDDLE_LOCATION: 'm'}
+_LOCATIONS_BY_CODE = {code: location for location, code in _LOCATION_CODES.items()}
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def _to_base36(number: int) -> str:
+    if number == 0:
+        return '0'
+    digits = []
+    while number:
+        number, remainder = divmod(number, 36)
+        digits.append(_DIGITS[remainder])
+    return ''.join(reversed(digits))
+
+
+def pack_tiles(tiles: list[dict]) -> dict:
+    """Encodes a list of tile dicts in the packed encoding.
+
+    Args:
+        tiles (list): The tiles, each with its position as tileId.
+
+    Returns:
+        dict: The value to store under PACKED_TILES_PATH.
+
+    Raises:
+        ValueError: If a tile's ID isn't its position or its letter isn't a
+            single character.
+    """
+    letters = []
+    locations = []
+    word_ids = []
+    word_codes = {}
+    timestamps = [tile.get('flippedTimestamp') for tile in tiles]
+    flip_base = min((t for t in timestamps if t is not None), default=0)
+
+    for index, tile in enumerate(tiles):
+        if not tile or tile.get('tileId') != index:
+            raise ValueError(f"Tile at position {index} doesn't have tileId {index}.")
+        letter = tile.get('letter') or _NO_LETTER
+        if len(letter) != 1:
+            raise ValueError(f"Tile {index} has letter {letter!r}, expected one character.")
+        letters.append(letter)
+
+        location = tile.get('location', UNFLIPPED_LOCATION)
+        code = _LOCATION_CODES.get(location)
+        if code is None:
+            code = word_codes.get(location)
+            if code is None:
+                code = word_codes[location] = str(len(word_ids))
+                word_ids.append(location)
+        locations.append(code)
+
+    return {
+        'letters': ''.join(letters),
+        'locations': ','.join(locations),
+        'flipped': ','.join('' if t is None else _to_base36(t - flip_base) for t in timestamps),
+        'flipBase': flip_base,
+        'wordIds': word_ids,
+    }
+
+
+def unpack_tiles(packed: dict) -> list[dict]:
+    """Decodes a packed tile encoding into a list of tile dicts.
+
+    Args:
+        packed (dict): The value stored under PACKED_TILES_PATH.
+
+    Returns:
+        list: New tile dicts, indexed by tileId.
+    """
+    letters = packed.get('letters') or ''
+    locations = (packed.get('locations') or '').split(',')
+    flipped = (packed.get('flipped') or '').split(',')
+    flip_base = packed.get('flipBase') or 0
+    word_ids = packed.get('wordIds') or []
+
+    tiles = []
+    for index, letter in enumerate(letters):
+        code = locations[index]
+        location = _LOCATIONS_BY_CODE.get(code)
+        tile = {
+            'letter': '' if letter == _NO_LETTER else letter,
+            'location': word_ids[int(code)] if location is None else location,
+            'tileId': index,
+        }
+        if index < len(flipped) and flipped[index]:
+            tile['flippedTimestamp'] = flip_base + int(flipped[index], 36)
+        tiles.append(tile)
+    return tiles
+
+
+def tile_encoding(game_data: dict) -> str:
+    """Returns the encoding a game's tiles are stored in."""
+    if game_data and game_data.get(PACKED_TILES_PATH) is not None:
+        return TILE_ENCODING_PACKED
+    return TILE_ENCODING_OBJECTS
@@ -0,0 +1,116 @@
+import uuid
+from datetime import datetime
+from services import firebase_service
+from logging_config import logger
+
+# A game's action log lives at games/{gameId}/actions, where the frontend
+# listens for it. Transactions never read it (see run_game_transaction); a
+# move only appends one child and bumps games/{gameId}/actionCount, the
+# number of actions ever logged. To keep the game document from growing with
+# the length of the game, the oldest actions are moved out once the log holds
+# ACTION_LOG_KEEP + ACTION_LOG_COMPACT_BATCH entries, leaving the most recent
+# ACTION_LOG_KEEP in place; the count tells a move when that is due without
+# reading the log. Moved actions are kept in snapshot chunks under
+# gameActionSnapshots/{gameId}/{chunkId}, keyed by their original action ID.
+# The live log therefore only shows the latest actions; the full history is
+# served by app.py's /game-history (see get_action_history).
+ACTION_LOG_KEEP = 50
+ACTION_LOG_COMPACT_BATCH = 50
+ACTION_SNAPSHOTS_PATH = 'gameActionSnapshots'
+ACTION_COUNT_PATH = 'actionCount'
+
+
+def new_action_id(action: dict) -> str:
+    """Returns a key for a new action that sorts in chronological order.
+
+    Args:
+        action (dict): The action, with its 'type' and 'timestamp'.
+    """
+    timestamp = action.get('timestamp') or int(datetime.now().timestamp() * 1000)
+    return f"{timestamp:013d}_{action['type']}_{uuid.uuid4().hex[:12]}"
+
+
+def _action_order(item):
+    action_id, action = item
+    return (action or {}).get('timestamp', 0), action_id
+
+
+def compaction_due(action_count: int, keep: int = ACTION_LOG_KEEP,
+                   batch: int = ACTION_LOG_COMPACT_BATCH) -> bool:
+    """Whether a game whose actionCount just reached action_count should compact its log.
+
+    Every batch actions after the first keep + batch, i.e. whenever the log
+    would hold keep + batch actions had each compaction succeeded. A failed
+    compaction is retried batch actions later.
+    """
+    return action_count >= keep + batch and (action_count - keep) % batch == 0
+
+
+def compact_action_log(game_id: str, keep: int = ACTION_LOG_KEEP,
+                       batch: int = ACTION_LOG_COMPACT_BATCH, action_count: int = None) -> int:
+    """Moves the oldest actions of a game into a snapshot chunk if the log is long enough.
+
+    Given the game's action_count, the log isn't read at all unless
+    compaction_due says so; otherwise the check reads only the action keys.
+    When the log holds at least
+    keep + batch actions, everything but the newest keep is written to a new
+    snapshot chunk and removed from the log in a single multi-path update, so
+    readers see each action in exactly one place. Actions are stored in the
+    chunk under their own keys, so two servers compacting the same game at
+    once write the same entries instead of losing any.
+
+    Args:
+        game_id (str): The ID of the game.
+        keep (int): Number of recent actions to leave in the log.
+        batch (int): Minimum number of actions to move at once.
+        action_count (int, optional): The game's actionCount after the move
+            that just committed.
+
+    Returns:
+        int: The number of actions moved.
+    """
+    if action_count is not None and not compaction_due(action_count, keep, batch):
+        return 0
+    actions_ref = firebase_service.get_db_reference(f'games/{game_id}/actions')
+    action_ids = actions_ref.get(shallow=True) or {}
+    if len(action_ids) < keep + batch:
+        return 0
+
+    actions = actions_ref.get() or {}
+    ordered = sorted(actions.items(), key=_action_order)
+    folded = ordered[:len(ordered) - keep]
+    if not folded:
+        return 0
+
+    chunk_id = folded[0][0]
+    updates = {}
+    for action_id, action in folded:
+        updates[f'{ACTION_SNAPSHOTS_PATH}/{game_id}/{chunk_id}/{action_id}'] = action
+        updates[f'games/{game_id}/actions/{action_id}'] = None
+    firebase_service.get_db_reference(None).update(updates)
+    firebase_service.invalidate_game_snapshot(game_id)
+    logger.debug("[compact_action_log] Moved %s actions of game %s into snapshot %s",
+                 len(folded), game_id, chunk_id)
+    return len(folded)
+
+
+def get_action_history(game_id: str) -> list[tuple[str, dict]]:
+    """Returns a game's complete action history, snapshots included, oldest first.
+
+    Args:
+        game_id (str): The ID of the game.
+
+    Returns:
+        list: (action_id, action) pairs in chronological order.
+    """
+    history = {}
+    chunks = firebase_service.get_db_reference(f'{ACTION_SNAPSHOTS_PATH}/{game_id}').get() or {}
+    for chunk in chunks.values():
+        history.update(chunk)
+    history.update(firebase_service.get_db_reference(f'games/{game_id}/actions').get() or {})
+    return sorted(history.items(), key=_action_order)
+
+
+def delete_action_history(game_id: str):
+    """Deletes a game's action snapshots (the live log goes with the game)."""
+    firebase_service.get_db_reference(f'{ACTION_SNAPSHOTS_PATH}/{game_id}').delete()
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from google.auth import exceptions, jwt
+import google.auth.transport.requests
+from config import AUTH_TOKEN_CACHE_SIZE
+from logging_config import logger
+
+# Firebase ID token verification without a network call per request.
+#
+# google.oauth2.id_token.verify_firebase_token downloads Google's signing
+# certificates and checks the token's signature on every call. Here the
+# certificates are fetched once and refreshed by a background thread before
+# they expire, and a token that passed verification is remembered (by its
+# SHA-256) until its own `exp`, so a player's repeat requests skip both the
+# fetch and the signature check. The checks themselves are the ones
+# verify_firebase_token makes: signature, `iat` and `exp`.
+FIREBASE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+# Used when the certificate response has no Cache-Control max-age
+CERTS_DEFAULT_MAX_AGE = 3600
+# Wait before retrying a failed refresh, and the shortest time between
+# refreshes triggered by tokens signed with a key we don't know yet
+CERTS_RETRY_INTERVAL = 60
+
+
+class ExpiredTokenError(ValueError):
+    """The token's `exp` has passed."""
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens against cached certificates and remembers the results."""
+
+    def __init__(self, request_adapter=None, certs_url=FIREBASE_CERTS_URL,
+                 cache_size=AUTH_TOKEN_CACHE_SIZE):
+        self._request = request_adapter or google.auth.transport.requests.Request()
+        self._certs_url = certs_url
+        self._cache_size = cache_size
+        self._certs = None
+        self._certs_fetched_at = 0.0
+        self._certs_max_age = CERTS_DEFAULT_MAX_AGE
+        self._certs_lock = threading.Lock()
+        self._tokens = OrderedDict()  # token hash -> (claims, exp), least recently used first
+        self._tokens_lock = threading.Lock()
+        self._refresher = None
+        self._counters = {'cache_hits': 0, 'verified': 0, 'cert_fetches': 0}
+
+    def verify(self, token) -> dict:
+        """Returns the claims of a valid token.
+
+        Raises:
+            ExpiredTokenError: If the token has expired.
+            ValueError: If the token is malformed or its signature doesn't verify.
+            google.auth.exceptions.TransportError: If the certificates
+                couldn't be fetched and none are cached.
+        """
+        if isinstance(token, str):
+            token = token.encode('utf-8')
+        key = hashlib.sha256(token).digest()
+        now = time.time()
+
+        with self._tokens_lock:
+            entry = self._tokens.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._tokens.move_to_end(key)
+                    self._counters['cache_hits'] += 1
+                    return claims
+                del self._tokens[key]
+
+        # Reading the claims before checking the signature is safe: they are
+        # only used to report expiry, never trusted
+        unverified = jwt.decode(token, verify=False)
+        if unverified.get('exp', 0) <= now:
+            raise ExpiredTokenError('Token expired')
+
+        claims = self._decode(token)
+        with self._tokens_lock:
+            self._tokens[key] = (claims, claims['exp'])
+            while len(self._tokens) > self._cache_size:
+                self._tokens.popitem(last=False)
+            self._counters['verified'] += 1
+        return claims
+
+    def _decode(self, token) -> dict:
+        certs = self._get_certs()
+        # google-auth rejects a key ID it has no certificate for as malformed,
+        # so check for one before decoding: Google may have rotated its keys
+        # since the last refresh
+        key_id = jwt.decode_header(token).get('kid')
+        if key_id is not None and key_id not in certs and self._refresh_allowed():
+            logger.info("Token signed with unknown key %s, refreshing certificates", key_id)
+            certs = self._fetch_certs()
+        return jwt.decode(token, certs=certs)
+
+    def start(self):
+        """Fetches the certificates now and keeps them fresh in the background.
+
+        Call at startup so the first request doesn't wait for the download;
+        otherwise the first verify() does it.
+        """
+        self._get_certs()
+
+    def _get_certs(self) -> dict:
+        if self._certs is None:
+            with self._certs_lock:
+                if self._certs is None:
+                    self._fetch_certs()
+                    self._start_refresher()
+        return self._certs
+
+    def _refresh_allowed(self) -> bool:
+        return time.monotonic() - self._certs_fetched_at >= CERTS_RETRY_INTERVAL
+
+    def _fetch_certs(self) -> dict:
+        """Downloads the certificates, caches them and returns them."""
+        response = self._request(self._certs_url, method='GET')
+        if response.status != 200:
+            raise exceptions.TransportError(f"Could not fetch certificates at {self._certs_url}")
+        self._certs = json.loads(response.data.decode('utf-8'))
+        self._certs_fetched_at = time.monotonic()
+        self._certs_max_age = _max_age(response.headers)
+        self._counters['cert_fetches'] += 1
+        return self._certs
+
+    def _start_refresher(self):
+        if self._refresher is None:
+            self._refresher = threading.Thread(
+                target=self._refresh_certs_forever, name='firebase-certs-refresher', daemon=True)
+            self._refresher.start()
+
+    def _refresh_certs_forever(self):
+        delay = self._certs_max_age / 2
+        while True:
+            time.sleep(delay)
+            try:
+                self._fetch_certs()
+                delay = self._certs_max_age / 2
+            except Exception as e:
+                # Keep using the certificates we have; they stay valid for a while
+                logger.warning("Refreshing Firebase certificates failed: %s", e)
+                delay = CERTS_RETRY_INTERVAL
+
+    def stats(self) -> dict:
+        """Cache size and hit counters."""
+        with self._tokens_lock:
+            return {'cached_tokens': len(self._tokens), **self._counters}
+
+
+def _max_age(headers) -> float:
+    cache_control = next((value for name, value in (headers or {}).items()
+                          if name.lower() == 'cache-control'), '')
+    for directive in cache_control.split(','):
+        name, _, value = directive.strip().partition('=')
+        if name == 'max-age' and value.isdigit():
+            return max(float(value), CERTS_RETRY_INTERVAL * 2)
+    return CERTS_DEFAULT_MAX_AGE
@@ -0,0 +1,198 @@
+import sys
+from services import word_search_service
+from models.game import GameState
+from logging_config import logger
+
+WORD_ACTION_TYPES = ('MIDDLE_WORD', 'OWN_WORD_IMPROVEMENT', 'STEAL_WORD')
+
+
+class BotCandidateCache:
+    """Keeps a bot's candidate moves for one game up to date between turns.
+
+    The cache holds the playable middle words and, per valid word on the
+    board, the words it can be extended into. Instead of searching from
+    scratch every turn, it replays the game's ``actions`` log since the last
+    update: a flipped tile only adds the candidates that use that tile, and a
+    submitted word only drops the candidates that used its tiles and searches
+    extensions for the new word. The game snapshot is used as a guard; if the
+    replayed state doesn't match it, the cache is rebuilt from the snapshot.
+
+    The search can be capped: max_word_length bounds how long a word it looks
+    for, extension_owner_id limits extensions to that player's words, and
+    update takes a deadline. Words the search skipped because the deadline
+    passed are only looked for again when the cache is rebuilt.
+    """
+
+    def __init__(self, anagram_index, max_word_length=None, extension_owner_id=None):
+        self.anagram_index = anagram_index
+        self.max_word_length = max_word_length
+        self.extension_owner_id = extension_owner_id
+        self._deadline = None
+        self.reset()
+
+    def reset(self):
+        """Forgets everything; the next update rebuilds from the snapshot."""
+        self._initialized = False
+        self._seen_action_ids = set()
+        self._middle_tiles = {}       # tileId -> tile
+        self._words = {}              # wordId -> valid word
+        self._middle_words = {}       # (word, tileIds) -> candidate
+        self._extensions = {}         # wordId -> {(word, tileIds) -> candidate}
+
+    @property
+    def middle_words(self):
+        return list(self._middle_words.values())
+
+    @property
+    def extension_words(self):
+        return [candidate
+                for word_id in self._words
+                for candidate in self._extensions.get(word_id, {}).values()]
+
+    def approximate_size(self):
+        """Returns a rough estimate of the heap used by the cache, in bytes.
+
+        Safe to call from another thread while the bot is updating the cache.
+        """
+        size = sum(sys.getsizeof(container) for container in (
+            self._seen_action_ids, self._middle_tiles, self._words, self._extensions))
+        size += sum(sys.getsizeof(action_id) for action_id in list(self._seen_action_ids))
+        # The candidate dicts, _middle_words included, are counted here
+        for candidates in [self._middle_words, *list(self._extensions.values())]:
+            size += sys.getsizeof(candidates)
+            for candidate in list(candidates.values()):
+                size += sys.getsizeof(candidate) + sys.getsizeof(candidate['tileIds'])
+        return size
+
+    def update(self, game, deadline=None):
+        """Brings the cache in line with a game snapshot.
+
+        Args:
+            game (dict): The current game data, including its 'actions' log.
+            deadline (float, optional): time.perf_counter() value after which
+                searches stop; candidates not found by then are left out.
+        """
+        self._deadline = deadline
+        actions = game.get('actions') or {}
+        if not self._initialized:
+            self._rebuild(game)
+            self._seen_action_ids = set(actions)
+            return
+
+        new_actions = [(action_id, action) for action_id, action in actions.items()
+                       if action_id not in self._seen_action_ids]
+        # Flips sort first on ties: a word can't use a tile flipped after it
+        new_actions.sort(key=lambda item: (item[1].get('timestamp', 0),
+                                           item[1].get('type') != 'flip_tile'))
+        for action_id, action in new_actions:
+            self._apply_action(action)
+            self._seen_action_ids.add(action_id)
+        # Forget actions that were compacted out of the log; if any were
+        # dropped before we saw them, _matches catches it and we rebuild.
+        self._seen_action_ids = set(actions)
+
+        if not self._matches(game):
+            logger.warning(
+                "[BotCandidateCache] Replayed actions don't match game state; rebuilding.")
+            self._rebuild(game)
+            self._seen_action_ids = set(actions)
+
+    def _rebuild(self, game):
+        self.reset()
+        for tile in GameState.of(game).tiles:
+            if tile and tile.get('location') == 'middle':
+                self._middle_tiles[tile['tileId']] = tile
+        for word in game.get('words', []):
+            if word.get('status') == 'valid':
+                self._words[word['wordId']] = self._board_word(word)
+
+        middle_tiles = list(self._middle_tiles.values())
+        # Extensions first: they are cheap to find, and a long middle search
+        # shouldn't use up the deadline before steals are looked for
+        for word_id in self._words:
+            self._add_extensions(word_id, middle_tiles)
+        for candidate in word_search_service.find_middle_words(
+                self.anagram_index, middle_tiles,
+                max_length=self.max_word_length, deadline=self._deadline):
+            self._middle_words[self._candidate_key(candidate)] = candidate
+        self._initialized = True
+
+    def _apply_action(self, action):
+        action_type = action.get('type')
+        if action_type == 'flip_tile':
+            self._add_middle_tile({'tileId': action['tileId'], 'letter': action['tileLetter'],
+                                   'location': 'middle'})
+        elif action_type in WORD_ACTION_TYPES:
+            self._add_word({
+                'word': action['word'],
+                'wordId': action['wordId'],
+                'tileIds': action['tileIds'],
+                'current_owner_user_id': action['playerId'],
+            })
+        # Invalid submissions don't change the board
+
+    def _add_middle_tile(self, tile):
+        if tile['tileId'] in self._middle_tiles:
+            return
+        self._middle_tiles[tile['tileId']] = tile
+        middle_tiles = list(self._middle_tiles.values())
+        for word_id in self._words:
+            self._add_extensions(word_id, middle_tiles, forced_tile_id=tile['tileId'])
+        for candidate in word_search_service.find_middle_words(
+                self.anagram_index, middle_tiles, forced_tile_id=tile['tileId'],
+                max_length=self.max_word_length, deadline=self._deadline):
+            self._middle_words[self._candidate_key(candidate)] = candidate
+
+    def _add_word(self, word):
+        used_tile_ids = set(word['tileIds'])
+
+        # Words whose tiles were all taken into the new word are gone
+        for word_id in [word_id for word_id, existing in self._words.items()
+                        if set(existing['tileIds']) <= used_tile_ids]:
+            del self._words[word_id]
+            self._extensions.pop(word_id, None)
+
+        used_middle_tile_ids = used_tile_ids & self._middle_tiles.keys()
+        if used_middle_tile_ids:
+            for tile_id in used_middle_tile_ids:
+                del self._middle_tiles[tile_id]
+            self._middle_words = {key: candidate for key, candidate in self._middle_words.items()
+                                  if used_middle_tile_ids.isdisjoint(key[1])}
+            for word_id, extensions in self._extensions.items():
+                self._extensions[word_id] = {
+                    key: candidate for key, candidate in extensions.items()
+                    if used_middle_tile_ids.isdisjoint(key[1])}
+
+        self._words[word['wordId']] = self._board_word(word)
+        self._add_extensions(word['wordId'], list(self._middle_tiles.values()))
+
+    def _add_extensions(self, word_id, middle_tiles, forced_tile_id=None):
+        word = self._words[word_id]
+        if self.extension_owner_id is not None and \
+                word['current_owner_user_id'] != self.extension_owner_id:
+            return
+        extensions = self._extensions.setdefault(word_id, {})
+        for candidate in word_search_service.find_extension_words(
+                self.anagram_index, word, middle_tiles, forced_tile_id=forced_tile_id,
+                max_length=self.max_word_length, deadline=self._deadline):
+            extensions[self._candidate_key(candidate)] = candidate
+
+    def _matches(self, game):
+        middle_tile_ids = {tile['tileId'] for tile in GameState.of(game).tiles
+                           if tile and tile.get('location') == 'middle'}
+        word_ids = {word['wordId'] for word in game.get('words', [])
+                    if word.get('status') == 'valid'}
+        return middle_tile_ids == self._middle_tiles.keys() and word_ids == self._words.keys()
+
+    @staticmethod
+    def _board_word(word):
+        return {
+            'word': word['word'],
+            'wordId': word['wordId'],
+            'tileIds': list(word['tileIds']),
+            'current_owner_user_id': word['current_owner_user_id'],
+        }
+
+    @staticmethod
+    def _candidate_key(candidate):
+        return candidate['word'], tuple(candidate['tileIds'])
@@ -1,10 +1,37 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from services import bot_service, metrics_service
+from logging_config import logger
+from services.bot_scheduler import BotScheduler
+from config import (BOT_SCHEDULER_WORKERS, BOT_MIN_TURN_DELAY, BOT_MAX_TURN_DELAY,
+                    BOT_SERVICE_IDLE_TTL, BOT_SERVICE_MAX_COUNT)
 
-from services import bot_service
+# Seconds between sweeps for idle services, so games that all went quiet
+# still release their bots' memory
+EVICT_IDLE_INTERVAL = 60
 
 class BotManager:
+    """Keeps one BotService per computer game.
+
+    Services are kept in least-recently-used order. A service that hasn't
+    been used for BOT_SERVICE_IDLE_TTL seconds, or the least recently used
+    one once there are more than BOT_SERVICE_MAX_COUNT, is dropped; games
+    whose players just closed the tab never call /end-game. A dropped
+    service is rebuilt from the game state the next time the game needs its
+    bot, so eviction only costs a candidate search, never a move.
+    """
     _instance = None
-    _bot_services = {}
+    _bot_services = OrderedDict()  # game_id -> BotService, least recently used first
+    _last_used = {}
+    _lock = threading.Lock()
+    _counters = {'created': 0, 'removed': 0, 'evicted_idle': 0, 'evicted_lru': 0}
     _anagram_map_path = None
+    _scheduler = None
+    idle_ttl = BOT_SERVICE_IDLE_TTL
+    max_services = BOT_SERVICE_MAX_COUNT
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
@@ -12,29 +39,140 @@ class BotManager:
         return cls._instance
 
     def configure(self, anagram_map_path):
-        """Configure the manager with the path to the anagram map."""
+        """Configure the manager with the path to the anagram index."""
         if not self._anagram_map_path:
             self._anagram_map_path = anagram_map_path
+        if not self._scheduler:
+            BotManager._scheduler = BotScheduler(self._take_turn, workers=BOT_SCHEDULER_WORKERS)
+            metrics_service.register_collector(self._scheduler_metrics)
+            metrics_service.register_collector(self._service_metrics)
+            self._scheduler.every(min(EVICT_IDLE_INTERVAL, self.idle_ttl), self.evict_idle)
 
     def get_service(self, game_id):
         """Get or create a BotService for a given game_id."""
-        if game_id not in self._bot_services:
-            if not self._anagram_map_path:
-                raise Exception("BotManager must be configured with an anagram_map_path before use.")
-            
-            print(f"Creating new BotService for game_id: {game_id}")
-            self._bot_services[game_id] = bot_service.BotService(
-                game_id=game_id,
-                anagram_map=self._anagram_map_path
-            )
-        return self._bot_services[game_id]
+        with self._lock:
+            now = time.monotonic()
+            service = self._bot_services.get(game_id)
+            if service is None:
+                if not self._anagram_map_path:
+                    raise Exception("BotManager must be configured with an anagram_map_path before use.")
+
+                logger.info("Creating new BotService for game_id: %s", game_id)
+                service = bot_service.BotService(
+                    game_id=game_id,
+                    anagram_map=self._anagram_map_path
+                )
+                self._bot_services[game_id] = service
+                self._counters['created'] += 1
+            else:
+                self._bot_services.move_to_end(game_id)
+            self._last_used[game_id] = now
+            self._evict(now)
+            return service
+
+    def _evict(self, now):
+        # Called with the lock held. The service being used right now sits at
+        # the end with a fresh timestamp, so it is never the one evicted.
+        while self._bot_services:
+            game_id = next(iter(self._bot_services))
+            if now - self._last_used[game_id] > self.idle_ttl:
+                reason = 'evicted_idle'
+            elif len(self._bot_services) > max(self.max_services, 1):
+                reason = 'evicted_lru'
+            else:
+                return
+            del self._bot_services[game_id]
+            del self._last_used[game_id]
+            self._counters[reason] += 1
+            logger.info("Evicted BotService for game_id: %s (%s)", game_id, reason)
+
+    def evict_idle(self):
+        """Drop services that have been idle for longer than idle_ttl.
+
+        get_service already does this on every call; the scheduler also runs
+        this every EVICT_IDLE_INTERVAL seconds so memory is trimmed without a
+        game being played.
+        """
+        with self._lock:
+            self._evict(time.monotonic())
+
+    def schedule_turn(self, game_id, delay=None):
+        """Ask the bot to take its turn in a game after a short, human-like delay.
+
+        Repeated calls before the turn has run are coalesced into one turn.
+        """
+        if not self._scheduler:
+            raise Exception("BotManager must be configured before scheduling bot turns.")
+        self.get_service(game_id)
+        if delay is None:
+            delay = random.uniform(BOT_MIN_TURN_DELAY, BOT_MAX_TURN_DELAY)
+        self._scheduler.schedule(game_id, delay)
+
+    def scheduler_stats(self):
+        """Queue depth and counters of the bot scheduler."""
+        return self._scheduler.stats() if self._scheduler else {}
+
+    def _scheduler_metrics(self):
+        stats = self.scheduler_stats()
+        return {
+            'carnivore_bot_turns_pending': stats['pending'],
+            'carnivore_bot_turns_running': stats['running'],
+            'carnivore_bot_turn_reruns_queued': stats['reruns_queued'],
+            'carnivore_bot_turn_max_overdue_seconds': stats['max_overdue_seconds'],
+            'carnivore_bot_turn_workers': stats['workers'],
+            **{f'carnivore_bot_turns_{name}_total': stats[name]
+               for name in ('scheduled', 'coalesced', 'cancelled', 'completed', 'failed')},
+        }
+
+    def _service_metrics(self):
+        stats = self.stats()
+        return {
+            'carnivore_bot_services': stats['live_services'],
+            'carnivore_bot_services_max': stats['max_services'],
+            'carnivore_bot_candidate_cache_bytes': stats['candidate_cache_bytes'],
+            'carnivore_bot_anagram_index_bytes': stats['anagram_index_bytes'],
+            **{f'carnivore_bot_services_{name}_total': stats[name]
+               for name in ('created', 'removed', 'evicted_idle', 'evicted_lru')},
+        }
+
+    def stats(self):
+        """Live service count, eviction counters and approximate memory use.
+
+        candidate_cache_bytes is the heap used by the services' candidate
+        caches; the anagram index is memory-mapped and shared by all of them,
+        so it is reported once as anagram_index_bytes.
+        """
+        with self._lock:
+            services = list(self._bot_services.values())
+            counters = dict(self._counters)
+        index_bytes = 0
+        if self._anagram_map_path and os.path.exists(self._anagram_map_path):
+            index_bytes = os.path.getsize(self._anagram_map_path)
+        return {
+            'live_services': len(services),
+            'max_services': self.max_services,
+            'idle_ttl_seconds': self.idle_ttl,
+            **counters,
+            'candidate_cache_bytes': sum(service.candidate_cache.approximate_size()
+                                         for service in services),
+            'anagram_index_bytes': index_bytes,
+        }
+
+    def _take_turn(self, game_id):
+        # Rebuilds the service if it was evicted while the turn was waiting;
+        # ended games never get here because remove_service cancels their turns
+        return self.get_service(game_id).take_turn()
 
     def remove_service(self, game_id):
         """Remove a BotService when a game is finished."""
-        if game_id in self._bot_services:
-            print(f"Cleaning up BotService for game_id: {game_id}")
-            del self._bot_services[game_id]
+        if self._scheduler:
+            self._scheduler.cancel(game_id)
+        with self._lock:
+            if game_id in self._bot_services:
+                logger.info("Cleaning up BotService for game_id: %s", game_id)
+                del self._bot_services[game_id]
+                del self._last_used[game_id]
+                self._counters['removed'] += 1
 
 # Create a single, global instance of the manager
 bot_manager = BotManager()
-
@@ -0,0 +1,202 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from logging_config import logger
+
+
+class _GameBot:
+    """Scheduling state of one game's bot; only touched on the event loop."""
+
+    def __init__(self, due: float):
+        self.due = due
+        self.running = False
+        self.rerun_delay = None
+        self.task = None
+
+
+class BotScheduler:
+    """Drives every game's bot from one asyncio event loop.
+
+    Each game with a pending bot turn has one coroutine on a loop running in
+    a background thread. The coroutine waits with ``asyncio.sleep`` and then
+    plays the turn; game state is read and written through the blocking
+    Firebase SDK, so the turn itself runs on a small thread pool
+    (``workers``) while the loop keeps the waiting games. Thousands of idle
+    bots therefore cost a task each, not a thread each.
+
+    Each game has at most one bot turn waiting or running. Triggering a game
+    that already has a turn waiting keeps the earlier due time; triggering a
+    game whose turn is running queues exactly one rerun after it finishes. A
+    turn can ask to run again by returning a delay in seconds, which is how
+    the bot pauses between submitting a word and flipping a tile.
+
+    cancel() cancels the game's coroutine right away. A turn that is already
+    running on the pool can't be interrupted, but its result is dropped and
+    nothing is scheduled after it.
+    """
+
+    def __init__(self, run_turn, workers: int = 4):
+        """
+        Args:
+            run_turn (callable): Called with a game_id to play one turn. May
+                return a delay in seconds to run the game's turn again.
+            workers (int): Number of threads that run turns.
+        """
+        self._run_turn = run_turn
+        self._worker_count = workers
+        self._executor = None
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+        self._bots = {}                # game_id -> _GameBot
+        self._periodic = []            # tasks started by every()
+        self._counters = {'scheduled': 0, 'coalesced': 0, 'cancelled': 0,
+                          'completed': 0, 'failed': 0}
+
+    def schedule(self, game_id: str, delay: float = 0):
+        """Asks for a bot turn in a game after delay seconds.
+
+        Args:
+            game_id (str): The ID of the game.
+            delay (float): Seconds to wait before the turn.
+        """
+        self._call_soon(self._schedule, game_id, max(delay, 0))
+
+    def cancel(self, game_id: str):
+        """Cancels a game's waiting or running bot turn and any queued rerun."""
+        if self._loop is not None:
+            self._call_soon(self._cancel, game_id)
+
+    def every(self, interval: float, callback):
+        """Runs callback on the turn threads every interval seconds until shutdown.
+
+        For housekeeping that should happen even while no game is active.
+        Starts the scheduler if it isn't running yet.
+        """
+        self._call_soon(self._every, interval, callback)
+
+    def stats(self) -> dict:
+        """Returns queue depth and counters for monitoring."""
+        if self._loop is None or self._stopped:
+            return {'workers': 0, 'pending': 0, 'running': 0, 'reruns_queued': 0,
+                    'max_overdue_seconds': 0.0, **self._counters}
+        future = asyncio.run_coroutine_threadsafe(self._stats(), self._loop)
+        return future.result(timeout=5)
+
+    def shutdown(self, wait: bool = True):
+        """Cancels every bot and stops the event loop."""
+        with self._start_lock:
+            if self._loop is None or self._stopped:
+                self._stopped = True
+                return
+            self._stopped = True
+        asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if wait:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def _call_soon(self, callback, *args):
+        with self._start_lock:
+            if self._stopped:
+                return
+            if self._loop is None:
+                self._start()
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    def _start(self):
+        # Called with _start_lock held
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._worker_count, thread_name_prefix='bot-turn')
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name='bot-scheduler', daemon=True)
+        self._thread.start()
+
+    # Everything below runs on the event loop
+
+    def _schedule(self, game_id, delay):
+        now = self._loop.time()
+        bot = self._bots.get(game_id)
+        if bot is not None and bot.running:
+            bot.rerun_delay = delay if bot.rerun_delay is None else min(bot.rerun_delay, delay)
+            self._counters['coalesced'] += 1
+            return
+        if bot is not None:
+            if bot.due <= now + delay:
+                self._counters['coalesced'] += 1
+                return
+            bot.task.cancel()  # still waiting; restart it with the earlier due time
+
+        bot = _GameBot(now + delay)
+        bot.task = self._loop.create_task(self._run_bot(game_id, bot, delay))
+        self._bots[game_id] = bot
+        self._counters['scheduled'] += 1
+
+    def _cancel(self, game_id):
+        bot = self._bots.pop(game_id, None)
+        if bot is not None:
+            bot.task.cancel()
+            self._counters['cancelled'] += 1
+
+    async def _cancel_all(self):
+        for game_id in list(self._bots):
+            self._cancel(game_id)
+        for task in self._periodic:
+            task.cancel()
+
+    def _every(self, interval, callback):
+        async def repeat():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self._loop.run_in_executor(self._executor, callback)
+                except Exception as e:
+                    logger.exception("[BotScheduler] Periodic job %s failed: %s", callback, e)
+
+        self._periodic.append(self._loop.create_task(repeat()))
+
+    async def _stats(self):
+        now = self._loop.time()
+        waiting = [bot for bot in self._bots.values() if not bot.running]
+        overdue = [now - bot.due for bot in waiting if bot.due <= now]
+        return {
+            'workers': self._worker_count,
+            'pending': len(waiting),
+            'running': len(self._bots) - len(waiting),
+            'reruns_queued': sum(bot.rerun_delay is not None for bot in self._bots.values()),
+            'max_overdue_seconds': round(max(overdue, default=0.0), 3),
+            **self._counters,
+        }
+
+    async def _run_bot(self, game_id, bot, delay):
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                bot.running = True
+                started = time.monotonic()
+                try:
+                    follow_up = await self._loop.run_in_executor(
+                        self._executor, self._run_turn, game_id)
+                    self._counters['completed'] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception("[BotScheduler] Bot turn failed for game %s: %s", game_id, e)
+                    self._counters['failed'] += 1
+                    follow_up = None
+                logger.debug(
+                    "[BotScheduler] Bot turn for game %s took %.3fs", game_id, time.monotonic() - started)
+
+                delays = [d for d in (follow_up, bot.rerun_delay) if d is not None]
+                if not delays:
+                    return
+                delay = max(min(delays), 0)
+                bot.due = self._loop.time() + delay
+                bot.running = False
+                bot.rerun_delay = None
+        finally:
+            if self._bots.get(game_id) is bot:
+                del self._bots[game_id]
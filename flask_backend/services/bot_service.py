@@ -1,212 +1,260 @@
-import time
+import heapq
 import random
+import time
 from datetime import datetime, timedelta
-from firebase_admin import db
 # from trie_bot import generate_bot_moves
-from services import game_service, firebase_service
-import pickle
-import itertools
+from services import game_service, firebase_service, hashmap_service, word_search_service
+from services.bot_candidate_cache import BotCandidateCache
+from config import BOT_MIN_FLIP_DELAY, BOT_MAX_FLIP_DELAY, BOT_DIFFICULTY
+from logging_config import logger
 BOT_ID = "computer"
 BOT_DELAY = 3  # seconds after last move
 
+# How hard each difficulty level looks for a good move. Each decision, from
+# updating the candidate moves to scoring them, gets time_budget seconds.
+# The search only looks for words of up to max_word_length letters (None for
+# any length) and only for the kinds of moves in move_types; easy bots never
+# steal, so they don't search other players' words at all. The bot then
+# scores at most max_candidates of the candidates (the longest words first)
+# and picks randomly among the top_choices best scored moves.
+BOT_DIFFICULTIES = {
+    'easy': {'move_types': ('MIDDLE_WORD', 'OWN_WORD_IMPROVEMENT'), 'max_word_length': 5,
+             'max_candidates': 20, 'time_budget': 0.01, 'top_choices': 5},
+    'medium': {'move_types': ('MIDDLE_WORD', 'OWN_WORD_IMPROVEMENT', 'STEAL_WORD'),
+               'max_word_length': 7, 'max_candidates': 200, 'time_budget': 0.05,
+               'top_choices': 2},
+    'hard': {'move_types': ('MIDDLE_WORD', 'OWN_WORD_IMPROVEMENT', 'STEAL_WORD'),
+             'max_word_length': None, 'max_candidates': 2000, 'time_budget': 0.2,
+             'top_choices': 1},
+}
+# Share of a decision's time budget spent finding candidate moves; the rest
+# is left for scoring them
+SEARCH_BUDGET_SHARE = 0.75
+# Points a robbed tile counts for when it is taken from the leading opponent
+LEADER_DENIAL_WEIGHT = 1.5
+# Added to the score of a move that wins the game outright
+WINNING_MOVE_BONUS = 1000
+
+
+def score_move(move_type, candidate, bot_id, players, max_score_to_win=None):
+    """Scores a candidate move by the points it gains the bot and denies its opponents.
+
+    Points follow game_service.submit_word: a middle word or a steal scores
+    every tile of the new word, an own-word improvement only the middle
+    tiles it adds, and a steal takes the stolen word's tiles off its owner.
+    Denying the leading opponent counts extra, as submit_word steals from
+    the highest scoring owner first (see order_words_by_player_score).
+
+    Args:
+        move_type (str): 'MIDDLE_WORD', 'OWN_WORD_IMPROVEMENT' or 'STEAL_WORD'.
+        candidate (dict): The move, with 'tileIds' and, for improvements and
+            steals, 'originalWord' and 'current_owner_user_id'.
+        bot_id (str): The bot's player ID.
+        players (dict): The game's players, with their scores.
+        max_score_to_win (int, optional): The score that wins the game.
+
+    Returns:
+        float: The move's score; higher is better.
+    """
+    word_tiles = len(candidate['tileIds'])
+    original_tiles = len(candidate.get('originalWord') or '')
+    denied = 0
+    if move_type == 'OWN_WORD_IMPROVEMENT':
+        gained = word_tiles - original_tiles
+    else:
+        gained = word_tiles
+    if move_type == 'STEAL_WORD':
+        denied = original_tiles
+        owner_id = candidate.get('current_owner_user_id')
+        opponent_scores = {player_id: (player or {}).get('score') or 0
+                           for player_id, player in players.items() if player_id != bot_id}
+        if opponent_scores and owner_id in opponent_scores and \
+                opponent_scores[owner_id] == max(opponent_scores.values()):
+            denied *= LEADER_DENIAL_WEIGHT
+
+    score = gained + denied
+    bot_score = (players.get(bot_id) or {}).get('score') or 0
+    if max_score_to_win and bot_score + gained >= max_score_to_win:
+        score += WINNING_MOVE_BONUS
+    return score
+
 
 class BotService:
-    def __init__(self, game_id, difficulty_level="easy", BOT_ID=BOT_ID, delay=BOT_DELAY, anagram_map=None):
+    def __init__(self, game_id, difficulty_level=BOT_DIFFICULTY, BOT_ID=BOT_ID, delay=BOT_DELAY, anagram_map=None):
+        if difficulty_level not in BOT_DIFFICULTIES:
+            raise ValueError(f"Unknown difficulty level '{difficulty_level}', "
+                             f"expected one of {sorted(BOT_DIFFICULTIES)}.")
         self.difficulty_level = difficulty_level
         self.BOT_ID = BOT_ID
         self.game_id = game_id
         self.delay = delay
-        self.anagram_map = pickle.load(open(anagram_map, 'rb'))
+        # Shared, memory-mapped index (see hashmap_service.load_anagram_index)
+        self.anagram_map = hashmap_service.load_anagram_index(anagram_map)
+        # Candidate moves for this game, updated from the actions log between turns
+        settings = BOT_DIFFICULTIES[difficulty_level]
+        self.candidate_cache = BotCandidateCache(
+            self.anagram_map, max_word_length=settings['max_word_length'],
+            extension_owner_id=None if 'STEAL_WORD' in settings['move_types'] else BOT_ID)
 
-    def flip_tile(self):
+    def flip_tile(self, game=None):
         """
         Flip a tile in the game.
-        This is a placeholder for the actual logic that would flip a tile.
+
+        Args:
+            game (dict, optional): A game snapshot the bot already read.
         """
-        print("🩵 Bot flipping a tile...")
-        # Flip tile after 1-4 seconds            
-        time.sleep(random.randint(1, 4))
-        game_service.flip_tile(self.game_id, self.BOT_ID)
+        logger.debug("[BotService] Bot flipping a tile in game %s", self.game_id)
+        game_service.flip_tile(self.game_id, self.BOT_ID, game)
         # Update the last move time
         # firebase_service.update_last_move_time(self.game_id, self.BOT_ID)
 
+    def take_turn(self):
+        """
+        Play one bot turn: submit a word if there is one, otherwise flip a
+        tile if it's the bot's turn. Run by the BotScheduler.
+
+        Returns:
+            float | None: Seconds until the bot should act again (it pauses
+            after submitting a word before it flips), or None.
+        """
+        game = game_service.get_game(self.game_id)
+        if not game:
+            return None
+        if self.generate_and_submit_bot_move(game):
+            return random.uniform(BOT_MIN_FLIP_DELAY, BOT_MAX_FLIP_DELAY)
+        if game.get('currentPlayerTurn') == self.BOT_ID:
+            self.flip_tile(game)
+        return None
+
 
     def _get_valid_middle_words(self, middle_tiles):
         """
         Get all valid words that can be formed with the middle tile letters.
         Returns a list of dicts, where each dict is {'word': word, 'tileIds': [tile_ids...]}
         """
-        results = []
-
-        for r in range(3, len(middle_tiles) + 1):
-            for combo_of_tiles in itertools.combinations(middle_tiles, r):
-                # Build sorted key from the combo of letters
-                letters = [tile['letter'].lower() for tile in combo_of_tiles]
-                key = ''.join(sorted(letters))
-
-                if key in self.anagram_map:
-                    # Prepare (letter, tileId) pairs for mapping
-                    combo_data = [(tile['letter'].lower(), tile['tileId']) for tile in combo_of_tiles]
-
-                    for word in self.anagram_map[key]:
-                        # Copy combo_data so we can remove used tiles while mapping
-                        available_tiles = list(combo_data)
-                        mapped_tile_ids = []
-
-                        for letter in word:
-                            for i, (tile_letter, tile_id) in enumerate(available_tiles):
-                                if tile_letter == letter:
-                                    mapped_tile_ids.append(tile_id)
-                                    available_tiles.pop(i)
-                                    break
-                            else:
-                                # Could not find a matching tile for the letter
-                                mapped_tile_ids = []
-                                break
-
-                        if mapped_tile_ids:
-                            results.append({
-                                'WordSubmissionType': game_service.WordSubmissionType.MIDDLE_WORD,
-                                'word': word,
-                                'tileIds': mapped_tile_ids
-                            })
-
-        return results
+        return word_search_service.find_middle_words(self.anagram_map, middle_tiles)
 
     def _get_valid_non_middle_words(self, player_words, middle_tiles):
         """
         Get all valid words that can be formed by extending player words with middle tiles.
-        This logic mirrors _get_valid_middle_words by mapping each letter of a
-        potential word to a specific tileId.
+        Each letter of a potential word is mapped to a specific tileId, taking the
+        existing word's tiles before the middle tiles.
 
         Returns a list of dicts, where each dict is {'word': word, 'tileIds': [tile_ids...]}
         """
         results = []
         for existing_word in player_words:
-            # only need to add one or more tiles
-            for r in range(1, len(middle_tiles) + 1):
-                for combo_of_tiles in itertools.combinations(middle_tiles, r):
-                    # Combine letters from the existing word and the new middle tiles
-                    existing_letters = list(existing_word['word'].lower())
-                    middle_letters = [tile['letter'].lower() for tile in combo_of_tiles]
-                    combined_letters = existing_letters + middle_letters
-
-                    # Create the sorted key for anagram lookup
-                    key = "".join(sorted(combined_letters))
-
-                    if key in self.anagram_map:
-                        # Prepare a combined list of (letter, tileId) pairs for precise mapping
-                        existing_tile_data = zip(existing_word['word'].lower(), existing_word['tileIds'])
-                        middle_tile_data = [(tile['letter'].lower(), tile['tileId']) for tile in combo_of_tiles]
-                        combo_data = list(existing_tile_data) + middle_tile_data
-
-                        for word in self.anagram_map[key]:
-                            # Ensure it's a new word, not the same as the existing one
-                            if word == existing_word['word'].lower():
-                                continue
-
-                            # Perform robust mapping of letters to tile IDs
-                            available_tiles = list(combo_data)
-                            mapped_tile_ids = []
-
-                            for letter in word:
-                                found_match = False
-                                for i, (tile_letter, tile_id) in enumerate(available_tiles):
-                                    if tile_letter == letter:
-                                        mapped_tile_ids.append(tile_id)
-                                        available_tiles.pop(i)
-                                        found_match = True
-                                        break
-                                
-                                if not found_match:
-                                    # This should not happen if the anagram map is correct,
-                                    # but serves as a safeguard.
-                                    mapped_tile_ids = []
-                                    break
-                            
-                            if mapped_tile_ids:
-                                results.append({
-                                    'word': word,
-                                    'tileIds': mapped_tile_ids,
-                                    'current_owner_user_id': existing_word['current_owner_user_id'],
-                                    'originalWord': existing_word['word'],
-                                })
+            results.extend(word_search_service.find_extension_words(
+                self.anagram_map, existing_word, middle_tiles))
         return results
 
 
-    def determine_move_to_make(self, middle_word_options, steal_options, valid_own_improvement_options):
+    def determine_move_to_make(self, middle_word_options, steal_options, valid_own_improvement_options,
+                               game=None, deadline=None):
         """
-        Determine the best move to make based on the available options.
-        This is a placeholder for the actual logic that would determine the best move.
+        Pick the move to make: score the candidates (see score_move) and choose
+        among the best, as far as the bot's difficulty level allows.
+
+        Args:
+            middle_word_options (list): Words made from middle tiles only.
+            steal_options (list): Extensions of other players' words.
+            valid_own_improvement_options (list): Extensions of the bot's own words.
+            game (dict, optional): The game, for the players' scores; without
+                it moves are scored by the tiles they gain alone.
+            deadline (float, optional): time.perf_counter() value to stop
+                scoring at; defaults to the difficulty level's time budget.
+
+        Returns:
+            dict | None: {'word', 'tileIds'} of the chosen move, or None.
         """
-        print(" ")
-        print("🩵 Determining move to make...")
-        print(" ")
-        middle_word_options = [{'word': word['word'], 'tileIds': word['tileIds']}
-                               for word in middle_word_options]
-        print("🩵 Middle word options: ", middle_word_options)
-        steal_options = [{'word': word['word'], 'tileIds': word['tileIds']}
-                               for word in steal_options]
-        print("🩵 Steal options: ", steal_options)
-        print(" ")
-        valid_own_improvement_options = [{'word': word['word'], 'tileIds': word['tileIds']}
-                               for word in valid_own_improvement_options]
-        print("🩵 Own improvement options: ", valid_own_improvement_options)
-        print(" ")
-        # For now, just return the first valid middle word option if available
-        if not middle_word_options and not steal_options and not valid_own_improvement_options:
-            print("No valid moves available!!!!!!!!!")
-            return None
-        
-        if middle_word_options:
-            # return the last middle word option (it is the longest)
-            # return middle_word_options[-1]
-            return random.choice(middle_word_options)
-        elif steal_options:
-            return random.choice(steal_options)
-        elif valid_own_improvement_options:
-            return random.choice(valid_own_improvement_options)
-        else:
+        settings = BOT_DIFFICULTIES[self.difficulty_level]
+        options_by_type = {
+            'MIDDLE_WORD': middle_word_options,
+            'OWN_WORD_IMPROVEMENT': valid_own_improvement_options,
+            'STEAL_WORD': steal_options,
+        }
+        candidates = [(move_type, option) for move_type in settings['move_types']
+                      for option in options_by_type[move_type]]
+        logger.debug("[BotService] %s candidate moves in game %s (%s middle, %s steal, %s own)",
+                     len(candidates), self.game_id, len(middle_word_options),
+                     len(steal_options), len(valid_own_improvement_options))
+        if not candidates:
+            logger.debug("[BotService] No valid moves available in game %s", self.game_id)
             return None
 
-    def generate_and_submit_bot_move(self):
-        game = game_service.get_game(self.game_id)
-        if not game:
-            return None
-        valid_words = [
-            {
-                "word": word["word"],
-                "wordId": word["wordId"],
-                "tileIds": word["tileIds"],
-                "current_owner_user_id": word["current_owner_user_id"]
-            }
-            for word in game.get("words", [])
-            if word.get("status") == "valid"
-        ]
-
-        middle_tiles = [
-            tile
-            for tile in game['tiles']
-            if tile.get('location') == 'middle'
-        ]
-        middle_word_options = self._get_valid_middle_words(middle_tiles)
-
-        valid_non_middle_word_options = self._get_valid_non_middle_words(
-            valid_words, middle_tiles)
+        players = (game or {}).get('players') or {}
+        max_score_to_win = (game or {}).get('max_score_to_win_per_player')
+        # Longer words are worth more, so they are scored first in case the budget runs out
+        if len(candidates) > settings['max_candidates']:
+            candidates = heapq.nlargest(settings['max_candidates'], candidates,
+                                        key=lambda candidate: len(candidate[1]['tileIds']))
+        if deadline is None:
+            deadline = time.perf_counter() + settings['time_budget']
+        scored = []
+        for move_type, option in candidates:
+            # At least one move is scored, so the bot always has one to play
+            if scored and time.perf_counter() > deadline:
+                logger.debug("[BotService] Time budget used up after %s moves", len(scored))
+                break
+            scored.append((score_move(move_type, option, self.BOT_ID, players, max_score_to_win),
+                           option))
+
+        best = heapq.nlargest(settings['top_choices'], scored, key=lambda item: item[0])
+        _, chosen = random.choice(best)
+        return {'word': chosen['word'], 'tileIds': chosen['tileIds']}
+
+    def choose_move(self, game):
+        """
+        Bring the candidate moves up to date with the game and pick one.
+
+        Args:
+            game (dict): A game snapshot.
 
+        Returns:
+            dict | None: {'word', 'tileIds'} of the move to make, or None.
+        """
+        time_budget = BOT_DIFFICULTIES[self.difficulty_level]['time_budget']
+        start = time.perf_counter()
+        self.candidate_cache.update(game, start + time_budget * SEARCH_BUDGET_SHARE)
+        extension_words = self.candidate_cache.extension_words
         own_improvement_options = [
-            word for word in valid_non_middle_word_options if word['current_owner_user_id'] == self.BOT_ID]
+            word for word in extension_words if word['current_owner_user_id'] == self.BOT_ID]
         steal_options = [
-            word for word in valid_non_middle_word_options if word['current_owner_user_id'] != self.BOT_ID]
-        word_to_submit = self.determine_move_to_make(
-            middle_word_options, steal_options, own_improvement_options)
+            word for word in extension_words if word['current_owner_user_id'] != self.BOT_ID]
+        return self.determine_move_to_make(
+            self.candidate_cache.middle_words, steal_options, own_improvement_options, game,
+            start + time_budget)
+
+    def generate_and_submit_bot_move(self, game=None):
+        """
+        Look for a word to play and submit it.
+
+        Args:
+            game (dict, optional): A game snapshot; fetched if not given.
+
+        Returns:
+            dict | None: The submitted word option, or None if there was none
+            or the game didn't accept it.
+        """
+        if game is None:
+            game = game_service.get_game(self.game_id)
+        if not game:
+            return None
+        word_to_submit = self.choose_move(game)
         if word_to_submit is not None:
-            print("🩵 Bot move to submit: ", word_to_submit)
-            game_service.submit_word(
-                self.game_id, "computer", word_to_submit['tileIds'])
-            self.flip_tile()
+            logger.debug("[BotService] Bot move to submit: %s", word_to_submit)
+            result = game_service.submit_word(
+                self.game_id, self.BOT_ID, word_to_submit['tileIds'], game)
+            # Rejected words are logged as actions and still report success
+            if not result.get('success') or \
+                    (result.get('submission_type') or 'INVALID').startswith('INVALID'):
+                logger.warning("[BotService] Bot word %s was not accepted in game %s: %s",
+                               word_to_submit['word'], self.game_id,
+                               result.get('submission_type') or result.get('message'))
+                return None
             # Update the last move time
             # firebase_service.update_last_move_time(game_id, self.BOT_ID)
+            return word_to_submit
         else:
-            print("No valid moves available for bot to submit.")
-            return
\ No newline at end of file
+            logger.debug("[BotService] No valid moves available for bot to submit.")
+            return None
\ No newline at end of file
@@ -1,17 +1,138 @@
-from firebase_admin import db
+import contextvars
+import copy
+import random
+import threading
+import time
+import uuid
+from config import GAME_STORE, GAME_SNAPSHOT_CACHE_TTL, METRICS_ENABLED
+from services import game_store, metrics_service
 from logging_config import logger
 
+TransactionAbortedError = game_store.TransactionAbortedError
 
-def get_db_reference(path: str = None) -> db.Reference:
-    """Gets a reference to the Firebase Realtime Database.
+_store = None
+_store_lock = threading.Lock()
+
+
+def configure_store(store: game_store.GameStore):
+    """Sets the storage backend used by every service in this process.
+
+    Args:
+        store (GameStore): The backend, e.g. game_store.InMemoryGameStore().
+    """
+    global _store
+    with _store_lock:
+        _store = store
+    logger.info("Using the '%s' game store", store.name)
+
+
+def get_store() -> game_store.GameStore:
+    """Returns the configured store, creating the GAME_STORE backend on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = game_store.create_store(GAME_STORE)
+    return _store
+
+
+def get_db_reference(path: str = None):
+    """Gets a reference to a location in the game store.
 
     Args:
         path (str, optional): The path to the desired location. Defaults to the root.
 
     Returns:
-        db.Reference: A reference to the specified database location.
+        A db.Reference (or a compatible reference for other stores) to the
+        specified location. With METRICS_ENABLED, every call made through it
+        is timed and its payload measured (see InstrumentedReference).
     """
-    return db.reference(path)
+    reference = get_store().reference(path)
+    return InstrumentedReference(reference) if METRICS_ENABLED else reference
+
+
+def _record_payload(operation: str, value):
+    size = metrics_service.payload_size(value)
+    if size is not None:
+        metrics_service.observe('carnivore_db_payload_bytes', size,
+                                metrics_service.BYTES_BUCKETS, operation=operation)
+
+
+class InstrumentedReference:
+    """Wraps a store reference and records a span and payload size per database call.
+
+    Reads are recorded as db_read, writes as db_write and raw transactions
+    as db_transaction; anything else is passed through to the wrapped
+    reference.
+    """
+
+    def __init__(self, reference):
+        self._reference = reference
+
+    def __getattr__(self, name):
+        return getattr(self._reference, name)
+
+    def child(self, path: str):
+        return InstrumentedReference(self._reference.child(path))
+
+    def get(self, *args, **kwargs):
+        with metrics_service.span('db_read'):
+            value = self._reference.get(*args, **kwargs)
+        _record_payload('read', value[0] if kwargs.get('etag') else value)
+        return value
+
+    def set(self, value):
+        with metrics_service.span('db_write'):
+            self._reference.set(value)
+        _record_payload('write', value)
+
+    def update(self, value):
+        with metrics_service.span('db_write'):
+            self._reference.update(value)
+        _record_payload('write', value)
+
+    def delete(self):
+        with metrics_service.span('db_write'):
+            self._reference.delete()
+
+    def transaction(self, transaction_update):
+        with metrics_service.span('db_transaction'):
+            value = self._reference.transaction(transaction_update)
+        _record_payload('transaction', value)
+        return value
+
+    def order_by_child(self, path: str):
+        return _InstrumentedQuery(self._reference.order_by_child(path))
+
+    def order_by_key(self):
+        return _InstrumentedQuery(self._reference.order_by_key())
+
+    def order_by_value(self):
+        return _InstrumentedQuery(self._reference.order_by_value())
+
+
+class _InstrumentedQuery:
+    """Wraps a query so that running it is recorded as a db_read."""
+
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        attribute = getattr(self._query, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            # Filters and limits return the query itself for chaining
+            return self if result is self._query else result
+        return call
+
+    def get(self):
+        with metrics_service.span('db_read'):
+            value = self._query.get()
+        _record_payload('read', value)
+        return value
 
 
 def get_game(game_id: str) -> dict | None:
@@ -21,10 +142,17 @@ def get_game(game_id: str) -> dict | None:
 
 
 def update_game(game_id: str, game_data: dict):
-    """Updates a game's data in Firebase."""
-    ref = get_db_reference(f'games/{game_id}')
-    # update, not set, to avoid overwriting the whole game
-    ref.update(game_data)
+    """Updates a game's data in Firebase.
+
+    Like Reference.update, each key (a child or a slash-separated path) is
+    replaced and the rest of the game is left alone. The write goes through
+    run_game_transaction, so it bumps the game's version and other servers'
+    cached snapshots of the game are dropped.
+    """
+    def replace(current_data):
+        return dict(game_data)
+
+    run_game_transaction(game_id, list(game_data), replace)
 
 
 def get_player(game_id: str, user_id: str) -> dict | None:
@@ -33,7 +161,323 @@ def get_player(game_id: str, user_id: str) -> dict | None:
     return ref.get()
 
 
-def update_player_turn(game_id: str, user_id: str, turn_data: bool):
-    """Updates a player's turn data in Firebase."""
-    ref = get_db_reference(f'games/{game_id}/players/{user_id}/turn')
-    ref.set(turn_data)
+def update_player_turn(game_id: str, user_id: str, turn_data: bool) -> bool:
+    """Updates a player's turn data in Firebase (see update_game)."""
+    update_game(game_id, {f'players/{user_id}/turn': turn_data})
+    return True
+
+
+# Game snapshots
+#
+# A request usually needs the same game several times (validation, turn
+# checks, the move itself). get_game_snapshot fetches it once per request and
+# hands the same dict to every caller inside the request scope that app.py
+# opens around each request. Optionally, snapshots are also kept process-wide
+# for GAME_SNAPSHOT_CACHE_TTL seconds; a cached snapshot is only reused if the
+# game's version node (see run_game_transaction) still has the same number.
+# Snapshots are shared, so callers must not modify them.
+_request_snapshots = contextvars.ContextVar('request_game_snapshots', default=None)
+_snapshot_cache = {}
+_snapshot_cache_lock = threading.Lock()
+
+
+def begin_request_scope():
+    """Starts a request scope for get_game_snapshot; returns a token for end_request_scope."""
+    return _request_snapshots.set({})
+
+
+def end_request_scope(token):
+    """Ends the request scope started by begin_request_scope."""
+    _request_snapshots.reset(token)
+
+
+def get_game_snapshot(game_id: str) -> dict | None:
+    """Fetches a game's data, reusing the copy already read in this request.
+
+    Args:
+        game_id (str): The ID of the game.
+
+    Returns:
+        dict | None: The game data (read-only), or None if the game doesn't exist.
+    """
+    scope = _request_snapshots.get()
+    if scope is not None and game_id in scope:
+        return scope[game_id]
+
+    game_data = _get_cached_game(game_id) if GAME_SNAPSHOT_CACHE_TTL > 0 else None
+    if game_data is None:
+        game_data = get_game(game_id)
+        if GAME_SNAPSHOT_CACHE_TTL > 0 and game_data is not None:
+            with _snapshot_cache_lock:
+                _snapshot_cache[game_id] = (time.monotonic() + GAME_SNAPSHOT_CACHE_TTL,
+                                            _version_number(game_data.get(GAME_VERSION_PATH)),
+                                            game_data)
+
+    if scope is not None:
+        scope[game_id] = game_data
+    return game_data
+
+
+def _get_cached_game(game_id: str) -> dict | None:
+    with _snapshot_cache_lock:
+        entry = _snapshot_cache.get(game_id)
+    if entry is None:
+        return None
+    expires_at, version_number, game_data = entry
+    if time.monotonic() >= expires_at:
+        invalidate_game_snapshot(game_id)
+        return None
+    # One tiny read instead of the whole game
+    current_version = get_db_reference(f'games/{game_id}/{GAME_VERSION_PATH}').get()
+    if _version_is_claimed(current_version, int(time.time() * 1000)) or \
+            _version_number(current_version) != version_number:
+        invalidate_game_snapshot(game_id)
+        return None
+    return game_data
+
+
+def invalidate_game_snapshot(game_id: str):
+    """Drops any snapshot of a game held by this request or the process-wide cache."""
+    scope = _request_snapshots.get()
+    if scope is not None:
+        scope.pop(game_id, None)
+    with _snapshot_cache_lock:
+        _snapshot_cache.pop(game_id, None)
+
+
+# Scoped game transactions
+#
+# A Realtime Database transaction always downloads and re-uploads the whole
+# node it runs on, which for a game includes every tile, word and the
+# ever-growing actions log. run_game_transaction instead reads only the
+# top-level children a move needs, works out which leaves the move changed
+# and writes just those in one multi-path update.
+#
+# Writers are serialised by a small guard node, games/{id}/version:
+#   1. read the version number, then the scoped children
+#   2. run the update function and diff its result against what was read
+#   3. claim the version with a transaction on the guard node only; the claim
+#      fails if anyone else has bumped or claimed it since step 1
+#   4. write the diff together with version + 1 (releasing the claim) in a
+#      single atomic multi-path update
+# A claim that is never released (a crashed writer) expires after
+# GAME_VERSION_LEASE_SECONDS, after which another writer may claim the
+# version. The Admin SDK can't make a multi-path update conditional on the
+# claim token, so step 4 is only attempted while the claim has at least
+# GAME_VERSION_COMMIT_MARGIN_SECONDS of its lease left; a writer that stalled
+# past that gives up its claim and retries instead of racing a new claimant.
+# Every write to a game, including update_game, goes through this so the
+# version always changes with the data.
+GAME_VERSION_PATH = 'version'
+GAME_VERSION_LEASE_SECONDS = 10
+GAME_VERSION_COMMIT_MARGIN_SECONDS = 5
+GAME_TRANSACTION_MAX_RETRIES = 25
+
+_UNREAD = object()
+
+
+class _VersionConflict(Exception):
+    pass
+
+
+def _version_number(version_data) -> int:
+    if isinstance(version_data, dict):
+        return version_data.get('number', 0) or 0
+    return version_data or 0
+
+
+def _version_is_claimed(version_data, now_ms: int) -> bool:
+    if not isinstance(version_data, dict) or not version_data.get('claimedBy'):
+        return False
+    return now_ms - (version_data.get('claimedAt') or 0) < GAME_VERSION_LEASE_SECONDS * 1000
+
+
+def diff_game_data(before, after, path: str = '', updates: dict | None = None) -> dict:
+    """Computes the multi-path update that turns `before` into `after`.
+
+    Lists are compared index by index, as the Realtime Database stores them
+    as maps keyed by index. Children that were never read (passed as the
+    module's _UNREAD marker) are merged leaf by leaf instead of being
+    overwritten, so e.g. appending to the unread actions log only writes the
+    new entry.
+
+    Args:
+        before: The value that was read.
+        after: The value the update function produced.
+        path (str): Path of this value, relative to the game.
+        updates (dict, optional): Dictionary to add the updates to.
+
+    Returns:
+        dict: Relative path -> new value (None deletes the path).
+    """
+    if updates is None:
+        updates = {}
+
+    if isinstance(after, dict) and (before is _UNREAD or isinstance(before, dict)):
+        before_children = before if isinstance(before, dict) else {}
+        for key, value in after.items():
+            child_before = before_children.get(key, _UNREAD if before is _UNREAD else None)
+            diff_game_data(child_before, value, f"{path}/{key}" if path else str(key), updates)
+        if before is not _UNREAD:
+            for key in before_children.keys() - after.keys():
+                updates[f"{path}/{key}" if path else str(key)] = None
+    elif isinstance(after, list) and isinstance(before, list):
+        for index, value in enumerate(after):
+            child_before = before[index] if index < len(before) else None
+            diff_game_data(child_before, value, f"{path}/{index}", updates)
+        for index in range(len(after), len(before)):
+            updates[f"{path}/{index}"] = None
+    elif before is _UNREAD or type(before) is not type(after) or before != after:
+        updates[path] = after
+    return updates
+
+
+def run_game_transaction(game_id: str, paths: list[str], transaction_update,
+                         max_retries: int = GAME_TRANSACTION_MAX_RETRIES, snapshot: dict = None):
+    """Runs a transaction that only reads and writes the parts of a game it needs.
+
+    Works like Reference.transaction: transaction_update receives the current
+    data (a dict holding only the requested top-level children, or None if
+    none of them exist) and returns the new data, or raises to abort. Keys it
+    adds outside `paths` are merged into the game rather than replacing it.
+
+    Args:
+        game_id (str): The ID of the game.
+        paths (list[str]): Top-level children of the game to read.
+        transaction_update (callable): The update function.
+        max_retries (int): Attempts before giving up.
+        snapshot (dict, optional): A full game snapshot the caller already
+            read (see get_game_snapshot). The first attempt starts from it
+            instead of reading the game. If the snapshot turns out to be
+            stale, the attempt is retried with fresh data, including when the
+            update function aborted or changed nothing.
+
+    Returns:
+        The data returned by transaction_update.
+
+    Raises:
+        TransactionAbortedError: If the update function returns None, or
+            the version couldn't be claimed after max_retries attempts.
+    """
+    game_ref = get_db_reference(f'games/{game_id}')
+    version_ref = game_ref.child(GAME_VERSION_PATH)
+
+    def snapshot_is_stale():
+        # Only consulted when the snapshot led to an abort or a no-op, since
+        # committing already checks the version
+        current_version = version_ref.get()
+        return _version_number(current_version) != expected_version or \
+            _version_is_claimed(current_version, int(time.time() * 1000))
+
+    started = time.perf_counter()
+    attempts = 0
+    try:
+        for attempt in range(max_retries):
+            attempts = attempt + 1
+            from_snapshot = attempt == 0 and snapshot is not None
+            if from_snapshot:
+                version_data = snapshot.get(GAME_VERSION_PATH)
+            else:
+                version_data = version_ref.get()
+            if _version_is_claimed(version_data, int(time.time() * 1000)):
+                _count_retry('claimed')
+                _backoff(attempt)
+                continue
+            expected_version = _version_number(version_data)
+
+            current_data = {}
+            for path in paths:
+                if from_snapshot:
+                    value = copy.deepcopy(snapshot.get(path))
+                else:
+                    value = game_ref.child(path).get()
+                if value is not None:
+                    current_data[path] = value
+            before = copy.deepcopy(current_data)
+
+            try:
+                new_data = transaction_update(current_data if current_data else None)
+            except Exception:
+                if from_snapshot and snapshot_is_stale():
+                    _count_retry('stale_snapshot')
+                    continue
+                raise
+            if new_data is None:
+                if from_snapshot and snapshot_is_stale():
+                    _count_retry('stale_snapshot')
+                    continue
+                raise TransactionAbortedError('Transaction aborted by the update function.')
+
+            updates = {}
+            for key in new_data.keys() | set(paths):
+                if key not in new_data:
+                    if before.get(key) is not None:
+                        updates[key] = None
+                else:
+                    diff_game_data(before.get(key) if key in paths else _UNREAD,
+                                   new_data[key], key, updates)
+            if not updates:
+                if from_snapshot and snapshot_is_stale():
+                    _count_retry('stale_snapshot')
+                    continue
+                return new_data
+
+            claim_token = str(uuid.uuid4())
+
+            def claim_version(current_version):
+                now_ms = int(time.time() * 1000)
+                if _version_number(current_version) != expected_version or \
+                        _version_is_claimed(current_version, now_ms):
+                    raise _VersionConflict()
+                return {'number': expected_version, 'claimedBy': claim_token, 'claimedAt': now_ms}
+
+            try:
+                claim = version_ref.transaction(claim_version)
+            except _VersionConflict:
+                logger.debug(
+                    "[run_game_transaction] Version conflict on game %s, attempt %s", game_id, attempt + 1)
+                _count_retry('conflict')
+                _backoff(attempt)
+                continue
+
+            claim_age_ms = int(time.time() * 1000) - claim['claimedAt']
+            if claim_age_ms > (GAME_VERSION_LEASE_SECONDS - GAME_VERSION_COMMIT_MARGIN_SECONDS) * 1000:
+                # Too close to expiry to be sure nobody else holds the version
+                # when the write lands; release the claim only if it is still ours
+                logger.warning("[run_game_transaction] Claim on game %s is %s ms old, retrying",
+                               game_id, claim_age_ms)
+                _release_claim(version_ref, claim_token, expected_version)
+                _count_retry('claim_expiring')
+                continue
+
+            updates[GAME_VERSION_PATH] = {'number': expected_version + 1}
+            game_ref.update(updates)
+            invalidate_game_snapshot(game_id)
+            return new_data
+
+        raise TransactionAbortedError('Transaction aborted after failed retries.')
+    finally:
+        metrics_service.record_span('game_transaction', time.perf_counter() - started)
+        metrics_service.observe('carnivore_game_transaction_attempts', attempts,
+                                metrics_service.ATTEMPTS_BUCKETS)
+
+
+def _release_claim(version_ref, claim_token: str, version_number: int):
+    def release(current_version):
+        if isinstance(current_version, dict) and current_version.get('claimedBy') == claim_token:
+            return {'number': version_number}
+        return current_version
+
+    try:
+        version_ref.transaction(release)
+    except Exception as e:
+        # The claim expires on its own
+        logger.warning("[run_game_transaction] Releasing claim failed: %s", e)
+
+
+def _count_retry(reason: str):
+    metrics_service.increment('carnivore_game_transaction_retries_total', reason=reason)
+
+
+def _backoff(attempt: int):
+    time.sleep(random.uniform(0, min(0.5, 0.02 * (2 ** attempt))))
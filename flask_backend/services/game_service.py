@@ -1,12 +1,12 @@
-import logging
-import colorlog
 import random
 import uuid
 from enum import Enum
 from datetime import datetime
-from services import firebase_service, tile_service, word_validation_service, player_service
+from services import firebase_service, tile_service, word_validation_service, player_service, action_log_service
+from models.game import GameState
+from models.tile import TILE_PATHS, TILE_ENCODING_PACKED, PACKED_TILES_PATH, DRAW_PILE_CURSOR_PATH, pack_tiles
 from logging_config import logger
-from firebase_admin import db
+from config import TILE_ENCODING, GAME_RANDOM_SEED
 
 
 class WordSubmissionType(Enum):
@@ -28,28 +28,60 @@ class GameNotFoundError(Exception):
     pass
 
 
+# Top-level game children each transaction reads; see firebase_service.run_game_transaction
+SUBMIT_WORD_PATHS = [*TILE_PATHS, 'words', 'players', 'max_score_to_win_per_player', 'status',
+                     action_log_service.ACTION_COUNT_PATH]
+FLIP_TILE_PATHS = ['currentPlayerTurn', *TILE_PATHS, DRAW_PILE_CURSOR_PATH, 'remainingLetters', 'players',
+                   action_log_service.ACTION_COUNT_PATH]
+ADD_PLAYER_PATHS = ['players', *TILE_PATHS]
+
+
 def add_game_action(current_data, game_id: str, action: dict):
     """Adds an action to the game's action log (works inside transactions).
 
+    The transaction must read action_log_service.ACTION_COUNT_PATH, which
+    this increments.
+
     Args:
         current_data (dict): The current game data (from the transaction).
         game_id (str): The ID of the game (for logging purposes).
         action (dict): The action to log.
     """
-    logger.debug(f"[add_game_action] Called for game {game_id}")
-    logger.debug(f"[add_game_action] action = {action}")
+    logger.debug("[add_game_action] Called for game %s", game_id)
+    logger.debug("[add_game_action] action = %s", action)
 
     if 'actions' not in current_data:
         current_data['actions'] = {}
 
-    action_id = action['type'] + '_' + str(uuid.uuid4())
+    action_id = action_log_service.new_action_id(action)
     current_data['actions'][action_id] = action
+    current_data[action_log_service.ACTION_COUNT_PATH] = \
+        (current_data.get(action_log_service.ACTION_COUNT_PATH) or 0) + 1
 
     logger.debug(
-        f"[add_game_action] Added action {action_id} to game {game_id}")
+        "[add_game_action] Added action %s to game %s", action_id, game_id)
+
+
+def compact_action_log(game_id: str, game_data: dict = None):
+    """Moves old actions out of the game document once the log gets long.
+
+    Runs after a move has been committed. Compaction is housekeeping, so a
+    failure is logged and never fails the move; a later move retries it.
+
+    Args:
+        game_id (str): The ID of the game.
+        game_data (dict, optional): The data the move's transaction
+            committed; its actionCount saves reading the log when no
+            compaction is due.
+    """
+    action_count = (game_data or {}).get(action_log_service.ACTION_COUNT_PATH)
+    try:
+        action_log_service.compact_action_log(game_id, action_count=action_count)
+    except Exception as e:
+        logger.exception("[compact_action_log] Failed for game %s: %s", game_id, e)
 
 
-def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
+def submit_word(game_id: str, user_id: str, tile_ids: list[int], game_data: dict = None) -> dict:
     """Submits a word (new, improved, or stolen) within a transaction.
 
     This function handles the submission of a word in a game. It identifies the type of submission
@@ -60,13 +92,13 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
         game_id (str): The ID of the game.
         user_id (str): The ID of the user submitting the word.
         tile_ids (list[int]): A list of tile IDs used to form the word.
+        game_data (dict, optional): A snapshot of the game already read in this
+            request; the first transaction attempt starts from it.
 
     Returns:
         dict: A dictionary containing the success status and a message. If successful, it also includes
               the type of submission.
     """
-    game_ref = firebase_service.get_db_reference(f'games/{game_id}')
-
     submission_type_str = None
     submitted_word_str = None
 
@@ -84,14 +116,14 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
 
         max_score_to_win_per_player = current_data.get(
             'max_score_to_win_per_player')
+        game_state = GameState(current_data)
 
         submission_type, extra_data = identifyWordSubmissionType(
-            current_data, user_id, tile_ids)
+            game_state, user_id, tile_ids)
         submission_type_str = submission_type.name
 
-        tiles_for_word = [tile_service.get_tile_from_data(
-            current_data, tile_id) for tile_id in tile_ids]
-        tiles_for_word.sort(key=lambda t: tile_ids.index(t['tileId']))
+        # Already in submitted order
+        tiles_for_word = [game_state.tile(tile_id) for tile_id in tile_ids]
 
         current_word_string = ''.join(tile['letter']
                                       for tile in tiles_for_word if tile and 'letter' in tile)
@@ -112,7 +144,7 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
                 'tileIds': tile_ids
             })
             logger.debug(
-                f"[submit_word] Invalid word submission logged: {current_word_string}")
+                "[submit_word] Invalid word submission logged: %s", current_word_string)
             return current_data
 
         # This new_word_id will be used for the word being created/submitted
@@ -142,19 +174,17 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
                 'tileIds': tile_ids,
                 'playerId': user_id
             })
-            current_data.setdefault('words', []).append(new_word_data)
+            game_state.add_word(new_word_data)
             points_to_add_to_user_id = len(tile_ids)
-            logger.debug(f"[submit_word] Middle word added: {new_word_data}")
+            logger.debug("[submit_word] Middle word added: %s", new_word_data)
 
         elif submission_type == WordSubmissionType.OWN_WORD_IMPROVEMENT:
             old_word_id = extra_data[0]
             original_word_id_for_action = old_word_id
 
-            old_word_index = next((index for (index, w) in enumerate(
-                current_data.get('words', [])) if w['wordId'] == old_word_id), None)
+            old_word_ref = game_state.word(old_word_id)
 
-            if old_word_index is not None:
-                old_word_ref = current_data['words'][old_word_index]
+            if old_word_ref is not None:
                 primary_original_word_for_action = {
                     'word': old_word_ref['word'], 'wordId': old_word_ref['wordId']}
 
@@ -182,13 +212,14 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
                     'improvedFromWordId': old_word_id,
                     'improvedFromWordString': old_word_ref['word']
                 })
-                current_data.setdefault('words', []).append(new_word_data)
+                game_state.add_word(new_word_data)
                 points_to_add_to_user_id = amount_of_middle_tiles_in_word
                 logger.debug(
-                    f"[submit_word] Own word improvement: Old word '{old_word_ref['word']}' ({old_word_id}) status updated. New word '{current_word_string}' ({new_word_id}) added.")
+                    "[submit_word] Own word improvement: Old word '%s' (%s) status updated. New word '%s' (%s) added.",
+                    old_word_ref['word'], old_word_id, current_word_string, new_word_id)
             else:
                 logger.error(
-                    f"❌ [submit_word] OWN_WORD_IMPROVEMENT: Original word {old_word_id} not found.")
+                    "❌ [submit_word] OWN_WORD_IMPROVEMENT: Original word %s not found.", old_word_id)
                 # Decide if this should abort or be logged as an anomaly
                 return None  # Abort transaction
 
@@ -211,11 +242,9 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
             temp_robbed_word_tile_count = 0
 
             for i, stolen_word_id_iteration in enumerate(stolen_word_ids_from_extra):
-                stolen_word_index = next((index for (index, w) in enumerate(
-                    current_data.get('words', [])) if w["wordId"] == stolen_word_id_iteration), None)
+                stolen_word_ref = game_state.word(stolen_word_id_iteration)
 
-                if stolen_word_index is not None:
-                    stolen_word_ref = current_data['words'][stolen_word_index]
+                if stolen_word_ref is not None:
 
                     if i == 0:  # Capture details from the primary stolen word
                         temp_robbed_user_id = stolen_word_ref['current_owner_user_id']
@@ -239,10 +268,12 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
                         'becameWordString': current_word_string
                     })
                     logger.debug(
-                        f"[submit_word] Stolen word '{stolen_word_ref['word']}' ({stolen_word_id_iteration}) status updated.")
+                        "[submit_word] Stolen word '%s' (%s) status updated.",
+                        stolen_word_ref['word'], stolen_word_id_iteration)
                 else:
                     logger.warning(
-                        f"[submit_word] STEAL_WORD: Stolen word {stolen_word_id_iteration} not found. Continuing if others exist.")
+                        "[submit_word] STEAL_WORD: Stolen word %s not found. Continuing if others exist.",
+                        stolen_word_id_iteration)
 
             if temp_robbed_user_id is None:
                 logger.error(
@@ -262,30 +293,31 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
                 'stoleFromPrimaryWordId': primary_stolen_word_id_for_linking,
                 'stoleFromPrimaryWordString': primary_stolen_word_for_action.get('word', '')
             })
-            current_data.setdefault('words', []).append(new_word_data)
+            game_state.add_word(new_word_data)
 
             points_to_add_to_user_id = len(tile_ids)
             logger.debug(
-                f"[submit_word] New word '{current_word_string}' ({new_word_id}) from steal added.")
+                "[submit_word] New word '%s' (%s) from steal added.", current_word_string, new_word_id)
 
         else:
             logger.error(
-                f"[submit_word] Unexpected submission type: {submission_type}")
+                "[submit_word] Unexpected submission type: %s", submission_type)
             return None
 
         # 5. Update Tile Locations to the new_word_id
         for tile_obj in tiles_for_word:  # Use the fetched tile objects
             if tile_obj and 'tileId' in tile_obj:
                 tile_id_to_update = tile_obj['tileId']
-                tile_index_in_gamedata = next((index for (index, d) in enumerate(
-                    current_data['tiles']) if d["tileId"] == tile_id_to_update), None)
+                tile_index_in_gamedata = game_state.tile_index(tile_id_to_update)
                 if tile_index_in_gamedata is not None:
                     # Use new_word_id
-                    current_data['tiles'][tile_index_in_gamedata]['location'] = new_word_id
+                    game_state.tiles[tile_index_in_gamedata]['location'] = new_word_id
                 else:
                     logger.error(
-                        f"[submit_word] Tile ID {tile_id_to_update} not found in current data for location update.")
+                        "[submit_word] Tile ID %s not found in current data for location update.",
+                        tile_id_to_update)
                     return None
+        game_state.store_tiles()
 
         # 6. Update Player Score
         submitting_player_data = current_data['players'].get(user_id)
@@ -293,17 +325,18 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
             submitting_player_data['score'] = (submitting_player_data.get(
                 'score', 0) or 0) + points_to_add_to_user_id
             logger.debug(
-                f"[submit_word] Player {user_id} score updated to: {submitting_player_data['score']}")
+                "[submit_word] Player %s score updated to: %s", user_id, submitting_player_data['score'])
             if max_score_to_win_per_player and submitting_player_data['score'] >= max_score_to_win_per_player:
                 winner_found = True
                 current_data['status'] = 'winnerFound'
                 current_data['winner'] = {'userId': user_id, 'username': submitting_player_data.get(
                     'username', ''), 'score': submitting_player_data['score']}
                 logger.debug(
-                    f"🎉 [submit_word] Player {user_id} has reached the winning score: {submitting_player_data['score']}")
+                    "🎉 [submit_word] Player %s has reached the winning score: %s",
+                    user_id, submitting_player_data['score'])
         else:
             logger.error(
-                f"[submit_word] Submitting player ID {user_id} not found.")
+                "[submit_word] Submitting player ID %s not found.", user_id)
             return None
 
         if robbed_user_id_for_action and points_to_remove_from_robbed_user > 0:
@@ -315,10 +348,11 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
                 robbed_player_data['score'] = robbed_player_original_score - \
                     points_to_remove_from_robbed_user
                 logger.debug(
-                    f"[submit_word] Robbed player {robbed_user_id_for_action} score updated to: {robbed_player_data['score']}")
+                    "[submit_word] Robbed player %s score updated to: %s",
+                    robbed_user_id_for_action, robbed_player_data['score'])
             else:
                 logger.error(
-                    f"[submit_word] Robbed player ID {robbed_user_id_for_action} not found.")
+                    "[submit_word] Robbed player ID %s not found.", robbed_user_id_for_action)
                 # Decide if this should abort. For now, continue.
 
         # 7. Advance Turn
@@ -330,7 +364,7 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
             current_data['currentPlayerTurn'] = user_id
             for player_id, player_data in current_data['players'].items():
                 player_data['turn'] = (player_id == user_id)
-                logger.debug(f"[submit_word] Player turn set to: {user_id}")
+                logger.debug("[submit_word] Player turn set to: %s", user_id)
 
         # 8. Add Game Action
         action_payload = {
@@ -353,30 +387,31 @@ def submit_word(game_id: str, user_id: str, tile_ids: list[int]) -> dict:
                 'wordId')
             action_payload['originalWordString'] = primary_original_word_for_action.get(
                 'word')
-            print('🧡🧡🧡originalWordString = ', primary_original_word_for_action.get('word'))
 
         add_game_action(current_data, game_id, action_payload)
-        logger.debug(f"[submit_word] Game action added: {action_payload}")
+        logger.debug("[submit_word] Game action added: %s", action_payload)
 
         return current_data
     try:
-        game_ref.transaction(transaction_update)
+        updated_data = firebase_service.run_game_transaction(
+            game_id, SUBMIT_WORD_PATHS, transaction_update, snapshot=game_data)
+        compact_action_log(game_id, updated_data)
         return {
             'success': True,
             'message': 'Word submitted successfully',
             'submission_type': submission_type_str,
             'word': submitted_word_str
         }
-    except db.TransactionAbortedError as e:
-        logger.error(f"Transaction failed for game ID {game_id}: {e}")
+    except firebase_service.TransactionAbortedError as e:
+        logger.error("Transaction failed for game ID %s: %s", game_id, e)
         return {'success': False, 'message': 'Word submission failed due to conflict or error.'}
     except GameNotFoundError as e:
         logger.error(
-            f"Game not found during transaction for game ID {game_id}: {e}")
+            "Game not found during transaction for game ID %s: %s", game_id, e)
         return {'success': False, 'message': str(e)}
     except Exception as e:
         logger.exception(
-            f"An unexpected error occurred in submit_word for game ID {game_id}: {e}")
+            "An unexpected error occurred in submit_word for game ID %s: %s", game_id, e)
         return {'success': False, 'message': f'An unexpected error occurred: {str(e)}'}
 
 
@@ -389,43 +424,50 @@ def identifyWordSubmissionType(game_data, user_id, tile_ids):
     dictionary. It also identifies if the submission is an improvement of the 
     user's own word or a potential steal from another player.
 
+    The checks run cheapest first, and the board words a submission takes are
+    found from the locations of its tiles, so the cost doesn't grow with the
+    number of words in the game.
+
     Args:
-        game_data (dict): The game data containing information about the current 
+        game_data (dict | GameState): The game data containing information about the current 
             state of the game, including tiles and words.
         user_id (str): The ID of the user submitting the word.
         tile_ids (list): A list of tile IDs that are being submitted.
 
     Returns:
         tuple: A tuple containing the type of word submission (WordSubmissionType) 
-        and a list of word IDs if applicable.
+        and a list of word IDs if applicable. Words to steal are ordered by their
+        owners' scores, highest first.
 
     Raises:
         GameNotFoundError: If the game data is None.
     """
     if not game_data:
         logger.debug(
-            f"[game_service.py][identifyWordSubmissionType] Game data is None.")
+            "[game_service.py][identifyWordSubmissionType] Game data is None.")
         raise GameNotFoundError(f"Game data is None.") 
+    game_data = GameState.of(game_data)
 
-    tiles = [tile_service.get_tile_from_data(
-        game_data, tile_id) for tile_id in tile_ids]
-    middle_tiles_used_in_word = word_validation_service.get_middle_tiles_used_in_word(
-        tiles)
-    logger.debug(
-        f"[game_service.py][identifyWordSubmissionType] Tiles: {tiles}")
-    logger.debug(
-        f"[game_service.py][identifyWordSubmissionType] Middle Tiles Used: {middle_tiles_used_in_word}")
-
-    if not word_validation_service.is_valid_word_length(tiles):
+    # Cheapest rejections first; the dictionary is only consulted for words
+    # whose tiles are all available to the player
+    if len(tile_ids) < 3:
         logger.debug(
             "[game_service.py][identifyWordSubmissionType] Invalid word length")
         return WordSubmissionType.INVALID_LENGTH, []
+
+    tiles = [game_data.tile(tile_id) for tile_id in tile_ids]
+    middle_tiles_used_in_word = [tile for tile in tiles if tile and tile.get('location') == 'middle']
+    logger.debug(
+        "[game_service.py][identifyWordSubmissionType] Tiles: %s", tiles)
+    logger.debug(
+        "[game_service.py][identifyWordSubmissionType] Middle Tiles Used: %s", middle_tiles_used_in_word)
+
     if len(middle_tiles_used_in_word) == 0:
         logger.debug(
             "[game_service.py][identifyWordSubmissionType] No middle tiles used")
         return WordSubmissionType.INVALID_NO_MIDDLE, []
-    if not word_validation_service.uses_valid_letters(game_data, tiles):
-        logger.debug(f"Checking if valid letters were used...")
+    words_used = word_validation_service.get_words_used_in_word(game_data, tiles)
+    if words_used is None:
         logger.debug(
             "[game_service.py][identifyWordSubmissionType] Invalid letters used")
         return WordSubmissionType.INVALID_LETTERS_USED, []
@@ -434,42 +476,23 @@ def identifyWordSubmissionType(game_data, user_id, tile_ids):
             "[game_service.py][identifyWordSubmissionType] Word not in dictionary")
         return WordSubmissionType.INVALID_WORD_NOT_IN_DICTIONARY, []
 
-    if len(tiles) == len(middle_tiles_used_in_word):
+    if not words_used:
         logger.debug(
             "[game_service.py][identifyWordSubmissionType] Middle word")
         return WordSubmissionType.MIDDLE_WORD, []
 
-    potential_words_to_steal_from = []
-    words = game_data.get("words", {})
-    logger.debug(
-        f"[game_service.py][identifyWordSubmissionType] Words in game: {words}")
-
-    for word in words:
-        if word["status"] != "valid":
-            continue
-
-        word_tile_ids = set(word["tileIds"])
-        submitted_tile_ids = set(tile_ids)
-        middle_tile_ids = set(tile["tileId"]
-                              for tile in middle_tiles_used_in_word)
-
-        if word_tile_ids.issubset(submitted_tile_ids - middle_tile_ids):
-            if word["current_owner_user_id"] == user_id:
-                logger.debug(
-                    f"[game_service.py][identifyWordSubmissionType] Own word improvement: {word['wordId']}")
-                return WordSubmissionType.OWN_WORD_IMPROVEMENT, [word["wordId"]]
-            else:
-                potential_words_to_steal_from.append(word["wordId"])
-
-    if potential_words_to_steal_from:
-        logger.debug(
-            f"[game_service.py][identifyWordSubmissionType] Potential words to steal: {potential_words_to_steal_from}")
-        order_words_by_player_score(game_data, potential_words_to_steal_from)
-        return WordSubmissionType.STEAL_WORD, potential_words_to_steal_from
+    for word in words_used:
+        if word["current_owner_user_id"] == user_id:
+            logger.debug(
+                "[game_service.py][identifyWordSubmissionType] Own word improvement: %s", word['wordId'])
+            return WordSubmissionType.OWN_WORD_IMPROVEMENT, [word["wordId"]]
 
+    potential_words_to_steal_from = [word["wordId"] for word in words_used]
     logger.debug(
-        "[game_service.py][identifyWordSubmissionType] Returning Invalid Unknown Why")
-    return WordSubmissionType.INVALID_UNKNOWN_WHY, []
+        "[game_service.py][identifyWordSubmissionType] Potential words to steal: %s",
+        potential_words_to_steal_from)
+    return WordSubmissionType.STEAL_WORD, order_words_by_player_score(
+        game_data, potential_words_to_steal_from)
 
 
 def order_words_by_player_score(game_data: dict, potential_word_ids_to_steal_from: list[str]) -> list[str]:
@@ -480,7 +503,7 @@ def order_words_by_player_score(game_data: dict, potential_word_ids_to_steal_fro
     for sorting purposes.
 
     Args:
-        game_data (dict): The current game data, containing all words and player information.
+        game_data (dict | GameState): The current game data, containing all words and player information.
         potential_word_ids_to_steal_from (list[str]): A list of word IDs
             representing words that are candidates for stealing.
 
@@ -490,15 +513,11 @@ def order_words_by_player_score(game_data: dict, potential_word_ids_to_steal_fro
     """
 
     word_owner_details = []
-    all_words_in_game = game_data.get("words", [])
-    players_data = game_data.get("players", {})
-
-    # Create a more efficient lookup for word objects by their ID
-    word_map = {
-        word.get("wordId"): word for word in all_words_in_game if word.get("wordId")}
+    game_state = GameState.of(game_data)
+    players_data = game_state.players
 
     for word_id in potential_word_ids_to_steal_from:
-        word_obj = word_map.get(word_id)
+        word_obj = game_state.word(word_id)
         owner_score = 0 
 
         if word_obj:
@@ -508,13 +527,14 @@ def order_words_by_player_score(game_data: dict, potential_word_ids_to_steal_fro
             else:
                 if owner_id:
                     logger.warning(
-                        f"Owner ID '{owner_id}' for word '{word_id}' not found in players data. Assigning score 0.")
+                        "Owner ID '%s' for word '%s' not found in players data. Assigning score 0.",
+                        owner_id, word_id)
                 else:
                     logger.warning(
-                        f"Word '{word_id}' is missing 'current_owner_user_id'. Assigning score 0.")
+                        "Word '%s' is missing 'current_owner_user_id'. Assigning score 0.", word_id)
         else:
             logger.warning(
-                f"Word ID '{word_id}' not found in game words. Assigning score 0 for sorting.")
+                "Word ID '%s' not found in game words. Assigning score 0 for sorting.", word_id)
 
         word_owner_details.append({"word_id": word_id, "score": owner_score})
 
@@ -528,9 +548,15 @@ def order_words_by_player_score(game_data: dict, potential_word_ids_to_steal_fro
     return ordered_word_ids
 
 
-def flip_tile(game_id, user_id):
-    """Flips a tile within a transaction."""
-    game_ref = firebase_service.get_db_reference(f'games/{game_id}')
+def flip_tile(game_id, user_id, game_data=None):
+    """Flips a tile within a transaction.
+
+    Args:
+        game_id (str): The ID of the game.
+        user_id (str): The ID of the player flipping the tile.
+        game_data (dict, optional): A snapshot of the game already read in this
+            request; the first transaction attempt starts from it.
+    """
 
     def flip_tile_transaction(current_data):
         if not current_data:
@@ -538,49 +564,60 @@ def flip_tile(game_id, user_id):
 
         if current_data.get('currentPlayerTurn') != user_id:
             logger.warning(
-                f"User {user_id} attempted to flip a tile, but it is not their turn.")
+                "User %s attempted to flip a tile, but it is not their turn.", user_id)
             return  # Abort the transaction.
 
-        tiles = current_data.get('tiles', [])
+        game_state = GameState(current_data)
+        tiles = game_state.tiles
         remaining_letters = current_data.get('remainingLetters', {})
 
-        unflipped_tiles = [
-            tile for tile in tiles if tile['location'] == 'unflippedTilesPool']
-        available_letters = {l: c for l,
-                             c in remaining_letters.items() if c > 0}
-        if not unflipped_tiles or not available_letters:
-
-            logger.debug(
-                "flip_tile()... No unflipped tiles or no available letters.")
-
-            return current_data  # Return unchanged data.  Don't abort.
+        draw_position = current_data.get(DRAW_PILE_CURSOR_PATH)
+        if draw_position is not None:
+            draw_pile = tile_service.get_draw_pile(game_id)
+            if not draw_pile:
+                raise ValueError(f"Game {game_id} has no draw pile.")
+            drawn = tile_service.draw_from_pile(draw_pile, draw_position)
+            if drawn is None:
+                logger.debug("flip_tile()... The draw pile is empty.")
+                return current_data  # Return unchanged data.  Don't abort.
+            tile_id, letter = drawn
+            current_data[DRAW_PILE_CURSOR_PATH] = draw_position + 1
+            tile_index = game_state.tile_index(tile_id)
+            if tile_index is None or tiles[tile_index]['location'] != 'unflippedTilesPool':
+                raise ValueError(
+                    f"Inconsistency: Tile {tile_id} from the draw pile is not in the unflipped pool.")
+        else:
+            # Games created before draw piles pick a tile and letter at random
+            unflipped_tiles = [
+                tile for tile in tiles if tile['location'] == 'unflippedTilesPool']
+            available_letters = {l: c for l,
+                                 c in remaining_letters.items() if c > 0}
+            if not unflipped_tiles or not available_letters:
 
-        tile = random.choice(unflipped_tiles)
-        # Choose from letters that actually have counts > 0
-        letters, counts = zip(*available_letters.items())
+                logger.debug(
+                    "flip_tile()... No unflipped tiles or no available letters.")
 
-        positive_counts = [max(0, c) for c in counts]
-        if not any(positive_counts):  # Double check if somehow all counts became zero or negative
-            logger.warning(
-                "flip_tile()... No letters with positive counts available for selection.")
-            return current_data
+                return current_data  # Return unchanged data.  Don't abort.
 
-        letter = random.choices(letters, weights=positive_counts, k=1)[0]
-        logger.debug(f"🔄 Chosen letter: {letter}")
+            tile_id = random.choice(unflipped_tiles)['tileId']
+            # Choose from letters that actually have counts > 0
+            letters, counts = zip(*available_letters.items())
+            letter = random.choices(letters, weights=counts, k=1)[0]
 
-        tile_index = next((index for (index, t) in enumerate(
-            tiles) if t['tileId'] == tile['tileId']), None)
-        if tile_index is None:
-            logger.error(
-                f"Error: Could not find tile with ID {tile['tileId']} in flip_tile")
-            # Abort transaction if tile index not found
-            raise ValueError(
-                f"Tile with ID {tile['tileId']} not found during transaction.")
+            tile_index = game_state.tile_index(tile_id)
+            if tile_index is None:
+                logger.error(
+                    "Error: Could not find tile with ID %s in flip_tile", tile_id)
+                # Abort transaction if tile index not found
+                raise ValueError(
+                    f"Tile with ID {tile_id} not found during transaction.")
+        logger.debug("🔄 Chosen letter: %s", letter)
 
         # Update the tile within the current_data
-        current_data['tiles'][tile_index]['letter'] = letter
-        current_data['tiles'][tile_index]['location'] = 'middle'
-        current_data['tiles'][tile_index]['flippedTimestamp'] = int(datetime.now().timestamp() * 1000)
+        tiles[tile_index]['letter'] = letter
+        tiles[tile_index]['location'] = 'middle'
+        tiles[tile_index]['flippedTimestamp'] = int(datetime.now().timestamp() * 1000)
+        game_state.store_tiles()
 
         # Update remainingLetters count
         # Use the original remaining_letters dict for updating
@@ -591,7 +628,8 @@ def flip_tile(game_id, user_id):
                 del remaining_letters[letter]
         else:
             logger.error(
-                f"Chosen letter '{letter}' not found in remaining_letters dictionary. This should not happen.")
+                "Chosen letter '%s' not found in remaining_letters dictionary. This should not happen.",
+                letter)
             # Decide how to handle this error - potentially abort
             raise ValueError(
                 f"Inconsistency: Chosen letter '{letter}' not in remaining_letters.")
@@ -604,7 +642,7 @@ def flip_tile(game_id, user_id):
             'type': 'flip_tile',
             'playerId': user_id,
             'timestamp': int(datetime.now().timestamp() * 1000),
-            'tileId': tile['tileId'],
+            'tileId': tile_id,
             'tileLetter': letter
         })
 
@@ -626,25 +664,24 @@ def flip_tile(game_id, user_id):
         return current_data
 
     try:
-        updated_data = game_ref.transaction(flip_tile_transaction)
-        print(f"Tile flipped successfully for game ID {game_id}.")
+        updated_data = firebase_service.run_game_transaction(
+            game_id, FLIP_TILE_PATHS, flip_tile_transaction, snapshot=game_data)
+        compact_action_log(game_id, updated_data)
+        logger.debug("Tile flipped successfully for game ID %s.", game_id)
         # Log the remainingLetters after choosing a letter
         remaining_letters = updated_data.get('remainingLetters', {})
         logger.debug(
-            f"🔄 remainingLetters after choosing a letter: {remaining_letters}")
+            "🔄 remainingLetters after choosing a letter: %s", remaining_letters)
 
         return True
-    except db.TransactionAbortedError as e:
-        print(f"Transaction failed for flip_tile in game ID {game_id}: {e}")
+    except firebase_service.TransactionAbortedError as e:
+        logger.info("Transaction failed for flip_tile in game ID %s: %s", game_id, e)
         return False
     except GameNotFoundError as e:
-        print(e)
-        print("⭐️ Game not found during flip_tile transaction.")
+        logger.error("Game not found during flip_tile transaction: %s", e)
         return False
     except Exception as e:
-        print("⭐️ Exception in flip_tile transaction:")
-        logger.exception(f"An unexpected error occurred in flip_tile: {e}")
-        print(f"An unexpected error occurred: {e}")
+        logger.exception("An unexpected error occurred in flip_tile: %s", e)
         return False
 
 
@@ -668,14 +705,12 @@ def get_game(game_id):
 
 
 def update_game(game_id, updated_data):
-    """Updates a game in the database."""
-    ref = firebase_service.get_db_reference(f'games/{game_id}')
-    ref.update(updated_data)
+    """Updates a game in the database (see firebase_service.update_game)."""
+    firebase_service.update_game(game_id, updated_data)
 
 
 def add_player_to_game(game_id, user_id, username):
     """Adds a player to a game within a transaction."""
-    game_ref = firebase_service.get_db_reference(f'games/{game_id}')
 
     def update_players(current_data):
         if current_data is None:
@@ -694,7 +729,7 @@ def add_player_to_game(game_id, user_id, username):
         current_data['players'] = players
 
         # Recalculate max_score_to_win_per_player: total tiles / number of players
-        total_tiles = len(current_data.get('tiles', []))
+        total_tiles = len(GameState(current_data).tiles)
         num_players = len(players)
         if num_players > 0:
             current_data['max_score_to_win_per_player'] = total_tiles // num_players
@@ -702,58 +737,85 @@ def add_player_to_game(game_id, user_id, username):
         return current_data
 
     try:
-        game_ref.transaction(update_players)
+        firebase_service.run_game_transaction(
+            game_id, ADD_PLAYER_PATHS, update_players)
         return True
-    except db.TransactionAbortedError as e:
+    except firebase_service.TransactionAbortedError as e:
         logger.error(
-            f"Transaction failed for adding player to game ID {game_id}: {e}")
+            "Transaction failed for adding player to game ID %s: %s", game_id, e)
         return False
     except Exception as e:
         logger.error(
-            f"An unexpected error occurred while adding player to game: {e}")
+            "An unexpected error occurred while adding player to game: %s", e)
         return False
 
 
-def create_game(user_id, username, game_type):
-    """Creates a new game in the database with the user_id as a player."""
-    ref = firebase_service.get_db_reference('games')
-    game_id = str(uuid.uuid4().int)[:4]
-
-    def transaction_create_game(current_data):
-        remainingLetters = {
-            "A": 11,
-            "B": 2,
-            "C": 4,
-            "D": 6,
-            "E": 18,
-            "F": 3,
-            "G": 4,
-            "H": 6,
-            "I": 13,
-            "J": 2,
-            "K": 2,
-            "L": 6,
-            "M": 4,
-            "N": 9,
-            "O": 11,
-            "P": 3,
-            "Q": 2,
-            "R": 8,
-            "S": 6,
-            "T": 11,
-            "U": 5,
-            "V": 2,
-            "W": 3,
-            "X": 2,
-            "Y": 3,
-            "Z": 2,
-        }
-        num_tiles = sum(remainingLetters.values())
-        tiles = [
-            {"letter": "", "location": "unflippedTilesPool", "tileId": i}
-            for i in range(num_tiles)
-        ]
+class GameIdTakenError(Exception):
+    pass
+
+
+# Game IDs are short so players can type them; they grow a digit whenever
+# GAME_ID_ATTEMPTS_PER_LENGTH random IDs in a row turn out to be taken.
+GAME_ID_MIN_LENGTH = 4
+GAME_ID_MAX_LENGTH = 12
+GAME_ID_ATTEMPTS_PER_LENGTH = 5
+
+
+def _random_game_id(length):
+    return str(random.randint(10 ** (length - 1), 10 ** length - 1))
+
+
+def create_game(user_id, username, game_type, seed=None):
+    """Creates a new game in the database with the user_id as a player.
+
+    The game is written with a transaction on its own node only, which fails
+    if the randomly chosen ID is already taken; in that case another ID is
+    tried. Creation therefore never reads or conflicts with other games.
 
+    The order tiles are flipped in is shuffled here and stored next to the
+    game, where players can't read it (see tile_service.new_draw_pile). Games created with the same seed flip
+    the same letters in the same order; seed defaults to GAME_RANDOM_SEED,
+    and to a fresh shuffle per game when that isn't set either.
+    """
+    remainingLetters = {
+        "A": 11,
+        "B": 2,
+        "C": 4,
+        "D": 6,
+        "E": 18,
+        "F": 3,
+        "G": 4,
+        "H": 6,
+        "I": 13,
+        "J": 2,
+        "K": 2,
+        "L": 6,
+        "M": 4,
+        "N": 9,
+        "O": 11,
+        "P": 3,
+        "Q": 2,
+        "R": 8,
+        "S": 6,
+        "T": 11,
+        "U": 5,
+        "V": 2,
+        "W": 3,
+        "X": 2,
+        "Y": 3,
+        "Z": 2,
+    }
+    num_tiles = sum(remainingLetters.values())
+    tiles = [
+        {"letter": "", "location": "unflippedTilesPool", "tileId": i}
+        for i in range(num_tiles)
+    ]
+    if seed is None:
+        seed = GAME_RANDOM_SEED
+    rng = random if seed is None else random.Random(seed)
+    draw_pile = tile_service.new_draw_pile(remainingLetters, num_tiles, rng)
+
+    def build_game(game_id):
         players = {}
         if game_type == "computer":
             players = {
@@ -763,38 +825,65 @@ def create_game(user_id, username, game_type):
 
                 },
             }
-        new_game = {
+        # The creator joins in the same write (see add_player_to_game)
+        players[user_id] = {'game_id': game_id, 'username': username,
+                            'score': 0, 'turn': True, 'turnOrder': len(players) + 1}
+        game = {
             "gameType": game_type,
             "currentPlayerTurn": user_id,
             "currentTurn": 0,
             "gameStatus": "inProgress",
             "remainingLetters": remainingLetters,
-            "tiles": tiles,
+            DRAW_PILE_CURSOR_PATH: 0,
             "words": [],
             "players": players,
+            "max_score_to_win_per_player": num_tiles // len(players),
         }
-        current_data[game_id] = new_game
-        return current_data
+        if TILE_ENCODING == TILE_ENCODING_PACKED:
+            game[PACKED_TILES_PATH] = pack_tiles(tiles)
+        else:
+            game["tiles"] = tiles
+        return game
+
+    def claim_game_id(current_data):
+        if current_data is not None:
+            raise GameIdTakenError()
+        return new_game
 
     try:
-        ref.transaction(transaction_create_game)
-        success = add_player_to_game(game_id, user_id, username)
-        if success:
-            return game_id
-        else:
-            return None
-    except db.TransactionAbortedError as e:
-        logger.error(f"Transaction failed for creating game: {e}")
+        for length in range(GAME_ID_MIN_LENGTH, GAME_ID_MAX_LENGTH + 1):
+            for _ in range(GAME_ID_ATTEMPTS_PER_LENGTH):
+                game_id = _random_game_id(length)
+                new_game = build_game(game_id)
+                try:
+                    firebase_service.get_db_reference(
+                        f'games/{game_id}').transaction(claim_game_id)
+                except GameIdTakenError:
+                    logger.debug("create_game() --> Game ID %s is taken, retrying", game_id)
+                    continue
+                # Only once the ID is ours, so another game's pile is never overwritten
+                try:
+                    tile_service.save_draw_pile(game_id, draw_pile)
+                except Exception:
+                    delete_game(game_id)
+                    raise
+                return game_id
+        logger.error("create_game() --> Could not allocate a free game ID")
+        return None
+    except firebase_service.TransactionAbortedError as e:
+        logger.error("Transaction failed for creating game: %s", e)
         return None
     except Exception as e:
-        logger.error(f"An unexpected error occurred while creating game: {e}")
+        logger.error("An unexpected error occurred while creating game: %s", e)
         return None
 
 
 def delete_game(game_id):
-    """Deletes a game from the database."""
+    """Deletes a game, its draw pile and its archived action log from the database."""
     ref = firebase_service.get_db_reference(f'games/{game_id}')
     ref.delete()
+    tile_service.delete_draw_pile(game_id)
+    action_log_service.delete_action_history(game_id)
 
 
 def get_games_with_current_player(player_id):
@@ -808,7 +897,7 @@ def get_games_with_current_player(player_id):
         dict or None: A dictionary of games matching the criteria, or None if no games are found.
                       The dictionary keys will be the game IDs.
     """
-    print(f"Querying games for currentPlayerTurn = '{player_id}'...")
+    logger.debug("Querying games for currentPlayerTurn = '%s'...", player_id)
     try:
         games_snapshot = firebase_service.get_db_reference("games") \
                                          .order_by_child("currentPlayerTurn") \
@@ -816,8 +905,8 @@ def get_games_with_current_player(player_id):
                                          .get()
         all_game_ids = list(games_snapshot.keys())
 
-        print(f"All Game IDs: {all_game_ids}")
+        logger.debug("All Game IDs: %s", all_game_ids)
         return all_game_ids
     except Exception as e:
-        print(f"An error occurred while fetching games: {e}")
+        logger.error("An error occurred while fetching games: %s", e)
         return None
@@ -0,0 +1,295 @@
+import copy
+import threading
+from firebase_admin import db
+
+# Raised by every store when a transaction can't be committed, so callers
+# only need to catch one exception type.
+TransactionAbortedError = db.TransactionAbortedError
+
+TRANSACTION_MAX_RETRIES = 25
+
+
+class GameStore:
+    """Storage backend for game state.
+
+    A store hands out references that behave like firebase_admin's
+    ``db.Reference``: ``get``, ``set``, ``update`` (multi-path), ``delete``,
+    ``transaction``, ``child`` and ``order_by_child(...).equal_to(...).get()``.
+    Services only talk to the store through firebase_service.get_db_reference,
+    so they run unchanged against any backend.
+    """
+
+    name = None
+
+    def reference(self, path: str = None):
+        """Returns a reference to a location in the store.
+
+        Args:
+            path (str, optional): The path to the desired location. Defaults to the root.
+        """
+        raise NotImplementedError
+
+
+class FirebaseGameStore(GameStore):
+    """The Firebase Realtime Database (requires firebase_admin.initialize_app)."""
+
+    name = 'firebase'
+
+    def reference(self, path: str = None) -> db.Reference:
+        return db.reference(path)
+
+
+def _split_path(path: str | None) -> list[str]:
+    return [part for part in (path or '').split('/') if part]
+
+
+def _normalize(value):
+    """Converts a value to how the Realtime Database stores it.
+
+    Lists become maps keyed by index, keys become strings, and None values and
+    empty containers disappear.
+    """
+    if isinstance(value, (list, tuple)):
+        value = {str(index): child for index, child in enumerate(value)}
+    if isinstance(value, dict):
+        normalized = {}
+        for key, child in value.items():
+            child = _normalize(child)
+            if child is not None:
+                normalized[str(key)] = child
+        return normalized or None
+    return value
+
+
+def _is_array_key(key: str) -> bool:
+    return key.isdigit() and str(int(key)) == key
+
+
+def _denormalize(value):
+    """Converts a stored value to what the Realtime Database returns.
+
+    Like the real database, maps whose keys are all integers come back as
+    lists when more than half of the indexes up to the largest key are set.
+    """
+    if not isinstance(value, dict):
+        return value
+    children = {key: _denormalize(child) for key, child in value.items()}
+    if children and all(_is_array_key(key) for key in children):
+        length = max(int(key) for key in children) + 1
+        if len(children) * 2 > length:
+            return [children.get(str(index)) for index in range(length)]
+    return children
+
+
+class InMemoryGameStore(GameStore):
+    """A process-local store with the Realtime Database's data and transaction semantics.
+
+    Data is kept as one tree of dicts guarded by a lock. Transactions are
+    optimistic like Firebase's: the update function runs on a copy of the
+    current value outside the lock, and the result is only committed if the
+    value hasn't changed in the meantime; otherwise the function is retried,
+    up to TRANSACTION_MAX_RETRIES times.
+    """
+
+    name = 'memory'
+
+    def __init__(self, data: dict = None):
+        self._lock = threading.RLock()
+        self._root = _normalize(data) or {}
+
+    def reference(self, path: str = None):
+        return MemoryReference(self, _split_path(path))
+
+    def _read(self, parts: list[str]):
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _write(self, parts: list[str], value):
+        value = _normalize(copy.deepcopy(value))
+        if not parts:
+            self._root = value or {}
+            return
+
+        # Walk down, creating parents, and remember the path for pruning
+        node = self._root
+        parents = []
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = {}
+                node[part] = child
+            parents.append((node, part))
+            node = child
+
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+        # Like the real database, drop parents left without children
+        for parent, part in reversed(parents):
+            if parent[part]:
+                break
+            del parent[part]
+
+
+class MemoryReference:
+    """A db.Reference-compatible handle on a location in an InMemoryGameStore."""
+
+    def __init__(self, store: InMemoryGameStore, parts: list[str]):
+        self._store = store
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self._parts)
+
+    @property
+    def parent(self):
+        if not self._parts:
+            return None
+        return MemoryReference(self._store, self._parts[:-1])
+
+    def child(self, path: str):
+        return MemoryReference(self._store, self._parts + _split_path(path))
+
+    def get(self, etag=False, shallow=False):
+        with self._store._lock:
+            value = self._store._read(self._parts)
+            if shallow and isinstance(value, dict):
+                result = {key: True for key in value}
+            else:
+                result = _denormalize(copy.deepcopy(value))
+        if etag:
+            return result, repr(value)
+        return result
+
+    def set(self, value):
+        if value is None:
+            raise ValueError('Value must not be None.')
+        with self._store._lock:
+            self._store._write(self._parts, value)
+
+    def update(self, value):
+        if not value or not isinstance(value, dict):
+            raise ValueError('Value argument must be a non-empty dictionary.')
+        if None in value.keys():
+            raise ValueError('Dictionary must not contain None keys.')
+        with self._store._lock:
+            for path, child in value.items():
+                self._store._write(self._parts + _split_path(path), child)
+
+    def delete(self):
+        with self._store._lock:
+            self._store._write(self._parts, None)
+
+    def transaction(self, transaction_update):
+        if not callable(transaction_update):
+            raise ValueError('transaction_update must be a function.')
+
+        for _ in range(TRANSACTION_MAX_RETRIES):
+            with self._store._lock:
+                snapshot = copy.deepcopy(self._store._read(self._parts))
+            new_data = transaction_update(_denormalize(copy.deepcopy(snapshot)))
+            if new_data is None:
+                raise ValueError('Value must not be none.')
+            with self._store._lock:
+                if self._store._read(self._parts) == snapshot:
+                    self._store._write(self._parts, new_data)
+                    return new_data
+        raise TransactionAbortedError('Transaction aborted after failed retries.')
+
+    def order_by_child(self, path: str):
+        return MemoryQuery(self, lambda key, value: _child_value(value, path))
+
+    def order_by_key(self):
+        return MemoryQuery(self, lambda key, value: key)
+
+    def order_by_value(self):
+        return MemoryQuery(self, lambda key, value: value)
+
+
+def _child_value(value, path):
+    for part in _split_path(path):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+class MemoryQuery:
+    """A db.Query-compatible query over the children of a MemoryReference."""
+
+    def __init__(self, reference: MemoryReference, order_key):
+        self._reference = reference
+        self._order_key = order_key
+        self._filters = []
+        self._limit_first = None
+        self._limit_last = None
+
+    def equal_to(self, value):
+        self._filters.append(lambda v: v == value)
+        return self
+
+    def start_at(self, value):
+        self._filters.append(lambda v: v is not None and v >= value)
+        return self
+
+    def end_at(self, value):
+        self._filters.append(lambda v: v is not None and v <= value)
+        return self
+
+    def limit_to_first(self, limit: int):
+        self._limit_first = limit
+        return self
+
+    def limit_to_last(self, limit: int):
+        self._limit_last = limit
+        return self
+
+    def get(self):
+        with self._reference._store._lock:
+            children = copy.deepcopy(self._reference._store._read(self._reference._parts))
+        if not isinstance(children, dict):
+            return {}
+
+        ordered = []
+        for key, value in children.items():
+            sort_value = self._order_key(key, value)
+            if all(matches(sort_value) for matches in self._filters):
+                ordered.append((sort_value is not None, sort_value, key, value))
+        ordered.sort(key=lambda item: (item[0], _sort_token(item[1]), item[2]))
+        if self._limit_first is not None:
+            ordered = ordered[:self._limit_first]
+        if self._limit_last is not None:
+            ordered = ordered[-self._limit_last:] if self._limit_last else []
+        return {key: _denormalize(value) for _, _, key, value in ordered}
+
+
+def _sort_token(value):
+    # Order mixed types the way the Realtime Database does: booleans, numbers, strings, objects
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, repr(value))
+
+
+def create_store(name: str) -> GameStore:
+    """Creates the store backend with the given name ('firebase' or 'memory')."""
+    stores = {store.name: store for store in (FirebaseGameStore, InMemoryGameStore)}
+    if name not in stores:
+        raise ValueError(f"Unknown game store '{name}', expected one of {sorted(stores)}.")
+    return stores[name]()
@@ -1,7 +1,40 @@
 # build_map.py
 from collections import defaultdict
+from array import array
+import mmap
 import os
 import pickle
+import sys
+import threading
+import zlib
+from logging_config import logger
+
+# Layout of the anagram index file (all integers are little-endian uint32):
+#
+#   header        MAGIC, version, key_count, word_count, bucket_count,
+#                 node_count
+#   key_offsets   key_count + 1 offsets into the key blob
+#   word_starts   key_count + 1 indexes into word_offsets (words of key i are
+#                 word_starts[i] .. word_starts[i + 1])
+#   word_offsets  word_count + 1 offsets into the word blob
+#   buckets       bucket_count slots of (key index + 1), 0 = empty, probed
+#                 linearly from crc32(key) % bucket_count
+#   node_edges    node_count + 1 indexes into edge_letters (edges of trie
+#                 node n are node_edges[n] .. node_edges[n + 1])
+#   node_keys     node_count slots of (key index + 1), 0 = not a key
+#   key blob      sorted keys, ascii
+#   word blob     words, ascii
+#   edge_letters  node_count - 1 bytes, the letter on each trie edge
+#
+# The trie is built over the sorted keys and numbered breadth-first, so edge
+# e always leads to node e + 1 and a node's edges are sorted by letter.
+ANAGRAM_INDEX_MAGIC = b'ANAGIDX1'
+ANAGRAM_INDEX_VERSION = 2
+_HEADER_SIZE = len(ANAGRAM_INDEX_MAGIC) + 4 * 5
+
+_loaded_indexes = {}
+_loaded_indexes_lock = threading.Lock()
+
 
 def build_anagram_map(dict_path, out_path='anagram_map.pkl'):
     """Builds a map of sorted letter combinations to words from a dictionary file.
@@ -19,7 +52,280 @@ def build_anagram_map(dict_path, out_path='anagram_map.pkl'):
                 anagram_map[key].append(w)
     with open(out_path, 'wb') as f:
         pickle.dump(anagram_map, f)
-    print(f"Built map with {len(anagram_map)} keys.")
+    logger.info("Built map with %s keys.", len(anagram_map))
+
+
+def build_anagram_index(dict_path, out_path='anagram_index.bin'):
+    """Builds the memory-mappable anagram index from a dictionary file.
+
+    Args:
+        dict_path (str): Path to the dictionary file.
+        out_path (str): Path to save the index file.
+    """
+    anagram_map = defaultdict(list)
+    with open(dict_path, 'r') as f:
+        for line in f:
+            w = line.strip().lower()
+            if len(w) >= 3:
+                anagram_map[''.join(sorted(w))].append(w)
+    write_anagram_index(anagram_map, out_path)
+
+
+def write_anagram_index(anagram_map, out_path):
+    """Writes an anagram map (sorted letters -> words) in the index file format.
+
+    The file is written to a temporary path first and then moved into place,
+    so concurrent readers never see a partially written index.
+
+    Args:
+        anagram_map (dict): Mapping of sorted letter keys to lists of words.
+        out_path (str): Path to save the index file.
+    """
+    keys = sorted(anagram_map)
+    key_offsets = array('I', [0])
+    word_starts = array('I', [0])
+    word_offsets = array('I', [0])
+    key_blob = bytearray()
+    word_blob = bytearray()
+
+    for key in keys:
+        key_blob += key.encode('ascii')
+        key_offsets.append(len(key_blob))
+        for word in anagram_map[key]:
+            word_blob += word.encode('ascii')
+            word_offsets.append(len(word_blob))
+        word_starts.append(len(word_offsets) - 1)
+
+    bucket_count = 1
+    while bucket_count < 2 * max(len(keys), 1):
+        bucket_count *= 2
+    buckets = array('I', bytes(4 * bucket_count))
+    for i, key in enumerate(keys):
+        slot = zlib.crc32(key.encode('ascii')) % bucket_count
+        while buckets[slot]:
+            slot = (slot + 1) % bucket_count
+        buckets[slot] = i + 1
+
+    node_edges, node_keys, edge_letters = _build_key_trie(keys)
+
+    header = array('I', [ANAGRAM_INDEX_VERSION, len(keys), len(word_offsets) - 1, bucket_count,
+                         len(node_keys)])
+    tables = [header, key_offsets, word_starts, word_offsets, buckets, node_edges, node_keys]
+    if sys.byteorder != 'little':
+        for table in tables:
+            table.byteswap()
+
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(ANAGRAM_INDEX_MAGIC)
+        for table in tables:
+            f.write(table.tobytes())
+        f.write(key_blob)
+        f.write(word_blob)
+        f.write(edge_letters)
+    os.replace(tmp_path, out_path)
+    logger.info("Built anagram index with %s keys and %s words.", len(keys), len(word_offsets) - 1)
+
+
+def _build_key_trie(keys):
+    """Builds the breadth-first numbered trie tables for a list of sorted keys.
+
+    Args:
+        keys (list[str]): The index keys, in sorted order.
+
+    Returns:
+        tuple: The node_edges and node_keys arrays and the edge_letters bytes.
+    """
+    root = {}
+    for key_index, key in enumerate(keys):
+        node = root
+        for letter in key.encode('ascii'):
+            node = node.setdefault(letter, {})
+        node[None] = key_index + 1
+
+    node_edges = array('I', [0])
+    node_keys = array('I')
+    edge_letters = bytearray()
+    queue = [root]
+    for node in queue:  # the queue grows while we walk it
+        node_keys.append(node.get(None, 0))
+        for letter in sorted(letter for letter in node if letter is not None):
+            edge_letters.append(letter)
+            queue.append(node[letter])
+        node_edges.append(len(edge_letters))
+    return node_edges, node_keys, edge_letters
+
+
+def ensure_anagram_index(index_path, dict_path, anagram_map_path):
+    """Builds the anagram index at index_path unless an up-to-date one is there.
+
+    The index is built from the dictionary file, or from the checked-in
+    pickled anagram map when the dictionary isn't deployed.
+
+    Args:
+        index_path (str): Path of the index file.
+        dict_path (str): Path to the dictionary file.
+        anagram_map_path (str): Path to the pickled anagram map.
+    """
+    if not anagram_index_needs_rebuild(index_path):
+        logger.info("Anagram index already exists.")
+        return
+    logger.info("Building anagram index...")
+    if os.path.exists(dict_path):
+        build_anagram_index(dict_path, index_path)
+    else:
+        with open(anagram_map_path, 'rb') as f:
+            write_anagram_index(pickle.load(f), index_path)
+
+
+def anagram_index_needs_rebuild(path):
+    """Checks whether the index at path is missing or was written in an older format.
+
+    Args:
+        path (str): Path to the index file.
+
+    Returns:
+        bool: True if the index should be (re)built.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+    except FileNotFoundError:
+        return True
+    if header[:len(ANAGRAM_INDEX_MAGIC)] != ANAGRAM_INDEX_MAGIC or len(header) < _HEADER_SIZE:
+        return True
+    return int.from_bytes(header[len(ANAGRAM_INDEX_MAGIC):len(ANAGRAM_INDEX_MAGIC) + 4],
+                          'little') != ANAGRAM_INDEX_VERSION
+
+
+class AnagramIndex:
+    """Read-only, memory-mapped view of an anagram index file.
+
+    Behaves like the pickled anagram map for lookups (``key in index``,
+    ``index[key]``, ``index.get(key)``) but keeps the data in the page cache,
+    so every BotService in the process (and every process on the host) shares
+    one copy.
+
+    ``node_edges``, ``node_keys`` and ``edge_letters`` expose the trie over the
+    sorted keys that word_search_service walks to generate moves.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(ANAGRAM_INDEX_MAGIC)] != ANAGRAM_INDEX_MAGIC:
+            raise ValueError(f"{path} is not an anagram index file.")
+
+        header = self._u32_table(len(ANAGRAM_INDEX_MAGIC), 5)
+        version, self.key_count, self.word_count, self.bucket_count, self.node_count = header
+        if version != ANAGRAM_INDEX_VERSION:
+            raise ValueError(
+                f"{path} has index version {version}, expected {ANAGRAM_INDEX_VERSION}.")
+
+        offset = _HEADER_SIZE
+        self._key_offsets = self._u32_table(offset, self.key_count + 1)
+        offset += 4 * (self.key_count + 1)
+        self._word_starts = self._u32_table(offset, self.key_count + 1)
+        offset += 4 * (self.key_count + 1)
+        self._word_offsets = self._u32_table(offset, self.word_count + 1)
+        offset += 4 * (self.word_count + 1)
+        self._buckets = self._u32_table(offset, self.bucket_count)
+        offset += 4 * self.bucket_count
+        self.node_edges = self._u32_table(offset, self.node_count + 1)
+        offset += 4 * (self.node_count + 1)
+        self.node_keys = self._u32_table(offset, self.node_count)
+        offset += 4 * self.node_count
+        self._key_blob_start = offset
+        self._word_blob_start = offset + self._key_offsets[self.key_count]
+        edge_letters_start = self._word_blob_start + self._word_offsets[self.word_count]
+        self.edge_letters = memoryview(self._mm)[
+            edge_letters_start:edge_letters_start + self.node_count - 1]
+
+    def _u32_table(self, offset, count):
+        view = memoryview(self._mm)[offset:offset + 4 * count]
+        if sys.byteorder == 'little':
+            return view.cast('I')
+        table = array('I', view.tobytes())
+        table.byteswap()
+        return table
+
+    def __len__(self):
+        return self.key_count
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def __getitem__(self, key):
+        key_index = self.find(key)
+        if key_index < 0:
+            raise KeyError(key)
+        return self.words_at(key_index)
+
+    def get(self, key, default=None):
+        key_index = self.find(key)
+        if key_index < 0:
+            return default
+        return self.words_at(key_index)
+
+    def find(self, key):
+        """Returns the index of a sorted-letter key, or -1 if it is not present."""
+        try:
+            key_bytes = key.encode('ascii')
+        except UnicodeEncodeError:
+            return -1
+        slot = zlib.crc32(key_bytes) % self.bucket_count
+        while True:
+            entry = self._buckets[slot]
+            if not entry:
+                return -1
+            start = self._key_blob_start + self._key_offsets[entry - 1]
+            end = self._key_blob_start + self._key_offsets[entry]
+            if self._mm[start:end] == key_bytes:
+                return entry - 1
+            slot = (slot + 1) % self.bucket_count
+
+    def key_at(self, key_index):
+        """Returns the key stored at a position in sorted key order."""
+        start = self._key_blob_start + self._key_offsets[key_index]
+        end = self._key_blob_start + self._key_offsets[key_index + 1]
+        return self._mm[start:end].decode('ascii')
+
+    def words_at(self, key_index):
+        """Returns the words whose letters sort to the key at key_index."""
+        words = []
+        for word_index in range(self._word_starts[key_index], self._word_starts[key_index + 1]):
+            start = self._word_blob_start + self._word_offsets[word_index]
+            end = self._word_blob_start + self._word_offsets[word_index + 1]
+            words.append(self._mm[start:end].decode('ascii'))
+        return words
+
+    def keys(self):
+        """Yields every key in sorted order."""
+        for key_index in range(self.key_count):
+            yield self.key_at(key_index)
+
+
+def load_anagram_index(path):
+    """Returns the process-wide AnagramIndex for a path, mapping it on first use.
+
+    Args:
+        path (str): Path to the index file.
+
+    Returns:
+        AnagramIndex: The shared, read-only index.
+    """
+    path = os.path.abspath(path)
+    index = _loaded_indexes.get(path)
+    if index is None:
+        with _loaded_indexes_lock:
+            index = _loaded_indexes.get(path)
+            if index is None:
+                index = AnagramIndex(path)
+                _loaded_indexes[path] = index
+    return index
+
 
 if __name__ == '__main__':
 
@@ -27,4 +333,4 @@ if __name__ == '__main__':
     word_file_path = os.path.abspath(
         os.path.join(base_dir, '..', 'word_validation', 'dictionary.txt')
     )
-    build_anagram_map(word_file_path)
\ No newline at end of file
+    build_anagram_index(word_file_path, os.path.join(base_dir, 'anagram_index.bin'))
@@ -0,0 +1,237 @@
+import contextlib
+import contextvars
+import functools
+import json
+import random
+import threading
+import time
+from config import METRICS_ENABLED, METRICS_PAYLOAD_SAMPLE_RATE
+
+# In-process metrics, rendered in the Prometheus text format by app.py's
+# /metrics endpoint.
+#
+# Recording a sample is a dict lookup and a few additions under one lock, so
+# it stays on in production. Timings are also added to the spans of the
+# current request (see begin_request), which app.py sends back in a
+# Server-Timing header so a slow request can be broken down in the browser's
+# network panel.
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ATTEMPTS_BUCKETS = (1, 2, 3, 5, 10, 25)
+
+_HELP = {
+    'carnivore_http_request_seconds': ('histogram', 'Time to handle a request, by endpoint.'),
+    'carnivore_span_seconds': ('histogram', 'Time spent in a step of request or bot work, by span.'),
+    'carnivore_db_payload_bytes': ('histogram', 'JSON size of data read from or written to the game store.'),
+    'carnivore_game_transaction_attempts': ('histogram', 'Attempts run_game_transaction needed to commit.'),
+    'carnivore_game_transaction_retries_total': ('counter', 'Game transaction attempts retried, by reason.'),
+    'carnivore_bot_turns_pending': ('gauge', 'Bot turns waiting for their delay to pass.'),
+    'carnivore_bot_turns_running': ('gauge', 'Bot turns being played on the turn threads.'),
+    'carnivore_bot_turn_reruns_queued': ('gauge', 'Running bot turns with another turn queued after them.'),
+    'carnivore_bot_turn_max_overdue_seconds': ('gauge', 'How long the most overdue waiting bot turn has been due.'),
+    'carnivore_bot_turn_workers': ('gauge', 'Threads that play bot turns.'),
+    'carnivore_bot_turns_scheduled_total': ('counter', 'Bot turns scheduled.'),
+    'carnivore_bot_turns_coalesced_total': ('counter', 'Bot turn requests merged into a turn already waiting or running.'),
+    'carnivore_bot_turns_cancelled_total': ('counter', 'Bot turns cancelled because their game ended.'),
+    'carnivore_bot_turns_completed_total': ('counter', 'Bot turns played.'),
+    'carnivore_bot_turns_failed_total': ('counter', 'Bot turns that raised.'),
+    'carnivore_bot_services': ('gauge', 'BotServices kept by BotManager.'),
+    'carnivore_bot_services_max': ('gauge', 'Most BotServices BotManager keeps before evicting.'),
+    'carnivore_bot_candidate_cache_bytes': ('gauge', 'Approximate heap used by the bots\' candidate caches.'),
+    'carnivore_bot_anagram_index_bytes': ('gauge', 'Size of the memory-mapped anagram index the bots share.'),
+    'carnivore_bot_services_created_total': ('counter', 'BotServices created.'),
+    'carnivore_bot_services_removed_total': ('counter', 'BotServices removed because their game ended.'),
+    'carnivore_bot_services_evicted_idle_total': ('counter', 'BotServices dropped after idling for BOT_SERVICE_IDLE_TTL.'),
+    'carnivore_bot_services_evicted_lru_total': ('counter', 'BotServices dropped to stay within BOT_SERVICE_MAX_COUNT.'),
+    'carnivore_score_drift_total': ('counter', 'Players whose stored score differed from their words in a score audit.'),
+}
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> [bucket counts..., count, sum]
+_counters = {}  # (name, labels) -> value
+_buckets = {}  # name -> bucket bounds
+_collectors = []  # callables read when rendering; see register_collector
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def observe(name: str, value: float, buckets=SECONDS_BUCKETS, **labels):
+    """Adds a sample to a histogram.
+
+    Args:
+        name (str): The metric name.
+        value (float): The sample.
+        buckets (tuple): Upper bounds of the buckets; fixed per metric name.
+        **labels: Label values of the series.
+    """
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            buckets = _buckets.setdefault(name, buckets)
+            series = _histograms[key] = [0] * (len(buckets) + 2)
+        else:
+            buckets = _buckets[name]
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-2] += 1
+        series[-1] += value
+
+
+def increment(name: str, amount: float = 1, **labels):
+    """Adds to a counter."""
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def payload_size(value) -> int | None:
+    """Returns the JSON size of a value read from or written to the store.
+
+    Only a METRICS_PAYLOAD_SAMPLE_RATE fraction of calls are measured; the
+    rest return None, as do all calls when the rate is 0.
+    """
+    if not METRICS_ENABLED or value is None or random.random() >= METRICS_PAYLOAD_SAMPLE_RATE:
+        return None
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Times the enclosed block as carnivore_span_seconds{span=name}.
+
+    Nested spans are each recorded in full, so a transaction span includes
+    the db spans of its reads and writes.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def record_span(name: str, seconds: float):
+    """Records a duration measured by the caller, as span() does."""
+    observe('carnivore_span_seconds', seconds, span=name)
+    spans = _request_spans.get()
+    if spans is not None:
+        total = spans.get(name)
+        spans[name] = (total[0] + 1, total[1] + seconds) if total else (1, seconds)
+
+
+def timed(name: str):
+    """Decorator form of span()."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_collector(collect):
+    """Adds values that are read from their owner each time /metrics is rendered.
+
+    For state another component already keeps, like queue depths, rather than
+    samples recorded as they happen.
+
+    Args:
+        collect (callable): Returns {metric name: value}. Names ending in
+            _total are rendered as counters, the rest as gauges.
+    """
+    with _lock:
+        _collectors.append(collect)
+
+
+def begin_request():
+    """Starts collecting the spans of a request; returns a token for end_request."""
+    return _request_spans.set({})
+
+
+def end_request(token) -> dict:
+    """Stops collecting spans for a request.
+
+    Returns:
+        dict: span name -> (count, total seconds) for the request.
+    """
+    spans = _request_spans.get() or {}
+    _request_spans.reset(token)
+    return spans
+
+
+def server_timing_header(spans: dict) -> str:
+    """Formats request spans as a Server-Timing header value (durations in ms)."""
+    return ', '.join(f'{name};desc="x{count}";dur={seconds * 1000:.1f}'
+                     for name, (count, seconds) in sorted(spans.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus() -> str:
+    """Renders every metric in the Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        counters = dict(_counters)
+        buckets_by_name = dict(_buckets)
+        collectors = list(_collectors)
+
+    lines = []
+    for collect in collectors:
+        try:
+            values = collect()
+        except Exception as e:
+            lines.append(f'# collector {getattr(collect, "__qualname__", collect)} failed: {e}')
+            continue
+        for name, value in sorted(values.items()):
+            kind = 'counter' if name.endswith('_total') else 'gauge'
+            lines.append(f'# HELP {name} {_HELP.get(name, (kind, ""))[1]}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value}')
+
+    names = sorted({name for name, _ in histograms} | {name for name, _ in counters})
+    for name in names:
+        kind, help_text = _HELP.get(name, ('histogram' if name in buckets_by_name else 'counter', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets_by_name[name], series):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, (("le", "+Inf"),))} {series[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {series[-2]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {series[-1]}')
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Drops every recorded sample."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _buckets.clear()
@@ -1,57 +1,145 @@
-from services import firebase_service
-from services.firebase_service import db
+import argparse
+import concurrent.futures
+import random
+import threading
+from services import firebase_service, metrics_service
+from config import SCORE_AUDIT_RATE
 from logging_config import logger
 
+# Background score audits (see calculate_score): one worker, at most one
+# queued audit per game
+_audit_lock = threading.Lock()
+_audit_executor = None
+_audits_pending = set()
+
 
 class GameNotFoundError(Exception):
     """Exception raised when a game is not found."""
     pass
 
 
-def calculate_score(user_id, game_id):
-    """Calculates the score for a given user_id by counting the number of tileIds in each word
-    where the user_id is the current_owner_user_id.
+def calculate_score(user_id, game_id, game_data=None):
+    """Returns a player's score.
+
+    submit_word keeps each player's score up to date in players/<id>/score,
+    so this reads that one value (or takes it from game_data) instead of
+    adding up the player's words. With SCORE_AUDIT_RATE set, some lookups
+    also queue an audit_scores of the game on a background thread.
 
     Args:
         user_id (str): The ID of the user.
         game_id (str): The ID of the game.
+        game_data (dict, optional): A game snapshot to read the score from
+            instead of fetching it.
+
+    Returns:
+        dict: A dictionary containing the success status and the score.
+    """
+    try:
+        player_data = _get_player(game_id, user_id, game_data)
+        if player_data is None:
+            raise GameNotFoundError(f"Player {user_id} not found in game {game_id}.")
+
+        if SCORE_AUDIT_RATE and random.random() < SCORE_AUDIT_RATE:
+            _schedule_audit(game_id)
+        return {'success': True, 'score': player_data.get('score') or 0}
+    except GameNotFoundError as e:
+        logger.error("Game not found: %s", e)
+        return {'success': False, 'message': str(e)}
+    except Exception as e:
+        logger.error("An unexpected error occurred: %s", e)
+        return {'success': False, 'message': str(e)}
+
+
+def recalculate_scores(game_data) -> dict:
+    """Recomputes every player's score from the words they hold.
+
+    A player's score is the number of tiles in their valid words; words that
+    were stolen or improved upon no longer count.
+
+    Args:
+        game_data (dict | GameState): The game data.
 
     Returns:
-        dict: A dictionary containing the success status and the calculated score.
+        dict: user ID -> score, for every player in the game.
     """
-    game_ref = firebase_service.get_db_reference(f'games/{game_id}')
+    scores = {user_id: 0 for user_id in game_data.get('players') or {}}
+    for word in game_data.get('words') or []:
+        if word and word.get('status') == 'valid':
+            owner_id = word.get('current_owner_user_id')
+            scores[owner_id] = scores.get(owner_id, 0) + len(word['tileIds'])
+    return scores
+
 
-    def transaction_calculate_score(current_data):
-        if not current_data:
-            raise GameNotFoundError(f"Game with ID {game_id} not found.")
+def audit_scores(game_id, game_data=None) -> dict:
+    """Compares the stored scores of a game with scores recomputed from its words.
 
-        score = 0
-        for word in current_data.get('words', []):
-            if word['current_owner_user_id'] == user_id:
-                score += len(word['tileIds'])
+    Drift is logged and counted in carnivore_score_drift_total; scores are
+    not corrected.
 
-        return {'success': True, 'score': score}
+    Args:
+        game_id (str): The ID of the game.
+        game_data (dict, optional): A game snapshot to audit instead of
+            fetching the game.
 
+    Returns:
+        dict: user ID -> (stored score, recomputed score) for every player
+            whose scores differ.
+    """
+    if game_data is None:
+        game_data = firebase_service.get_game(game_id)
+    if not game_data:
+        return {}
+
+    players = game_data.get('players') or {}
+    drift = {}
+    for user_id, score in recalculate_scores(game_data).items():
+        stored = (players.get(user_id) or {}).get('score') or 0
+        if stored != score:
+            drift[user_id] = (stored, score)
+            logger.warning("Score drift in game %s: player %s has %s, words add up to %s",
+                           game_id, user_id, stored, score)
+    if drift:
+        metrics_service.increment('carnivore_score_drift_total', len(drift))
+    return drift
+
+
+def _schedule_audit(game_id):
+    global _audit_executor
+    with _audit_lock:
+        if game_id in _audits_pending:
+            return
+        _audits_pending.add(game_id)
+        if _audit_executor is None:
+            _audit_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='score-audit')
+    _audit_executor.submit(_run_audit, game_id)
+
+
+def _run_audit(game_id):
     try:
-        result = game_ref.transaction(transaction_calculate_score)
-        return result
-    except db.TransactionAbortedError as e:
-        logger.error(f"Transaction failed for game ID {game_id}: {e}")
-        return {'success': False, 'message': 'Score calculation failed'}
-    except GameNotFoundError as e:
-        logger.error(f"Game not found: {e}")
-        return {'success': False, 'message': str(e)}
+        audit_scores(game_id)
     except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
-        return {'success': False, 'message': str(e)}
+        logger.warning("Auditing the scores of game %s failed: %s", game_id, e)
+    finally:
+        with _audit_lock:
+            _audits_pending.discard(game_id)
+
 
+def _get_player(game_id, user_id, game_data=None):
+    if game_data is None:
+        return firebase_service.get_player(game_id, user_id)
+    return (game_data.get('players') or {}).get(user_id)
 
-def is_player_turn(user_id, game_id):
+
+def is_player_turn(user_id, game_id, game_data=None):
     """
     Determines if it is the player's turn in the game.
     Args:
         user_id (int): The ID of the user.
         game_id (int): The ID of the game.
+        game_data (dict, optional): A game snapshot to read the player from
+            instead of fetching it.
     Returns:
         bool: True if it is the player's turn, False otherwise.
     Raises:
@@ -59,20 +147,21 @@ def is_player_turn(user_id, game_id):
     """
     try:
         logger.debug(
-            f"Checking if it's the turn for user_id: {user_id} in game_id: {game_id}")
-        player_data = firebase_service.get_player(game_id, user_id)
+            "Checking if it's the turn for user_id: %s in game_id: %s", user_id, game_id)
+        player_data = _get_player(game_id, user_id, game_data)
 
         if player_data:
             is_turn = player_data.get('turn', False)
             logger.debug(
-                f"Player data found for user_id: {user_id} in game_id: {game_id}. Turn status: {is_turn}")
+                "Player data found for user_id: %s in game_id: %s. Turn status: %s",
+                user_id, game_id, is_turn)
             return is_turn
         else:
             logger.debug(
-                f"No player found with user_id: {user_id} in game_id: {game_id}")
+                "No player found with user_id: %s in game_id: %s", user_id, game_id)
             return False
     except Exception as e:
-        logger.debug(f"An error occurred: {e}")
+        logger.debug("An error occurred: %s", e)
         return False
 
 
@@ -92,37 +181,52 @@ def set_player_turn(game_id, user_id):
 
         if success:
             logger.debug(
-                f"Successfully set turn for user_id: {user_id} in game_id: {game_id}")
+                "Successfully set turn for user_id: %s in game_id: %s", user_id, game_id)
             return True
         else:
             logger.debug(
-                f"Failed to set turn for user_id: {user_id} in game_id: {game_id}")
+                "Failed to set turn for user_id: %s in game_id: %s", user_id, game_id)
             return False
     except Exception as e:
-        logger.debug(f"An error occurred: {e}")
+        logger.debug("An error occurred: %s", e)
         return False
 
 
-def is_player_in_game(user_id, game_id):
+def is_player_in_game(user_id, game_id, game_data=None):
     """Checks if a player is part of a game.
 
     Args:
         user_id (int): The ID of the user.
         game_id (int): The ID of the game.
+        game_data (dict, optional): A game snapshot to read the player from
+            instead of fetching it.
     Returns:
         bool: True if the player is in the game, False otherwise.
     Raises:
         Exception: If an error occurs while checking the player's participation.
     """
     try:
-        player_data = firebase_service.get_player(game_id, user_id)
+        player_data = _get_player(game_id, user_id, game_data)
 
         if player_data:
             return True
         else:
             logger.debug(
-                f"No player found with user_id: {user_id} in game_id: {game_id}")
+                "No player found with user_id: %s in game_id: %s", user_id, game_id)
             return False
     except Exception as e:
-        logger.debug(f"An error occurred: {e}")
+        logger.debug("An error occurred: %s", e)
         return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compare stored player scores with the scores their words add up to.")
+    parser.add_argument('game_ids', nargs='*', help="Games to audit (default: all games)")
+    args = parser.parse_args()
+
+    import app  # noqa: F401  connects to the game store the same way the server does
+
+    game_ids = args.game_ids or list(firebase_service.get_db_reference('games').get(shallow=True) or {})
+    drifted = sum(bool(audit_scores(game_id)) for game_id in game_ids)
+    logger.info("Scores drifted in %s of %s games", drifted, len(game_ids))
@@ -1,57 +1,189 @@
-import firebase_admin
-from firebase_admin import db
+import argparse
+import random
 import services.firebase_service as firebase_service
+from models.game import GameState
+from models.tile import (TILE_PATHS, TILE_ENCODINGS, TILE_ENCODING_PACKED, PACKED_TILES_PATH,
+                         DRAW_PILES_PATH, pack_tiles, tile_encoding)
 from logging_config import logger
 
-def update_tiles_location(game_id, tiles, word_id):
+def update_tiles_location(game_id, tiles, word_id, game_data=None):
     """Updates the location property of the tiles to be the wordId.
 
+    Runs as a game transaction over the tiles only, so the move is made
+    against the current tiles and bumps the game's version like every other
+    move (see firebase_service.run_game_transaction).
+
     Args:
         game_id (str): The game ID.
         tiles (list): List of tiles forming the word.
         word_id (str): The ID of the word.
+        game_data (dict, optional): A game snapshot the caller already read;
+            the first transaction attempt starts from it.
     """
-    game_data = firebase_service.get_game(game_id)
-
-    if not game_data:
-        logger.debug(f"Game with ID {game_id} does not exist.")
-        return
-
-    logger.debug(f"Updating tiles for game ID: {game_id}")
-    logger.debug(f"Word ID: {word_id}")
-    logger.debug(f"Tiles to update: {tiles}")
-
-    for tile in tiles:
-        if tile and 'tileId' in tile:
-            tile_id = tile['tileId']
-            logger.debug(f"Processing tile ID: {tile_id}")
+    tile_ids = [tile['tileId'] for tile in tiles if tile and 'tileId' in tile]
+    logger.debug("Moving tiles %s of game %s to word %s", tile_ids, game_id, word_id)
 
-            # Find the index of the tile with the matching tileId
-            tile_index = next((index for (index, d) in enumerate(game_data['tiles']) if d["tileId"] == tile_id), None)
-
-            if tile_index is not None:
-                # Update the specific tile's location using db
-                logger.debug(f"Updating tile ID {tile_id} location to {word_id}")
-                db.reference(f'games/{game_id}/tiles/{tile_index}').update({'location': word_id})
+    def move_tiles(current_data):
+        if not current_data:
+            logger.debug("Game with ID %s does not exist.", game_id)
+            return current_data or {}
+        game_state = GameState(current_data)
+        for tile_id in tile_ids:
+            tile = game_state.tile(tile_id)
+            if tile is not None:
+                tile['location'] = word_id
             else:
-                logger.debug(f"Tile with ID {tile_id} not found in the game data.")
+                logger.debug("Tile with ID %s not found in the game data.", tile_id)
+        game_state.store_tiles()
+        return current_data
+
+    firebase_service.run_game_transaction(game_id, TILE_PATHS, move_tiles,
+                                          snapshot=GameState.of(game_data).data if game_data else None)
+    logger.debug("Game ID %s updated successfully.", game_id)
 
-    logger.debug(f"Game ID {game_id} updated successfully.")
 
 def get_tile_from_data(game_data, tile_id):
     """Gets a tile from the game data directly (avoids extra DB calls).
 
     Args:
-        game_data (dict): The game data containing tiles.
+        game_data (dict | GameState): The game data containing tiles. Pass a
+            GameState when looking up several tiles to avoid a scan per tile.
         tile_id (str): The ID of the tile to retrieve.
 
     Returns:
         dict: The tile data if found, otherwise None.
     """
-    logger.debug(f"Getting tile with ID {tile_id} from game data.")
+    logger.debug("Getting tile with ID %s from game data.", tile_id)
+    if isinstance(game_data, GameState):
+        return game_data.tile(tile_id)
+    if game_data and PACKED_TILES_PATH in game_data:
+        return GameState(game_data).tile(tile_id)
     if not game_data or 'tiles' not in game_data:
         return None
     for tile in game_data['tiles']:
         if tile and tile.get('tileId') == tile_id:
             return tile
-    return None
\ No newline at end of file
+    return None
+
+
+def new_draw_pile(letter_counts, num_tiles, rng=random):
+    """Shuffles the letters and tiles of a new game into the order they are flipped in.
+
+    Args:
+        letter_counts (dict): How many of each letter the game has.
+        num_tiles (int): How many tiles the game has.
+        rng (random.Random, optional): Source of the shuffle; pass a seeded
+            one to make the game reproducible.
+
+    Returns:
+        dict: The value to store with save_draw_pile; the n-th flip turns
+            tile tileIds[n] over as letters[n].
+    """
+    letters = [letter for letter, count in letter_counts.items() for _ in range(count)]
+    tile_ids = list(range(num_tiles))
+    rng.shuffle(letters)
+    rng.shuffle(tile_ids)
+    return {'letters': ''.join(letters), 'tileIds': tile_ids}
+
+
+def save_draw_pile(game_id, draw_pile):
+    """Stores a game's draw pile on the server-only node (see models/tile.py)."""
+    firebase_service.get_db_reference(f'{DRAW_PILES_PATH}/{game_id}').set(draw_pile)
+
+
+def get_draw_pile(game_id):
+    """Returns a game's draw pile, or None if it has none.
+
+    The pile never changes after the game is created, so it can be read
+    inside a game transaction without being part of its scope.
+    """
+    return firebase_service.get_db_reference(f'{DRAW_PILES_PATH}/{game_id}').get()
+
+
+def delete_draw_pile(game_id):
+    firebase_service.get_db_reference(f'{DRAW_PILES_PATH}/{game_id}').delete()
+
+
+def draw_from_pile(draw_pile, position):
+    """Looks up the tile and letter of a flip in a game's draw pile.
+
+    Args:
+        draw_pile (dict): The game's draw pile.
+        position (int): The game's DRAW_PILE_CURSOR_PATH, i.e. the number of
+            tiles drawn so far.
+
+    Returns:
+        tuple: (tile ID, letter), or None if the pile is used up.
+    """
+    letters = draw_pile.get('letters') or ''
+    tile_ids = draw_pile.get('tileIds') or []
+    if position >= min(len(letters), len(tile_ids)):
+        return None
+    return tile_ids[position], letters[position]
+
+
+def migrate_tile_encoding(game_id, encoding=TILE_ENCODING_PACKED):
+    """Rewrites a game's tiles in the given encoding (see models/tile.py).
+
+    Args:
+        game_id (str): The game ID.
+        encoding (str): 'packed' or 'objects'.
+
+    Returns:
+        bool: True if the game was rewritten, False if it already used the
+            encoding, doesn't exist, or its tiles can't be packed.
+    """
+    if encoding not in TILE_ENCODINGS:
+        raise ValueError(f"Unknown tile encoding '{encoding}', expected one of {TILE_ENCODINGS}.")
+    migrated = False
+
+    def migrate(current_data):
+        nonlocal migrated
+        if not current_data or tile_encoding(current_data) == encoding:
+            return current_data or {}
+        tiles = GameState(current_data).tiles
+        if encoding == TILE_ENCODING_PACKED:
+            current_data[PACKED_TILES_PATH] = pack_tiles(tiles)
+            current_data.pop('tiles', None)
+        else:
+            current_data['tiles'] = tiles
+            current_data.pop(PACKED_TILES_PATH, None)
+        migrated = True
+        return current_data
+
+    try:
+        firebase_service.run_game_transaction(game_id, TILE_PATHS, migrate)
+    except ValueError as e:
+        logger.warning("Can't migrate tiles of game %s: %s", game_id, e)
+        return False
+    return migrated
+
+
+def migrate_all_games(encoding=TILE_ENCODING_PACKED):
+    """Rewrites the tiles of every game in the given encoding.
+
+    Each game is migrated in its own transaction, so games can be played
+    while this runs.
+
+    Returns:
+        int: The number of games rewritten.
+    """
+    game_ids = firebase_service.get_db_reference('games').get(shallow=True) or {}
+    migrated = sum(migrate_tile_encoding(game_id, encoding) for game_id in game_ids)
+    logger.info("Migrated the tiles of %s of %s games to '%s'", migrated, len(game_ids), encoding)
+    return migrated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rewrite game tiles in another encoding.")
+    parser.add_argument('encoding', choices=TILE_ENCODINGS)
+    parser.add_argument('game_ids', nargs='*', help="Games to migrate (default: all games)")
+    args = parser.parse_args()
+
+    import app  # noqa: F401  connects to the game store the same way the server does
+
+    if args.game_ids:
+        for game_id in args.game_ids:
+            migrate_tile_encoding(game_id, args.encoding)
+    else:
+        migrate_all_games(args.encoding)
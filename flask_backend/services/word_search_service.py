@@ -0,0 +1,279 @@
+import itertools
+import time
+from services import game_service
+
+MIN_WORD_LENGTH = 3
+
+
+def _letter_counts(letters):
+    """Counts ascii letters into a list indexed by byte value."""
+    counts = [0] * 128
+    for letter in letters:
+        code = ord(letter)
+        if code < 128:
+            counts[code] += 1
+    return counts
+
+
+def _out_of_time(deadline):
+    return deadline is not None and time.perf_counter() > deadline
+
+
+def find_keys(anagram_index, required_letters, spare_letters, min_spare=1, max_length=None,
+              deadline=None):
+    """Finds every index key made of all required letters plus some spare letters.
+
+    Walks the trie of sorted keys in the anagram index, only following edges
+    whose letter is still available. Because keys are sorted, the walk can
+    stop at a node as soon as its next edge letter passes a required letter
+    that hasn't been used yet, so the cost grows with the number of keys that
+    fit rather than with the number of letter combinations.
+
+    Steals and own-word improvements use this too, with the existing word as
+    the required letters. benchmarks/anagram_index_benchmark.py compares this
+    with a precomputed index of every key's superset keys filtered against
+    the middle letters: the walk wins on small middles, the index from about
+    8 middle letters on (around 0.2 ms against 0.6-0.9 ms per search at 20).
+    The index would hold millions of key pairs in every process next to the
+    shared memory-mapped anagram index, so the walk is kept.
+
+    Args:
+        anagram_index (AnagramIndex): The shared anagram index.
+        required_letters (str): Lowercase letters every key must contain.
+        spare_letters (str): Lowercase letters keys may additionally use.
+        min_spare (int): Minimum number of spare letters a key must use.
+        max_length (int, optional): Longest key to look for; the walk doesn't
+            go deeper than this.
+        deadline (float, optional): time.perf_counter() value after which the
+            walk stops and returns the keys found so far.
+
+    Returns:
+        list[int]: Indexes of the matching keys, in sorted key order.
+    """
+    node_edges = anagram_index.node_edges
+    node_keys = anagram_index.node_keys
+    edge_letters = anagram_index.edge_letters
+    required = [ord(letter) for letter in sorted(required_letters)]
+    required_count = len(required)
+    spare = _letter_counts(spare_letters)
+    found = []
+
+    def walk(node, position, spare_used):
+        if _out_of_time(deadline):
+            return
+        for edge in range(node_edges[node], node_edges[node + 1]):
+            letter = edge_letters[edge]
+            if position < required_count and letter >= required[position]:
+                if letter > required[position]:
+                    # Later edges are bigger still; the required letter can't appear anymore
+                    return
+                next_position = position + 1
+                next_spare_used = spare_used
+            elif spare[letter]:
+                spare[letter] -= 1
+                next_position = position
+                next_spare_used = spare_used + 1
+            else:
+                continue
+
+            child = edge + 1
+            if next_position == required_count and next_spare_used >= min_spare and node_keys[child]:
+                found.append(node_keys[child] - 1)
+            if max_length is None or next_position + next_spare_used < max_length:
+                walk(child, next_position, next_spare_used)
+
+            if next_position == position:
+                spare[letter] += 1
+
+    walk(0, 0, 0)
+    return found
+
+
+def _tile_combinations(middle_tiles, spare_key_letters, forced_position=None):
+    """Yields every combination of middle tile positions spelling the given letters.
+
+    Args:
+        middle_tiles (list): The middle tiles, in game order.
+        spare_key_letters (dict): Lowercase letter -> number of middle tiles needed.
+        forced_position (int, optional): A position every combination must include.
+
+    Yields:
+        tuple[int]: Sorted positions into middle_tiles.
+    """
+    positions_by_letter = {}
+    for position, tile in enumerate(middle_tiles):
+        if position != forced_position:
+            positions_by_letter.setdefault(tile['letter'].lower(), []).append(position)
+
+    forced_letter = None
+    if forced_position is not None:
+        forced_letter = middle_tiles[forced_position]['letter'].lower()
+
+    choices = []
+    for letter, count in spare_key_letters.items():
+        if letter == forced_letter:
+            choices.append([combo + (forced_position,) for combo in
+                            itertools.combinations(positions_by_letter.get(letter, []), count - 1)])
+        else:
+            choices.append(itertools.combinations(positions_by_letter.get(letter, []), count))
+    for parts in itertools.product(*choices):
+        yield tuple(sorted(itertools.chain.from_iterable(parts)))
+
+
+def _map_tile_ids(word, tile_data):
+    """Maps each letter of word to a tile, taking tiles in the given order.
+
+    Args:
+        word (str): The word to spell.
+        tile_data (list): (letter, tileId) pairs available for the word.
+
+    Returns:
+        list: The tileIds in word order, or an empty list if a letter is missing.
+    """
+    available_tiles = list(tile_data)
+    mapped_tile_ids = []
+    for letter in word:
+        for i, (tile_letter, tile_id) in enumerate(available_tiles):
+            if tile_letter == letter:
+                mapped_tile_ids.append(tile_id)
+                available_tiles.pop(i)
+                break
+        else:
+            return []
+    return mapped_tile_ids
+
+
+def _spare_letters_needed(key, required_letters):
+    needed = {}
+    for letter in key:
+        needed[letter] = needed.get(letter, 0) + 1
+    for letter in required_letters:
+        needed[letter] -= 1
+    return {letter: count for letter, count in needed.items() if count}
+
+
+def _split_forced_tile(middle_tiles, forced_tile_id):
+    """Splits the middle letters into the forced tile's letter and the rest.
+
+    Returns:
+        tuple: (forced position or None, forced letter, remaining middle letters)
+    """
+    forced_position = None
+    for position, tile in enumerate(middle_tiles):
+        if forced_tile_id is not None and tile['tileId'] == forced_tile_id:
+            forced_position = position
+            break
+    if forced_tile_id is not None and forced_position is None:
+        raise ValueError(f"Tile {forced_tile_id} is not in the middle.")
+
+    forced_letter = ''
+    spare_letters = []
+    for position, tile in enumerate(middle_tiles):
+        if position == forced_position:
+            forced_letter = tile['letter'].lower()
+        else:
+            spare_letters.append(tile['letter'].lower())
+    return forced_position, forced_letter, ''.join(spare_letters)
+
+
+def find_middle_words(anagram_index, middle_tiles, forced_tile_id=None, max_length=None,
+                      deadline=None):
+    """Finds every word that can be formed from the middle tiles alone.
+
+    Returns the same entries, in the same order, as enumerating every
+    combination of three or more middle tiles and looking each one up in the
+    anagram map.
+
+    Args:
+        anagram_index (AnagramIndex): The shared anagram index.
+        middle_tiles (list): The middle tiles, in game order.
+        forced_tile_id (int, optional): Only return words that use this
+            middle tile, e.g. the tile that was just flipped.
+        max_length (int, optional): Longest word to look for.
+        deadline (float, optional): time.perf_counter() value after which
+            the search stops; words not found by then are left out.
+
+    Returns:
+        list: Dicts of {'WordSubmissionType', 'word', 'tileIds'}.
+    """
+    forced_position, forced_letter, spare_letters = _split_forced_tile(
+        middle_tiles, forced_tile_id)
+    results = []
+    for key_index in find_keys(anagram_index, forced_letter, spare_letters,
+                               MIN_WORD_LENGTH - len(forced_letter), max_length, deadline):
+        if _out_of_time(deadline):
+            break
+        key = anagram_index.key_at(key_index)
+        words = anagram_index.words_at(key_index)
+        for combo in _tile_combinations(middle_tiles, _spare_letters_needed(key, ''),
+                                        forced_position):
+            # Checked per combination too, as one key can have many
+            if _out_of_time(deadline):
+                break
+            combo_data = [(middle_tiles[p]['letter'].lower(), middle_tiles[p]['tileId'])
+                          for p in combo]
+            for word in words:
+                mapped_tile_ids = _map_tile_ids(word, combo_data)
+                if mapped_tile_ids:
+                    results.append(((len(combo), combo), {
+                        'WordSubmissionType': game_service.WordSubmissionType.MIDDLE_WORD,
+                        'word': word,
+                        'tileIds': mapped_tile_ids
+                    }))
+    results.sort(key=lambda result: result[0])
+    return [result for _, result in results]
+
+
+def find_extension_words(anagram_index, existing_word, middle_tiles, forced_tile_id=None,
+                         max_length=None, deadline=None):
+    """Finds every word that extends an existing word with one or more middle tiles.
+
+    Returns the same entries, in the same order, as enumerating every
+    non-empty combination of middle tiles, adding it to the existing word's
+    letters and looking the result up in the anagram map.
+
+    Args:
+        anagram_index (AnagramIndex): The shared anagram index.
+        existing_word (dict): A valid word with 'word', 'tileIds' and
+            'current_owner_user_id'.
+        middle_tiles (list): The middle tiles, in game order.
+        forced_tile_id (int, optional): Only return words that use this
+            middle tile, e.g. the tile that was just flipped.
+        max_length (int, optional): Longest word to look for.
+        deadline (float, optional): time.perf_counter() value after which
+            the search stops; words not found by then are left out.
+
+    Returns:
+        list: Dicts of {'word', 'tileIds', 'current_owner_user_id', 'originalWord'}.
+    """
+    existing_letters = existing_word['word'].lower()
+    forced_position, forced_letter, spare_letters = _split_forced_tile(
+        middle_tiles, forced_tile_id)
+    existing_tile_data = list(zip(existing_letters, existing_word['tileIds']))
+    results = []
+    for key_index in find_keys(anagram_index, existing_letters + forced_letter, spare_letters,
+                               1 - len(forced_letter), max_length, deadline):
+        if _out_of_time(deadline):
+            break
+        key = anagram_index.key_at(key_index)
+        words = anagram_index.words_at(key_index)
+        for combo in _tile_combinations(middle_tiles, _spare_letters_needed(key, existing_letters),
+                                        forced_position):
+            if _out_of_time(deadline):
+                break
+            combo_data = existing_tile_data + [
+                (middle_tiles[p]['letter'].lower(), middle_tiles[p]['tileId']) for p in combo]
+            for word in words:
+                # Ensure it's a new word, not the same as the existing one
+                if word == existing_letters:
+                    continue
+                mapped_tile_ids = _map_tile_ids(word, combo_data)
+                if mapped_tile_ids:
+                    results.append(((len(combo), combo), {
+                        'word': word,
+                        'tileIds': mapped_tile_ids,
+                        'current_owner_user_id': existing_word['current_owner_user_id'],
+                        'originalWord': existing_word['word'],
+                    }))
+    results.sort(key=lambda result: result[0])
+    return [result for _, result in results]
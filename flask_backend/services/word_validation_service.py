@@ -1,6 +1,22 @@
 from .firebase_service import get_game, update_game
+from services import metrics_service
+from models.game import GameState
 from logging_config import logger
 import os
+import threading
+import time
+
+DICTIONARY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', 'word_validation', 'dictionary.txt'
+)
+# How often (in seconds) the dictionary file is checked for changes
+DICTIONARY_RELOAD_CHECK_INTERVAL = 30
+
+_dictionary_lock = threading.Lock()
+_dictionary_words = None
+_dictionary_mtime = None
+_dictionary_checked_at = 0.0
 
 def is_valid_word_length(tiles):
     """Check if a word is at least 3 letters long.
@@ -24,44 +40,115 @@ def get_middle_tiles_used_in_word(tiles):
     """
     return [tile for tile in tiles if tile['location'] == 'middle']
 
+def get_words_used_in_word(game_data, tiles):
+    """Gets the board words whose tiles a submission takes.
+
+    A tile's location is the ID of the word it belongs to, so the words are
+    found from the submitted tiles themselves rather than by scanning every
+    word on the board. Each must be valid and be taken whole.
+
+    Args:
+        game_data (dict | GameState): The game data dictionary.
+        tiles (list): List of tile dictionaries.
+
+    Returns:
+        list: The words in the order they appear in the game, or None if a
+            tile is missing, belongs to no valid word, or leaves part of its
+            word behind.
+    """
+    if not game_data or not tiles:
+        return None
+
+    game_state = GameState.of(game_data)
+    non_middle_tile_ids = set()
+    word_ids = set()
+    for tile in tiles:
+        if not tile or 'location' not in tile:
+            return None
+        if tile['location'] != 'middle':
+            non_middle_tile_ids.add(tile['tileId'])
+            word_ids.add(tile['location'])
+
+    words = []
+    for word_id in word_ids:
+        word_data = game_state.word(word_id)
+        if not word_data or word_data.get('status') != 'valid' or \
+                not non_middle_tile_ids.issuperset(word_data['tileIds']):
+            logger.debug("Invalid tile location: %s", word_id)
+            return None
+        words.append(word_data)
+    words.sort(key=lambda word: game_state.word_index(word['wordId']))
+    return words
+
 def uses_valid_letters(game_data, tiles):
     """Checks if the tiles used are either in the middle or belong to a valid word
     that can be extended/stolen by the current user.
 
     Args:
-        game_data (dict): The game data dictionary.
+        game_data (dict | GameState): The game data dictionary.
         tiles (list): List of tile dictionaries.
 
     Returns:
         bool: True if the tile locations are valid, False otherwise.
     """
-    if not game_data or not tiles:
-        return False
-
-    words = game_data.get('words', [])
-    valid_locations = {'middle'}
-
-    # Add wordIds of valid words
-    for word_data in words:
-        if word_data.get('status') == 'valid':
-            existing_tile_ids = set(word_data['tileIds'])
-            submitted_tile_ids = set(tile['tileId'] for tile in tiles if tile)
-            middle_tiles = [t for t in tiles if t and t.get('location') == 'middle']
-            middle_tile_ids = {t['tileId'] for t in middle_tiles}
-
-            if existing_tile_ids.issubset(submitted_tile_ids - middle_tile_ids):
-                # The word's tiles are a subset of the *newly* submitted tiles.
-                valid_locations.add(word_data['wordId'])
-    # Now, check if *every* tile's location is valid.
-    for tile in tiles:
-        if not tile or 'location' not in tile:
-            return False
-        if tile['location'] not in valid_locations:
-            print(f"Invalid tile location: {tile['location']} (tileId: {tile.get('tileId')})")  # Debugging
-            return False
+    return get_words_used_in_word(game_data, tiles) is not None
+
+def _load_dictionary(path):
+    """Reads the dictionary file into a frozenset of lowercase words.
+
+    Args:
+        path (str): Path to the dictionary file.
+
+    Returns:
+        tuple: The set of words and the file's modification time.
+    """
+    mtime = os.path.getmtime(path)
+    with open(path, 'r', encoding='utf-8') as file:
+        words = frozenset(line.strip().lower() for line in file if line.strip())
+    logger.debug("Loaded dictionary with %s words from %s", len(words), path)
+    return words, mtime
 
-    return True
 
+def get_dictionary():
+    """Returns the process-wide dictionary, loading it on first use.
+
+    The dictionary is shared by all request threads. The file's modification
+    time is checked at most once every DICTIONARY_RELOAD_CHECK_INTERVAL seconds,
+    and the dictionary is reloaded if the file has changed.
+
+    Returns:
+        frozenset: The set of valid words.
+    """
+    global _dictionary_words, _dictionary_mtime, _dictionary_checked_at
+
+    now = time.monotonic()
+    if _dictionary_words is not None and now - _dictionary_checked_at < DICTIONARY_RELOAD_CHECK_INTERVAL:
+        return _dictionary_words
+
+    with _dictionary_lock:
+        # Another thread may have refreshed the dictionary while we waited
+        if _dictionary_words is not None and now - _dictionary_checked_at < DICTIONARY_RELOAD_CHECK_INTERVAL:
+            return _dictionary_words
+        try:
+            if _dictionary_words is None or os.path.getmtime(DICTIONARY_PATH) != _dictionary_mtime:
+                _dictionary_words, _dictionary_mtime = _load_dictionary(DICTIONARY_PATH)
+        except FileNotFoundError:
+            logger.error("Dictionary file not found: %s", DICTIONARY_PATH)
+            if _dictionary_words is None:
+                _dictionary_words = frozenset()
+        _dictionary_checked_at = now
+        return _dictionary_words
+
+
+def reload_dictionary():
+    """Forces the dictionary to be re-read from disk on the next lookup."""
+    global _dictionary_checked_at, _dictionary_mtime
+    with _dictionary_lock:
+        _dictionary_checked_at = 0.0
+        _dictionary_mtime = None
+
+
+@metrics_service.timed('dictionary_check')
 def is_valid_word(tiles, game_id):
     """Check if a word is valid in the dictionary.
 
@@ -73,18 +160,4 @@ def is_valid_word(tiles, game_id):
         bool: True if the word is valid, False otherwise.
     """
     word = ''.join(tile['letter'] for tile in tiles if tile['letter']).lower()
-
-    # Get the absolute path of the filtered_words.txt file
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    word_file_path = os.path.join(base_dir, '../word_validation/dictionary.txt')
-
-    # Check if the word is in the filtered_words.txt file
-    try:
-        with open(word_file_path, 'r', encoding='utf-8') as file:
-            valid_words = set(file.read().splitlines())
-            is_valid = word in valid_words
-            return is_valid
-    except FileNotFoundError:
-        print("Error: filtered_words.txt file not found.")
-        return False
-
+    return word in get_dictionary()
@@ -0,0 +1,58 @@
+import os
+import unittest
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from services import action_log_service, firebase_service, game_store
+
+
+class CompactActionLogTest(unittest.TestCase):
+
+    def setUp(self):
+        firebase_service.configure_store(game_store.InMemoryGameStore())
+        self.game_id = 'game1'
+        self.action_ids = []
+        actions = {}
+        for number in range(action_log_service.ACTION_LOG_KEEP + action_log_service.ACTION_LOG_COMPACT_BATCH + 7):
+            action = {'type': 'flip_tile', 'timestamp': 1_700_000_000_000 + number, 'number': number}
+            action_id = action_log_service.new_action_id(action)
+            actions[action_id] = action
+            self.action_ids.append(action_id)
+        firebase_service.get_db_reference(f'games/{self.game_id}').set({'actions': actions})
+
+    def live_action_ids(self):
+        return sorted(firebase_service.get_db_reference(f'games/{self.game_id}/actions').get() or {})
+
+    def test_leaves_exactly_the_newest_actions(self):
+        moved = action_log_service.compact_action_log(self.game_id)
+
+        self.assertEqual(moved, len(self.action_ids) - action_log_service.ACTION_LOG_KEEP)
+        self.assertEqual(self.live_action_ids(), self.action_ids[-action_log_service.ACTION_LOG_KEEP:])
+
+    def test_history_is_complete_and_in_order(self):
+        action_log_service.compact_action_log(self.game_id)
+
+        history = action_log_service.get_action_history(self.game_id)
+
+        self.assertEqual([action_id for action_id, _ in history], self.action_ids)
+        self.assertEqual([action['number'] for _, action in history], list(range(len(self.action_ids))))
+
+    def test_short_log_is_left_alone(self):
+        action_log_service.compact_action_log(self.game_id)
+
+        self.assertEqual(action_log_service.compact_action_log(self.game_id), 0)
+        self.assertEqual(len(self.live_action_ids()), action_log_service.ACTION_LOG_KEEP)
+
+    def test_action_count_skips_the_log_read_until_compaction_is_due(self):
+        keep = action_log_service.ACTION_LOG_KEEP
+        batch = action_log_service.ACTION_LOG_COMPACT_BATCH
+
+        self.assertEqual(action_log_service.compact_action_log(
+            self.game_id, action_count=keep + batch + 1), 0)
+        self.assertEqual(len(self.live_action_ids()), len(self.action_ids))
+        self.assertGreater(action_log_service.compact_action_log(
+            self.game_id, action_count=keep + 2 * batch), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -163,4 +163,33 @@ class ApiService {
       rethrow;
     }
   }
+
+  /// Fetches a game's complete action log, including the actions the backend
+  /// has moved out of games/{gameId}/actions. Returns actionId -> action.
+  Future<Map<String, Map<String, dynamic>>> gameHistoryApi(
+      String gameId, String token) async {
+    final url = Uri.parse('${Config.backendUrl}/game-history');
+    try {
+      final response = await http.post(
+        url,
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': 'Bearer $token'
+        },
+        body: jsonEncode({'game_id': gameId}),
+      );
+      if (response.statusCode != 200) {
+        print('Failed to fetch game history: ${response.statusCode}');
+        return {};
+      }
+      final actions = jsonDecode(response.body)['actions'] as List<dynamic>;
+      return {
+        for (final action in actions.cast<Map<String, dynamic>>())
+          action['actionId'] as String: action
+      };
+    } catch (e) {
+      print('Exception during gameHistoryApi: $e');
+      return {};
+    }
+  }
 }
@@ -1,6 +1,8 @@
 import 'dart:async';
 import 'package:flutter/material.dart';
+import 'package:firebase_auth/firebase_auth.dart';
 import 'package:firebase_database/firebase_database.dart';
+import 'package:flutter_frontend/services/api_service.dart';
 import 'package:flutter_frontend/widgets/tile_widget.dart';
 import 'package:flutter_frontend/classes/tile.dart';
 
@@ -27,12 +29,18 @@ class GameLog extends StatefulWidget {
 class _GameLogState extends State<GameLog> {
   final DatabaseReference _gameLogRef = FirebaseDatabase.instance.ref();
   List<Map<String, dynamic>> _logs = [];
+  // Every action seen so far, by action ID. The backend moves old actions
+  // out of games/{gameId}/actions once the log gets long, so entries are
+  // kept here after they leave the live log, and the ones moved out before
+  // this widget started are fetched from /game-history.
+  final Map<String, Map<dynamic, dynamic>> _actions = {};
   late StreamSubscription<DatabaseEvent> _gameLogSubscription;
 
   @override
   void initState() {
     super.initState();
     _listenToGameLog();
+    _loadHistory();
   }
 
   void _listenToGameLog() {
@@ -43,48 +51,69 @@ class _GameLogState extends State<GameLog> {
       if (!mounted) return;
 
       final data = event.snapshot.value as Map<dynamic, dynamic>? ?? {};
+      data.forEach((actionId, logData) {
+        _actions[actionId as String] = logData as Map<dynamic, dynamic>;
+      });
+      _updateLogs();
+    }, onError: (error) {});
+  }
 
-      List<Map<String, dynamic>> newLogs = data.entries.map((entry) {
-        final logData = entry.value as Map<dynamic, dynamic>;
-        final String actionType = logData['type'] as String? ?? "Unknown Type";
+  Future<void> _loadHistory() async {
+    final user = FirebaseAuth.instance.currentUser;
+    if (user == null) return;
+    final token = await user.getIdToken();
+    if (token == null) return;
+    final history = await ApiService().gameHistoryApi(widget.gameId, token);
+    if (!mounted || history.isEmpty) return;
+    history.forEach((actionId, logData) {
+      _actions.putIfAbsent(actionId, () => logData);
+    });
+    _updateLogs();
+  }
 
-        Map<String, dynamic> logEntry = {
-          'playerId': logData['playerId'] ?? "Unknown Player",
-          'type': actionType,
-          'timestamp': logData['timestamp'] ?? 0,
-        };
+  void _updateLogs() {
+    List<Map<String, dynamic>> newLogs =
+        _actions.values.map(_toLogEntry).toList();
 
-        if (actionType == 'flip_tile') {
-          logEntry['tileLetter'] = logData['tileLetter'] ?? '';
-          logEntry['tileId'] = logData['tileId'] ?? '';
-        }
-        if (actionType == 'MIDDLE_WORD' ||
-            actionType == 'INVALID_LENGTH' ||
-            actionType == 'INVALID_NO_MIDDLE' ||
-            actionType == 'INVALID_LETTERS_USED' ||
-            actionType == 'INVALID_WORD_NOT_IN_DICTIONARY' ||
-            actionType == 'INVALID_UNKNOWN_WHY') {
-          logEntry['word'] = logData['word'] ?? '';
-        }
-        if (actionType == 'STEAL_WORD') {
-          logEntry['word'] = logData['word'] ?? '';
-          logEntry['robbedUserId'] = logData['robbedUserId'] ?? '';
-          logEntry['originalWordString'] = logData['originalWordString'] ?? '';
-        }
-        if (actionType == 'OWN_WORD_IMPROVEMENT') {
-          logEntry['word'] = logData['word'] ?? '';
-          logEntry['originalWordString'] = logData['originalWordString'] ?? '';
-        }
-        return logEntry;
-      }).toList();
+    newLogs.sort(
+        (b, a) => (a['timestamp'] as num).compareTo(b['timestamp'] as num));
 
-      newLogs.sort(
-          (b, a) => (a['timestamp'] as num).compareTo(b['timestamp'] as num));
+    setState(() {
+      _logs = newLogs;
+    });
+  }
 
-      setState(() {
-        _logs = newLogs;
-      });
-    }, onError: (error) {});
+  Map<String, dynamic> _toLogEntry(Map<dynamic, dynamic> logData) {
+    final String actionType = logData['type'] as String? ?? "Unknown Type";
+
+    Map<String, dynamic> logEntry = {
+      'playerId': logData['playerId'] ?? "Unknown Player",
+      'type': actionType,
+      'timestamp': logData['timestamp'] ?? 0,
+    };
+
+    if (actionType == 'flip_tile') {
+      logEntry['tileLetter'] = logData['tileLetter'] ?? '';
+      logEntry['tileId'] = logData['tileId'] ?? '';
+    }
+    if (actionType == 'MIDDLE_WORD' ||
+        actionType == 'INVALID_LENGTH' ||
+        actionType == 'INVALID_NO_MIDDLE' ||
+        actionType == 'INVALID_LETTERS_USED' ||
+        actionType == 'INVALID_WORD_NOT_IN_DICTIONARY' ||
+        actionType == 'INVALID_UNKNOWN_WHY') {
+      logEntry['word'] = logData['word'] ?? '';
+    }
+    if (actionType == 'STEAL_WORD') {
+      logEntry['word'] = logData['word'] ?? '';
+      logEntry['robbedUserId'] = logData['robbedUserId'] ?? '';
+      logEntry['originalWordString'] = logData['originalWordString'] ?? '';
+    }
+    if (actionType == 'OWN_WORD_IMPROVEMENT') {
+      logEntry['word'] = logData['word'] ?? '';
+      logEntry['originalWordString'] = logData['originalWordString'] ?? '';
+    }
+    return logEntry;
   }
 
   @override